@@ -0,0 +1,338 @@
+from contextlib import nullcontext
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from typing import Dict, Iterable, Iterator, List, Optional, TextIO, Tuple, Union
+import argparse
+import json
+import os
+import sys
+import time
+
+from .puzzle_grid import PuzzleGrid
+from .graph_utils import GraphUtils
+from .logic_engine import PuzzleLogicEngine
+from .exact_solver import ExactSolver
+from .instrumentation import PipelineStats, collect_stats
+from .canonical import canonical_form
+from .cache import ResultCache
+
+def _read_record(header: str, lines: Iterator[str], puzzle_id: str) -> str:
+    """The text of the PuzzleGrid.parse record starting at `header`, taken from `lines`."""
+    fields = header.split()
+    if len(fields) != 3 or not all(field.lstrip("-").isdigit() for field in fields):
+        raise ValueError(f"Record {puzzle_id}: bad header {header!r}, expected rows, columns and max_num")
+    record = [header]
+    for r in range(int(fields[0])):
+        line = next(lines, None)
+        if line is None:
+            raise ValueError(f"Record {puzzle_id}: input ends after {r} of {fields[0]} rows")
+        record.append(line)
+    dot_line = next(lines, None)
+    if dot_line is None or not dot_line.isdigit():
+        raise ValueError(f"Record {puzzle_id}: expected a dot count, got {dot_line!r}")
+    record.append(dot_line)
+    for d in range(int(dot_line)):
+        line = next(lines, None)
+        if line is None:
+            raise ValueError(f"Record {puzzle_id}: input ends after {d} of {dot_line} dots")
+        record.append(line)
+    return "\n".join(record)
+
+
+def split_puzzles(stream: TextIO, prefix: str = "", strict: bool = True) -> Iterator[Tuple[str, Union[str, ValueError]]]:
+    """
+    Yield (id, text) for every puzzle in a stream of concatenated PuzzleGrid.parse
+    records, or in a JSON-lines stream of {"id": ..., "puzzle": ...} objects.
+    Concatenated records need no separator: each one is delimited by its own
+    header row count and dot count.
+
+    A record that cannot be read raises ValueError, or with `strict` off is
+    yielded as (id, error) instead. A bad JSON line only loses itself; a bad
+    text record ends the stream, since the records after it cannot be found.
+    """
+    lines = (line.strip() for line in stream)
+    lines = (line for line in lines if line)
+    count = 0
+    for line in lines:
+        puzzle_id = f"{prefix}{count}"
+        count += 1
+        try:
+            if line.startswith("{"):
+                try:
+                    record = json.loads(line)
+                except ValueError as exc:
+                    raise ValueError(f"Record {puzzle_id}: bad JSON ({exc})") from None
+                if not isinstance(record, dict) or not isinstance(record.get("puzzle"), str):
+                    raise ValueError(f"Record {puzzle_id}: expected an object with a \"puzzle\" string")
+                yield str(record.get("id", puzzle_id)), record["puzzle"]
+                continue
+            text = _read_record(line, lines, puzzle_id)
+        except ValueError as exc:
+            if strict:
+                raise
+            yield puzzle_id, exc
+            if line.startswith("{"):
+                continue
+            return
+        yield puzzle_id, text
+
+
+def iter_puzzles(source: str, strict: bool = True) -> Iterator[Tuple[str, Union[str, ValueError]]]:
+    """
+    Puzzles from a directory (one or more per file), a file, or '-' for stdin.
+    `strict` is passed to split_puzzles, so with it off a bad file only costs
+    its own unreadable records.
+    """
+    if source == "-":
+        yield from split_puzzles(sys.stdin, strict=strict)
+    elif os.path.isdir(source):
+        for name in sorted(os.listdir(source)):
+            path = os.path.join(source, name)
+            if os.path.isfile(path):
+                with open(path) as f:
+                    records = list(split_puzzles(f, prefix=f"{name}#", strict=strict))
+                if len(records) == 1:
+                    yield name, records[0][1]
+                else:
+                    yield from records
+    else:
+        with open(source) as f:
+            yield from split_puzzles(f, strict=strict)
+
+
+_caches: Dict[str, ResultCache] = {}
+
+def open_cache(path: str) -> ResultCache:
+    """One ResultCache connection per process and path (pool workers reuse theirs)."""
+    cache = _caches.get(path)
+    if cache is None:
+        cache = _caches[path] = ResultCache(path)
+    return cache
+
+
+def _pipeline(text: str, timeout: Optional[float], started: float, phases: Dict[str, float], result: Dict,
+              cache: Optional[ResultCache]) -> None:
+    deadline = None if timeout is None else started + timeout
+    t = time.perf_counter()
+    puzzle = PuzzleGrid.parse(text)
+    phases["parse"] = time.perf_counter() - t
+
+    t = time.perf_counter()
+    graph = GraphUtils(puzzle)
+    phases["graph"] = time.perf_counter() - t
+
+    hit = form = None
+    if cache is not None:
+        t = time.perf_counter()
+        form = canonical_form(puzzle, graph.geometry)
+        hit = cache.load(puzzle, graph, form)
+        phases["cache"] = time.perf_counter() - t
+        result["cached"] = hit is not None
+        if hit is not None and hit.solution is not None:
+            result["status"] = "solved"
+            result["solution"] = str(hit.solution)
+            return
+        if hit is not None and hit.status == "unsat":
+            result["status"] = "unsat"
+            return
+
+    submitted = puzzle
+    if hit is not None and hit.preprocessed is not None:
+        puzzle = hit.preprocessed
+        contradiction = False
+    else:
+        if deadline is not None and time.perf_counter() >= deadline:
+            result["status"] = "timeout"
+            return
+        puzzle = puzzle.clone() if cache is not None else puzzle
+        t = time.perf_counter()
+        logic = PuzzleLogicEngine(puzzle, graph)
+        filled, tentative = logic.preprocess(deadline=deadline)
+        phases["preprocess"] = time.perf_counter() - t
+        result["preprocess_filled"] = filled + len(tentative)
+        contradiction = logic.propagator.contradiction
+        if logic.propagator.timed_out and not contradiction:
+            result["status"] = "timeout"                    # a half-propagated board is not worth caching
+            return
+        if cache is not None:
+            cache.save(submitted, graph, "unsat" if contradiction else None, preprocessed=puzzle, form=form)
+
+    if contradiction:
+        result["status"] = "unsat"
+        return
+
+    remaining = None
+    if deadline is not None:
+        remaining = max(0.0, deadline - time.perf_counter())
+        if remaining == 0.0:
+            result["status"] = "timeout"
+            return
+    t = time.perf_counter()
+    solver = ExactSolver(puzzle, graph, time_limit=remaining)
+    solution = solver.solve()
+    phases["solve"] = time.perf_counter() - t
+    result["nodes"] = solver.stats.nodes
+    if solution is not None and solution.is_solved():
+        result["status"] = "solved"
+        result["solution"] = str(solution)
+    elif solver.stats.status == "time_limit":
+        result["status"] = "timeout"
+    else:
+        result["status"] = solver.stats.status
+
+    if cache is not None and result["status"] in ("solved", "unsat"):
+        cache.save(
+            submitted, graph, result["status"],
+            solution=solution if result["status"] == "solved" else None,
+            distances=not graph.closed_form or graph.bfs_rows > 0,   # closed-form rows are cheaper to recompute than to load
+            form=form,
+        )
+
+
+def solve_puzzle(
+    puzzle_id: str,
+    text: str,
+    timeout: Optional[float] = None,
+    instrument: bool = False,
+    cache_path: Optional[str] = None,
+) -> Dict:
+    """
+    Parse -> GraphUtils -> preprocess -> exact solve, within `timeout` seconds
+    overall: preprocessing stops at the deadline as well as the solver, and
+    either running out reports status "timeout". With `instrument` the pipeline's counters and phase timers are
+    attached to the result under "stats". With `cache_path` results are
+    looked up in and stored to a ResultCache keyed by canonical form.
+    """
+    started = time.perf_counter()
+    phases: Dict[str, float] = {}
+    result: Dict = {"id": puzzle_id}
+    stats = PipelineStats(trace=False) if instrument else None
+    with collect_stats(stats) if instrument else nullcontext():
+        try:
+            cache = open_cache(cache_path) if cache_path else None
+            _pipeline(text, timeout, started, phases, result, cache)
+        except Exception as exc:
+            result["status"] = "error"
+            result["error"] = f"{type(exc).__name__}: {exc}"
+
+    result["phases"] = phases
+    if stats is not None:
+        result["stats"] = stats.as_dict()
+    result["elapsed"] = time.perf_counter() - started
+    return result
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Nearest-rank percentile, q in [0, 100]."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * q // 100))
+    return ordered[int(rank) - 1]
+
+
+class BatchSummary:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.elapsed = 0.0
+        self.latencies: List[float] = []
+        self.statuses: Dict[str, int] = {}
+
+    def add(self, result: Dict) -> None:
+        self.latencies.append(result["elapsed"])
+        self.statuses[result["status"]] = self.statuses.get(result["status"], 0) + 1
+        self.elapsed = time.perf_counter() - self.started
+
+    def as_dict(self) -> Dict:
+        count = len(self.latencies)
+        return {
+            "puzzles": count,
+            "statuses": self.statuses,
+            "elapsed": self.elapsed,
+            "puzzles_per_sec": count / self.elapsed if self.elapsed > 0 else 0.0,
+            "latency_p50": percentile(self.latencies, 50),
+            "latency_p95": percentile(self.latencies, 95),
+        }
+
+
+def run_batch(
+    puzzles: Iterable[Tuple[str, Union[str, ValueError]]],
+    workers: Optional[int] = None,
+    max_in_flight: Optional[int] = None,
+    timeout: Optional[float] = None,
+    summary: Optional[BatchSummary] = None,
+    instrument: bool = False,
+    cache_path: Optional[str] = None,
+) -> Iterator[Dict]:
+    """
+    Solve puzzles across a process pool, yielding each result as soon as it
+    completes (not in input order). At most `max_in_flight` puzzles are read
+    ahead and queued, which bounds memory on large corpora. `timeout` is a
+    per-puzzle budget enforced inside the worker by the solver. Records
+    that came in as a ValueError (see split_puzzles) get an "error" result
+    without being sent to the pool.
+    """
+    workers = workers or os.cpu_count() or 1
+    max_in_flight = max_in_flight or 2 * workers
+    pending: Dict[Future, str] = {}
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        def drain(block: bool) -> Iterator[Dict]:
+            done, _ = wait(pending, timeout=None if block else 0, return_when=FIRST_COMPLETED)
+            for future in done:
+                puzzle_id = pending.pop(future)
+                try:
+                    result = future.result()
+                except Exception as exc:
+                    result = {"id": puzzle_id, "status": "error", "error": repr(exc), "elapsed": 0.0}
+                if summary is not None:
+                    summary.add(result)
+                yield result
+
+        for puzzle_id, text in puzzles:
+            if isinstance(text, ValueError):
+                result = {"id": puzzle_id, "status": "error", "error": f"{type(text).__name__}: {text}", "elapsed": 0.0}
+                if summary is not None:
+                    summary.add(result)
+                yield result
+                continue
+            while len(pending) >= max_in_flight:
+                yield from drain(block=True)
+            pending[pool.submit(solve_puzzle, puzzle_id, text, timeout, instrument, cache_path)] = puzzle_id
+            yield from drain(block=False)
+        while pending:
+            yield from drain(block=True)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Solve a corpus of Rikudo puzzles in parallel.")
+    parser.add_argument("source", help="directory, file (text or JSON lines) or - for stdin")
+    parser.add_argument("-o", "--output", help="JSON-lines result file (default: stdout)")
+    parser.add_argument("-w", "--workers", type=int, default=None)
+    parser.add_argument("--max-in-flight", type=int, default=None)
+    parser.add_argument("--timeout", type=float, default=None, help="per-puzzle budget in seconds")
+    parser.add_argument("--cache", help="SQLite result cache shared across runs (rotations/mirrors hit too)")
+    parser.add_argument("--stats", action="store_true", help="attach per-phase counters and timers to each result")
+    args = parser.parse_args(argv)
+
+    out = open(args.output, "w") if args.output else sys.stdout
+    summary = BatchSummary()
+    try:
+        for result in run_batch(
+            iter_puzzles(args.source, strict=False),
+            workers=args.workers,
+            max_in_flight=args.max_in_flight,
+            timeout=args.timeout,
+            summary=summary,
+            instrument=args.stats,
+            cache_path=args.cache,
+        ):
+            out.write(json.dumps(result) + "\n")
+            out.flush()
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    print(json.dumps(summary.as_dict()), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
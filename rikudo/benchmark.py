@@ -0,0 +1,214 @@
+from typing import Callable, Dict, List, NamedTuple, Optional
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+
+from .generator import generate_puzzle
+from .instrumentation import PipelineStats, collect_stats
+from .puzzle_grid import PuzzleGrid
+from .graph_utils import GraphUtils
+from .logic_engine import PuzzleLogicEngine
+from .variant_generators.depth2_engine import Depth2Engine
+from .variant_generators.random_seeder import RandomSeeder
+
+STAGES = ("parse", "graph", "preprocess", "depth2_enumerate", "depth2_generate", "random_generate")
+
+class BenchCase(NamedTuple):
+    name: str
+    rows: int
+    columns: int
+    givens: float = 0.3
+    holes: float = 0.05
+    dots: float = 0.1
+    seed: int = 1
+    variants: int = 50                                      # boards drawn from each variant generator
+
+
+CASES = {
+    case.name: case
+    for case in (
+        BenchCase("tiny", 7, 7),                            # ~45 cells, the size of input2.txt
+        BenchCase("small", 15, 15),                         # ~220 cells
+        BenchCase("medium", 31, 31),                        # ~940 cells
+        BenchCase("large", 61, 61, variants=10),            # ~3700 cells
+    )
+}
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks", "baseline.json")
+
+
+def run_pipeline(text: str, case: BenchCase, measure: Callable[[str, Callable], object]) -> None:
+    """Run every stage once on a fresh parse, handing each to `measure(stage, fn)`."""
+    puzzle = measure("parse", lambda: PuzzleGrid.parse(text))
+    graph = measure("graph", lambda: GraphUtils(puzzle))
+    measure("preprocess", lambda: PuzzleLogicEngine(puzzle, graph).preprocess())
+    depth2 = Depth2Engine(puzzle, graph)
+    measure("depth2_enumerate", depth2.enumerate_candidates)
+    measure("depth2_generate", lambda: depth2.generate_variants(limit=case.variants))
+    seeder = RandomSeeder(puzzle, seed=case.seed)
+    measure("random_generate", lambda: seeder.generate_variants(case.variants))
+
+
+def time_case(text: str, case: BenchCase, repeats: int) -> Dict[str, Dict[str, float]]:
+    """Wall time per stage over `repeats` runs (min and median, seconds)."""
+    samples: Dict[str, List[float]] = {stage: [] for stage in STAGES}
+
+    def measure(stage: str, fn: Callable) -> object:
+        t = time.perf_counter()
+        out = fn()
+        samples[stage].append(time.perf_counter() - t)
+        return out
+
+    for _ in range(repeats):
+        run_pipeline(text, case, measure)
+    return {
+        stage: {"min": min(times), "median": statistics.median(times)}
+        for stage, times in samples.items()
+    }
+
+
+def memory_case(text: str, case: BenchCase) -> Dict[str, int]:
+    """Peak traced allocation per stage in bytes, from a separate run (tracing skews timings)."""
+    peaks: Dict[str, int] = {}
+
+    def measure(stage: str, fn: Callable) -> object:
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        out = fn()
+        peaks[stage] = tracemalloc.get_traced_memory()[1] - base
+        return out
+
+    tracemalloc.start()
+    try:
+        run_pipeline(text, case, measure)
+    finally:
+        tracemalloc.stop()
+    return peaks
+
+
+def trace_case(text: str, case: BenchCase, stats: PipelineStats) -> None:
+    """One instrumented run, each stage wrapped in a "<case>.<stage>" phase."""
+    def measure(stage: str, fn: Callable) -> object:
+        with stats.phase(f"{case.name}.{stage}"):
+            return fn()
+
+    with collect_stats(stats):
+        run_pipeline(text, case, measure)
+
+
+def run_benchmarks(
+    cases: List[BenchCase],
+    repeats: int = 3,
+    memory: bool = True,
+    trace: Optional[PipelineStats] = None,
+) -> Dict:
+    results: Dict = {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "repeats": repeats,
+        "cases": {},
+    }
+    for case in cases:
+        puzzle, _ = generate_puzzle(case.rows, case.columns, case.givens, case.holes, case.dots, seed=case.seed)
+        text = str(puzzle)
+        entry = {
+            "params": case._asdict(),
+            "cells": len(puzzle.empty_cells) + len(puzzle.fixed_nums),
+            "max_num": puzzle.max_num,
+            "givens": len(puzzle.fixed_nums),
+            "dots": puzzle.dot_count,
+            "time": time_case(text, case, repeats),
+        }
+        if memory:
+            entry["peak_bytes"] = memory_case(text, case)
+        if trace is not None:
+            trace_case(text, case, trace)
+        results["cases"][case.name] = entry
+        print(f"{case.name}: {entry['cells']} cells, "
+              + ", ".join(f"{s} {entry['time'][s]['min'] * 1e3:.1f}ms" for s in STAGES), file=sys.stderr)
+    return results
+
+
+def compare(
+    current: Dict,
+    baseline: Dict,
+    threshold: float = 1.5,
+    min_seconds: float = 0.005,
+    min_bytes: int = 64 * 1024,
+) -> List[str]:
+    """
+    Regressions of `current` against `baseline`: a stage is flagged when its
+    min time or peak memory exceeds `threshold` times the baseline and the
+    absolute increase is above the noise floor (`min_seconds` / `min_bytes`).
+    Cases or stages missing from either side are skipped.
+    """
+    regressions = []
+    for name, entry in current["cases"].items():
+        base = baseline.get("cases", {}).get(name)
+        if base is None:
+            continue
+        for stage, times in entry["time"].items():
+            old = base["time"].get(stage)
+            if old is None:
+                continue
+            new_t, old_t = times["min"], old["min"]
+            if new_t > threshold * old_t and new_t - old_t > min_seconds:
+                regressions.append(f"{name}/{stage}: time {old_t * 1e3:.1f}ms -> {new_t * 1e3:.1f}ms")
+        for stage, new_b in entry.get("peak_bytes", {}).items():
+            old_b = base.get("peak_bytes", {}).get(stage)
+            if old_b is None:
+                continue
+            if new_b > threshold * old_b and new_b - old_b > min_bytes:
+                regressions.append(f"{name}/{stage}: peak {old_b / 1024:.0f}KiB -> {new_b / 1024:.0f}KiB")
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Per-stage time and memory benchmarks on synthetic Rikudo boards.")
+    parser.add_argument("--cases", default="tiny,small,medium,large", help=f"comma-separated subset of {', '.join(CASES)}")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc pass")
+    parser.add_argument("-o", "--output", default="bench_results.json")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--threshold", type=float, default=1.5, help="flag stages slower/larger than threshold x baseline")
+    parser.add_argument("--trace", help="also write a Chrome trace of one instrumented run per case")
+    parser.add_argument("--save-baseline", action="store_true", help="write the results as the new baseline")
+    args = parser.parse_args(argv)
+
+    names = [name.strip() for name in args.cases.split(",") if name.strip()]
+    unknown = [name for name in names if name not in CASES]
+    if unknown:
+        parser.error(f"unknown cases: {', '.join(unknown)}")
+
+    trace = PipelineStats() if args.trace else None
+    results = run_benchmarks([CASES[name] for name in names], args.repeats, memory=not args.no_memory, trace=trace)
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    if trace is not None:
+        trace.to_chrome_trace(args.trace)
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"baseline written to {args.baseline}", file=sys.stderr)
+        return
+    if not os.path.exists(args.baseline):
+        print(f"no baseline at {args.baseline}; run with --save-baseline", file=sys.stderr)
+        return
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    regressions = compare(results, baseline, args.threshold)
+    for line in regressions:
+        print(f"REGRESSION {line}", file=sys.stderr)
+    if regressions:
+        sys.exit(1)
+    print("no regressions against baseline", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
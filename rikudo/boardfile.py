@@ -0,0 +1,313 @@
+from typing import Iterable, Iterator, List, NamedTuple, Optional, Tuple
+import argparse
+import mmap
+import os
+import struct
+import sys
+
+import numpy as np
+
+from .puzzle_grid import PuzzleGrid
+from .compact_grid import GridGeometry
+from .batch import iter_puzzles
+
+MAGIC = b"RKBOARDS"
+VERSION = 1
+PUZZLE = 0                                                  # record kinds
+BOARD = 1
+KIND_NAMES = {PUZZLE: "puzzle", BOARD: "board"}
+
+# magic, version, reserved, record count, index offset
+FILE_HEADER = struct.Struct("<8sIIQQ")
+# kind, rows, columns, max_num, cell total, dot count
+RECORD_HEADER = struct.Struct("<BxHHxxIII4x")
+VALUES = np.dtype("<i2")                                    # cell values as in the text format (holes stay negative)
+MAX_VALUE = np.iinfo(VALUES).max
+LENGTHS = np.dtype("<u2")
+DOTS = np.dtype("<u2")
+INDEX = np.dtype("<u8")
+
+
+def _align(size: int, to: int = 8) -> int:
+    return -(-size // to) * to
+
+
+def _layout(rows: int, cell_total: int, dot_count: int) -> Tuple[int, int, int, int, int]:
+    """Offsets of row lengths, values, hole mask and dots inside a record, plus the record size."""
+    lengths = RECORD_HEADER.size
+    values = _align(lengths + rows * LENGTHS.itemsize)
+    holes = values + cell_total * VALUES.itemsize
+    dots = _align(holes + -(-cell_total // 8))
+    end = _align(dots + dot_count * 4 * DOTS.itemsize)
+    return lengths, values, holes, dots, end
+
+
+class BoardRecord(NamedTuple):
+    """Zero-copy views of one record; valid while its BoardFile is open."""
+    kind: int
+    row_count: int
+    column_count: int
+    max_num: int
+    row_lengths: np.ndarray                                 # (rows,) uint16
+    values: np.ndarray                                      # (cell total,) int16, row after row
+    hole_mask: np.ndarray                                   # packed bits, little bit order, 1 = hole
+    dots: np.ndarray                                        # (dot count, 4) uint16 as r1 c1 r2 c2
+
+    @property
+    def holes(self) -> np.ndarray:
+        return np.unpackbits(self.hole_mask, count=len(self.values), bitorder="little").astype(bool)
+
+    def rows(self) -> List[np.ndarray]:
+        """The values split back into the puzzle's (possibly ragged) rows, still as views."""
+        return np.split(self.values, np.cumsum(self.row_lengths[:-1], dtype=np.intp))
+
+    def to_puzzle(self) -> PuzzleGrid:
+        values = self.values.tolist()
+        cells: List[List[int]] = []
+        empty_cells = []
+        fixed_nums = {}
+        start = 0
+        for r, length in enumerate(self.row_lengths.tolist()):
+            row = values[start:start + length]
+            start += length
+            for c, val in enumerate(row):
+                if val == 0:
+                    empty_cells.append((r, c))
+                elif val > 0:
+                    fixed_nums[val] = (r, c)
+            cells.append(row)
+        dots = [((r1, c1), (r2, c2)) for r1, c1, r2, c2 in self.dots.tolist()]
+        return PuzzleGrid(self.max_num, (self.row_count, self.column_count), cells, dots, empty_cells, fixed_nums)
+
+
+class BoardWriter:
+    """
+    Streams puzzles or full boards into a binary board file. Records are
+    appended as they come; the offset index and final record count are
+    written by close(), so a file is only readable once its writer is closed.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self.file = open(path, "wb")
+        self.file.write(FILE_HEADER.pack(MAGIC, VERSION, 0, 0, 0))
+        self.offsets: List[int] = []
+        self.position = FILE_HEADER.size
+
+    def __enter__(self) -> "BoardWriter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+    def _write_record(self, kind: int, rows: int, columns: int, max_num: int,
+                      row_lengths: np.ndarray, values: np.ndarray, holes: np.ndarray, dots: np.ndarray) -> None:
+        if max_num > MAX_VALUE:
+            raise ValueError(f"max_num {max_num} does not fit the board format's {VALUES.itemsize}-byte cell values")
+        lengths_at, values_at, holes_at, dots_at, size = _layout(rows, len(values), len(dots))
+        record = bytearray(size)
+        RECORD_HEADER.pack_into(record, 0, kind, rows, columns, max_num, len(values), len(dots))
+        record[lengths_at:lengths_at + rows * LENGTHS.itemsize] = row_lengths.astype(LENGTHS).tobytes()
+        record[values_at:holes_at] = values.astype(VALUES).tobytes()
+        mask = np.packbits(holes, bitorder="little").tobytes()
+        record[holes_at:holes_at + len(mask)] = mask
+        record[dots_at:dots_at + dots.size * DOTS.itemsize] = dots.astype(DOTS).tobytes()
+        self.file.write(record)
+        self.offsets.append(self.position)
+        self.position += size
+
+    def add(self, puzzle: PuzzleGrid, kind: Optional[int] = None) -> int:
+        """Append `puzzle`; `kind` defaults to BOARD when it has no empty cell. Returns the record index."""
+        if kind is None:
+            kind = PUZZLE if puzzle.empty_cells else BOARD
+        values = np.fromiter((val for row in puzzle.cells for val in row), dtype=np.int64)
+        row_lengths = np.array([len(row) for row in puzzle.cells], dtype=LENGTHS)
+        dots = np.array([[*a, *b] for a, b in puzzle.dots], dtype=DOTS).reshape(-1, 4)
+        self._write_record(kind, puzzle.row_count, puzzle.column_count, puzzle.max_num,
+                           row_lengths, values, values < 0, dots)
+        return len(self.offsets) - 1
+
+    def add_population(self, puzzle: PuzzleGrid, population: np.ndarray, geometry: Optional[GridGeometry] = None) -> None:
+        """
+        Append every row of a GA population matrix (value v -> cell id in
+        column v-1, -1 for unplaced) as a BOARD record on `puzzle`'s grid,
+        without building a PuzzleGrid per row.
+        """
+        geometry = geometry or GridGeometry.from_puzzle(puzzle)
+        row_lengths = np.array(geometry.row_lengths, dtype=LENGTHS)
+        starts = np.concatenate([[0], np.cumsum(row_lengths, dtype=np.intp)[:-1]])
+        flat = np.array([starts[r] + c for r, c in geometry.coords], dtype=np.intp)
+        template = np.fromiter((val if val < 0 else 0 for row in puzzle.cells for val in row), dtype=VALUES)
+        holes = template < 0
+        dots = np.array([[*a, *b] for a, b in puzzle.dots], dtype=DOTS).reshape(-1, 4)
+
+        population = np.asarray(population)
+        boards = np.repeat(template[None, :], len(population), axis=0)
+        placed = population >= 0
+        rows, cols = np.nonzero(placed)
+        boards[rows, flat[population[placed]]] = cols + 1
+        for board in boards:
+            self._write_record(BOARD, puzzle.row_count, puzzle.column_count, puzzle.max_num,
+                               row_lengths, board, holes, dots)
+
+    def close(self) -> None:
+        if self.file.closed:
+            return
+        index_offset = _align(self.position)
+        self.file.write(b"\0" * (index_offset - self.position))
+        self.file.write(np.array(self.offsets, dtype=INDEX).tobytes())
+        self.file.seek(0)
+        self.file.write(FILE_HEADER.pack(MAGIC, VERSION, 0, len(self.offsets), index_offset))
+        self.file.close()
+
+
+class BoardFile:
+    """
+    Read-only, memory-mapped view of a binary board file.
+
+    Layout (little endian, every array 8-byte aligned):
+        file header   magic "RKBOARDS", version, record count, index offset
+        records       header (kind, rows, columns, max_num, cell total, dot count),
+                      row lengths u16, cell values i16, packed hole mask, dots u16 x4
+        index         u64 byte offset of every record
+    record(i) seeks straight through the index and returns NumPy views into
+    the mapping, so nothing is parsed or copied until a caller asks for it.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self.file = open(path, "rb")
+        self.mm = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self.mm) < FILE_HEADER.size:
+            raise ValueError(f"{path} is not a board file")
+        magic, version, _, count, index_offset = FILE_HEADER.unpack_from(self.mm, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a board file")
+        if version != VERSION:
+            raise ValueError(f"{path} is board file version {version}, expected {VERSION}")
+        if index_offset + count * INDEX.itemsize > len(self.mm):
+            raise ValueError(f"{path} is truncated (was its writer closed?)")
+        self.offsets = np.frombuffer(self.mm, dtype=INDEX, count=count, offset=index_offset)
+
+    def close(self) -> None:
+        self.offsets = None
+        try:
+            self.mm.close()
+        except BufferError:
+            pass                                            # views still alive; the mapping goes with them
+        self.file.close()
+
+    def __enter__(self) -> "BoardFile":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+    def __getitem__(self, i: int) -> BoardRecord:
+        return self.record(i)
+
+    def __iter__(self) -> Iterator[BoardRecord]:
+        for i in range(len(self)):
+            yield self.record(i)
+
+    def record(self, i: int) -> BoardRecord:
+        if not -len(self) <= i < len(self):
+            raise IndexError(f"record {i} out of range for {len(self)} records")
+        base = int(self.offsets[i])
+        kind, rows, columns, max_num, cell_total, dot_count = RECORD_HEADER.unpack_from(self.mm, base)
+        lengths_at, values_at, holes_at, dots_at, _ = _layout(rows, cell_total, dot_count)
+        return BoardRecord(
+            kind,
+            rows,
+            columns,
+            max_num,
+            np.frombuffer(self.mm, dtype=LENGTHS, count=rows, offset=base + lengths_at),
+            np.frombuffer(self.mm, dtype=VALUES, count=cell_total, offset=base + values_at),
+            np.frombuffer(self.mm, dtype=np.uint8, count=-(-cell_total // 8), offset=base + holes_at),
+            np.frombuffer(self.mm, dtype=DOTS, count=dot_count * 4, offset=base + dots_at).reshape(dot_count, 4),
+        )
+
+    def puzzle(self, i: int) -> PuzzleGrid:
+        return self.record(i).to_puzzle()
+
+    def stacked_values(self) -> np.ndarray:
+        """
+        (records, cell total) view of every record's values at once, e.g. a
+        dumped population. Only possible when all records have the same shape,
+        and hence the same size; raises ValueError otherwise.
+        """
+        if len(self) == 0:
+            return np.empty((0, 0), dtype=VALUES)
+        first = self.record(0)
+        stride = int(self.offsets[1] - self.offsets[0]) if len(self) > 1 else 0
+        if len(self) > 1 and np.any(np.diff(self.offsets) != stride):
+            raise ValueError(f"{self.path} holds records of different shapes")
+        base = int(self.offsets[0])
+        shape = RECORD_HEADER.unpack_from(self.mm, base)[1:]
+        for offset in self.offsets[1:]:
+            if RECORD_HEADER.unpack_from(self.mm, int(offset))[1:] != shape:
+                raise ValueError(f"{self.path} holds records of different shapes")
+        values_at = _layout(first.row_count, len(first.values), len(first.dots))[1]
+        return np.ndarray(
+            (len(self), len(first.values)),
+            dtype=VALUES,
+            buffer=self.mm,
+            offset=base + values_at,
+            strides=(stride, VALUES.itemsize),
+        )
+
+
+def pack(puzzles: Iterable[PuzzleGrid], path: str) -> int:
+    """Write `puzzles` to a new board file; returns the record count."""
+    with BoardWriter(path) as writer:
+        for puzzle in puzzles:
+            writer.add(puzzle)
+        return len(writer)
+
+
+def unpack(path: str) -> Iterator[PuzzleGrid]:
+    with BoardFile(path) as boards:
+        for i in range(len(boards)):
+            yield boards.puzzle(i)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Convert Rikudo puzzles between the text and binary board formats.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    to_binary = commands.add_parser("pack", help="text (directory, file or -) -> binary board file")
+    to_binary.add_argument("source")
+    to_binary.add_argument("output")
+    to_text = commands.add_parser("unpack", help="binary board file -> concatenated text records")
+    to_text.add_argument("source")
+    to_text.add_argument("-o", "--output", help="text file (default: stdout)")
+    to_text.add_argument("--record", type=int, action="append", help="only these record indices (repeatable)")
+    info = commands.add_parser("info", help="record count and kinds")
+    info.add_argument("source")
+    args = parser.parse_args(argv)
+
+    if args.command == "pack":
+        count = pack((PuzzleGrid.parse(text) for _, text in iter_puzzles(args.source)), args.output)
+        print(f"{count} records, {os.path.getsize(args.output)} bytes", file=sys.stderr)
+    elif args.command == "unpack":
+        out = open(args.output, "w") if args.output else sys.stdout
+        try:
+            with BoardFile(args.source) as boards:
+                for i in args.record or range(len(boards)):
+                    out.write(str(boards.puzzle(i)) + "\n")
+        finally:
+            if out is not sys.stdout:
+                out.close()
+    else:
+        with BoardFile(args.source) as boards:
+            kinds = {}
+            for record in boards:
+                kinds[KIND_NAMES[record.kind]] = kinds.get(KIND_NAMES[record.kind], 0) + 1
+            print(f"{args.source}: version {VERSION}, {len(boards)} records {kinds}")
+
+
+if __name__ == "__main__":
+    main()
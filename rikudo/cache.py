@@ -0,0 +1,169 @@
+from typing import NamedTuple, Optional
+import sqlite3
+import time
+
+import numpy as np
+
+from .puzzle_grid import PuzzleGrid
+from .graph_utils import GraphUtils
+from .canonical import CanonicalForm, canonical_form, cell_values
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    key          TEXT PRIMARY KEY,
+    cell_count   INTEGER NOT NULL,
+    status       TEXT,
+    preprocessed BLOB,
+    solution     BLOB,
+    distances    BLOB,
+    rows_ready   BLOB,
+    size         INTEGER NOT NULL,
+    last_used    REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS results_lru ON results (last_used);
+"""
+
+class CachedResult(NamedTuple):
+    status: Optional[str]
+    preprocessed: Optional[PuzzleGrid]                      # board after PuzzleLogicEngine.preprocess
+    solution: Optional[PuzzleGrid]
+    distances_loaded: bool
+
+
+class ResultCache:
+    """
+    SQLite cache of solve results keyed by canonical puzzle form, so rotated,
+    mirrored and renumbered copies of a puzzle hit the same entry.
+
+    Boards and distance matrices are stored in canonical cell order and mapped
+    back onto the caller's orientation on load. Entries are evicted least
+    recently used first once their total blob size exceeds `max_bytes` (or
+    their number exceeds `max_entries`).
+    """
+    def __init__(self, path: str, max_bytes: int = 256 * 1024 * 1024, max_entries: Optional[int] = None):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.db = sqlite3.connect(path, timeout=30)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.executescript(SCHEMA)
+        self.hits = 0
+        self.misses = 0
+
+    def close(self) -> None:
+        self.db.close()
+
+    def __enter__(self) -> "ResultCache":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return self.db.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+    def total_bytes(self) -> int:
+        return self.db.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+
+    def load(self, puzzle: PuzzleGrid, graph: GraphUtils, form: Optional[CanonicalForm] = None) -> Optional[CachedResult]:
+        """
+        Cached result for `puzzle` in its own orientation, or None. A cached
+        distance matrix is copied into `graph` as a side effect.
+        """
+        form = form or canonical_form(puzzle, graph.geometry)
+        row = self.db.execute(
+            "SELECT status, preprocessed, solution, distances, rows_ready FROM results WHERE key = ?",
+            (form.key,),
+        ).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        with self.db:
+            self.db.execute("UPDATE results SET last_used = ? WHERE key = ?", (time.time(), form.key))
+
+        status, preprocessed, solution, distances, rows_ready = row
+        geometry = graph.geometry
+        n = geometry.cell_count
+
+        def board(blob: Optional[bytes]) -> Optional[PuzzleGrid]:
+            if blob is None:
+                return None
+            return form.apply(puzzle, geometry, np.frombuffer(blob, dtype=np.int32))
+
+        if distances is not None:
+            matrix = np.frombuffer(distances, dtype=np.int16).reshape(n, n)
+            ready = np.unpackbits(np.frombuffer(rows_ready, dtype=np.uint8), count=n).astype(bool)
+            graph.load_distances(form.from_canonical_matrix(matrix), ready[form.order])
+        return CachedResult(status, board(preprocessed), board(solution), distances is not None)
+
+    def save(
+        self,
+        puzzle: PuzzleGrid,
+        graph: GraphUtils,
+        status: Optional[str] = None,
+        preprocessed: Optional[PuzzleGrid] = None,
+        solution: Optional[PuzzleGrid] = None,
+        distances: bool = False,
+        form: Optional[CanonicalForm] = None,
+    ) -> None:
+        """
+        Store whatever is given for `puzzle` (the board as submitted, before
+        preprocessing). Fields left as None keep their cached value; with
+        `distances` the rows of `graph`'s distance matrix computed so far are
+        stored too.
+        """
+        form = form or canonical_form(puzzle, graph.geometry)
+        geometry = graph.geometry
+
+        def blob(board: Optional[PuzzleGrid]) -> Optional[bytes]:
+            if board is None:
+                return None
+            return form.to_canonical_values(cell_values(board, geometry)).tobytes()
+
+        matrix = ready = None
+        if distances:
+            matrix = form.to_canonical_matrix(graph.distance_matrix).tobytes()
+            canonical_ready = np.empty_like(graph.row_ready)
+            canonical_ready[form.order] = graph.row_ready
+            ready = np.packbits(canonical_ready).tobytes()
+
+        fields = (blob(preprocessed), blob(solution), matrix, ready)
+        with self.db:
+            self.db.execute(
+                """
+                INSERT INTO results (key, cell_count, status, preprocessed, solution, distances, rows_ready, size, last_used)
+                VALUES (?, ?, ?, ?, ?, ?, ?, 0, ?)
+                ON CONFLICT(key) DO UPDATE SET
+                    status       = COALESCE(excluded.status, status),
+                    preprocessed = COALESCE(excluded.preprocessed, preprocessed),
+                    solution     = COALESCE(excluded.solution, solution),
+                    distances    = COALESCE(excluded.distances, distances),
+                    rows_ready   = COALESCE(excluded.rows_ready, rows_ready),
+                    last_used    = excluded.last_used
+                """,
+                (form.key, geometry.cell_count, status, *fields, time.time()),
+            )
+            self.db.execute(
+                """
+                UPDATE results SET size = COALESCE(LENGTH(preprocessed), 0) + COALESCE(LENGTH(solution), 0)
+                    + COALESCE(LENGTH(distances), 0) + COALESCE(LENGTH(rows_ready), 0)
+                WHERE key = ?
+                """,
+                (form.key,),
+            )
+            self.evict()
+
+    def evict(self) -> int:
+        """Drop least recently used entries until the size and count bounds hold; returns how many."""
+        total, count = self.db.execute("SELECT COALESCE(SUM(size), 0), COUNT(*) FROM results").fetchone()
+        victims = []
+        rows = self.db.execute("SELECT key, size FROM results ORDER BY last_used")
+        for key, size in rows:
+            if total <= self.max_bytes and (self.max_entries is None or count <= self.max_entries):
+                break
+            victims.append((key,))
+            total -= size
+            count -= 1
+        self.db.executemany("DELETE FROM results WHERE key = ?", victims)
+        return len(victims)
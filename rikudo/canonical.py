@@ -0,0 +1,165 @@
+from typing import List, Optional, Tuple
+import hashlib
+
+import numpy as np
+
+from .puzzle_grid import PuzzleGrid
+from .compact_grid import GridGeometry
+
+Cell = Tuple[int, int]
+Cube = Tuple[int, int, int]
+
+def hex_cube_coords(geometry: GridGeometry) -> Optional[List[Cube]]:
+    """
+    Cube coordinates (q, r, s) per cell id, or None if the row layout is not
+    a proper hex lattice (some neighbour pair is not one hex step apart).
+
+    Short rows sit half a cell to the right, so in doubled-width coordinates
+    x = 2c + (short row), y = r; x + y has the same parity on every cell of an
+    alternating board and is shifted to even before converting.
+    """
+    cols = geometry.column_count
+    doubled = [(2 * c + (geometry.row_lengths[r] != cols), r) for r, c in geometry.coords]
+    if not doubled:
+        return []
+    parity = sum(doubled[0]) % 2
+    if any((x + y) % 2 != parity for x, y in doubled):
+        return None
+    for a, nbrs in enumerate(geometry.neighbours):
+        xa, ya = doubled[a]
+        for b in nbrs:
+            dx, dy = abs(doubled[b][0] - xa), abs(doubled[b][1] - ya)
+            if (dx, dy) not in ((2, 0), (1, 1)):
+                return None
+
+    cubes = []
+    for x, y in doubled:
+        q = (x - parity - y) // 2
+        cubes.append((q, y, -q - y))
+    return cubes
+
+
+def _symmetries() -> List:
+    """The 12 symmetries of the hex lattice as functions on cube coordinates."""
+    def rotate(cube: Cube) -> Cube:
+        q, r, s = cube
+        return -r, -s, -q
+
+    def reflect(cube: Cube) -> Cube:
+        q, r, s = cube
+        return q, s, r
+
+    transforms = []
+    for mirrored in (False, True):
+        for turns in range(6):
+            def transform(cube: Cube, mirrored=mirrored, turns=turns) -> Cube:
+                if mirrored:
+                    cube = reflect(cube)
+                for _ in range(turns):
+                    cube = rotate(cube)
+                return cube
+            transforms.append(transform)
+    return transforms
+
+
+SYMMETRIES = _symmetries()
+
+
+class CanonicalForm:
+    """
+    Orientation-free description of a puzzle.
+
+    `order[i]` is the canonical index of the caller's cell id i and
+    `reversed` tells whether values were renumbered v -> max_num + 1 - v.
+    Everything stored in canonical space (cell values, distance matrices) is
+    mapped back onto the caller's board with the from_* helpers.
+    """
+    def __init__(self, key: str, text: str, order: np.ndarray, reversed: bool, max_num: int):
+        self.key = key
+        self.text = text
+        self.order = order
+        self.reversed = reversed
+        self.max_num = max_num
+
+    def _renumber(self, values: np.ndarray) -> np.ndarray:
+        if not self.reversed:
+            return values
+        return np.where(values > 0, self.max_num + 1 - values, values)
+
+    def to_canonical_values(self, values: np.ndarray) -> np.ndarray:
+        """Caller cell-id -> value array to canonical index -> canonical value."""
+        out = np.empty_like(values)
+        out[self.order] = self._renumber(values)
+        return out
+
+    def from_canonical_values(self, values: np.ndarray) -> np.ndarray:
+        return self._renumber(values[self.order])
+
+    def to_canonical_matrix(self, matrix: np.ndarray) -> np.ndarray:
+        """Permute a cell-id x cell-id matrix (e.g. distances) into canonical order."""
+        out = np.empty_like(matrix)
+        out[np.ix_(self.order, self.order)] = matrix
+        return out
+
+    def from_canonical_matrix(self, matrix: np.ndarray) -> np.ndarray:
+        return matrix[np.ix_(self.order, self.order)]
+
+    def apply(self, puzzle: PuzzleGrid, geometry: GridGeometry, values: np.ndarray) -> PuzzleGrid:
+        """Clone of the caller's `puzzle` with canonical `values` filled into its empty cells."""
+        board = puzzle.clone()
+        for cell_id, val in enumerate(self.from_canonical_values(values).tolist()):
+            cell = geometry.coords[cell_id]
+            if val > 0 and board.cells[cell[0]][cell[1]] == 0:
+                board.assign(val, cell)
+        return board
+
+
+def cell_values(puzzle: PuzzleGrid, geometry: GridGeometry) -> np.ndarray:
+    return np.array([puzzle.cells[r][c] for r, c in geometry.coords], dtype=np.int32)
+
+
+def canonical_form(puzzle: PuzzleGrid, geometry: Optional[GridGeometry] = None) -> CanonicalForm:
+    """
+    Pick the lexicographically smallest encoding over all 12 hex symmetries
+    (translated to the origin) times value reversal; the sha256 of that
+    encoding is the cache key, so rotated, mirrored and renumbered copies of
+    a puzzle share it. Boards whose rows do not form a hex lattice only get
+    value reversal.
+    """
+    geometry = geometry or GridGeometry.from_puzzle(puzzle)
+    max_num = puzzle.max_num
+    values = cell_values(puzzle, geometry).tolist()
+    reversed_values = [max_num + 1 - v if v > 0 else v for v in values]
+    cubes = hex_cube_coords(geometry)
+
+    if cubes is None:
+        placements = [list(geometry.coords)]
+    else:
+        placements = []
+        for transform in SYMMETRIES:
+            moved = [transform(cube) for cube in cubes]
+            min_q = min(q for q, _, _ in moved)
+            min_r = min(r for _, r, _ in moved)
+            placements.append([(r - min_r, q - min_q) for q, r, _ in moved])
+
+    best = None
+    for place in placements:
+        ranked = sorted(range(len(place)), key=place.__getitem__)
+        order = [0] * len(place)
+        for rank, cell_id in enumerate(ranked):
+            order[cell_id] = rank
+        dots = tuple(sorted(tuple(sorted((order[a], order[b]))) for a, b in geometry.dot_ids))
+        shape = tuple(place[cell_id] for cell_id in ranked)
+        for rev, vals in ((False, values), (True, reversed_values)):
+            encoding = (shape, tuple(vals[cell_id] for cell_id in ranked), dots)
+            if best is None or encoding < best[0]:
+                best = (encoding, order, rev)
+
+    (shape, vals, dots), order, rev = best
+    text = "|".join((
+        str(max_num),
+        ";".join(f"{r},{q},{v}" for (r, q), v in zip(shape, vals)),
+        ";".join(f"{a},{b}" for a, b in dots),
+    ))
+    key = hashlib.sha256(text.encode()).hexdigest()
+    return CanonicalForm(key, text, np.array(order, dtype=np.intp), rev, max_num)
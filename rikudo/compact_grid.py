@@ -0,0 +1,204 @@
+from array import array
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from .puzzle_grid import PuzzleGrid, Dots
+from .instrumentation import current_stats
+
+Cell = Tuple[int, int]
+
+class GridGeometry:
+    """
+    Immutable description of a board: which (row, col) positions are playable,
+    their integer cell ids, neighbour lists by id and the dot pairs.
+    Built once per puzzle and shared by every CompactGrid derived from it.
+    """
+    def __init__(
+        self,
+        max_num: int,
+        dimensions: Tuple[int, int],
+        row_lengths: Tuple[int, ...],
+        holes: Dict[Cell, int],
+        coords: List[Cell],
+        neighbours: Tuple[Tuple[int, ...], ...],
+        dots: Dots,
+    ):
+        self.max_num = max_num
+        self.row_count, self.column_count = dimensions
+        self.row_lengths = row_lengths
+        self.holes = holes                                  # (r, c) -> original hole marker (-1 / -2)
+        self.coords = coords                                # cell id -> (r, c)
+        self.index: Dict[Cell, int] = {cell: i for i, cell in enumerate(coords)}
+        self.cell_count = len(coords)
+        self.neighbours = neighbours                        # cell id -> neighbour ids
+        self.dots = dots
+        self.dot_ids: Tuple[Tuple[int, int], ...] = tuple(
+            (self.index[a], self.index[b]) for a, b in dots
+        )
+        self._neighbour_masks: Optional[List[int]] = None
+        self._dot_partners: Optional[List[List[int]]] = None
+
+    @property
+    def neighbour_masks(self) -> List[int]:
+        """Cell id -> int bitmask of its neighbour ids, built on first use and shared."""
+        if self._neighbour_masks is None:
+            self._neighbour_masks = [sum(1 << nbr for nbr in nbrs) for nbrs in self.neighbours]
+        return self._neighbour_masks
+
+    @property
+    def dot_partners(self) -> List[List[int]]:
+        """Cell id -> ids of the cells it shares a dot with, built on first use and shared."""
+        if self._dot_partners is None:
+            partners: List[List[int]] = [[] for _ in range(self.cell_count)]
+            for a, b in self.dot_ids:
+                partners[a].append(b)
+                partners[b].append(a)
+            self._dot_partners = partners
+        return self._dot_partners
+
+    @classmethod
+    def from_puzzle(cls, puzzle: PuzzleGrid) -> "GridGeometry":
+        holes: Dict[Cell, int] = {}
+        coords: List[Cell] = []
+        for r, row in enumerate(puzzle.cells):
+            for c, val in enumerate(row):
+                if val < 0:
+                    holes[(r, c)] = val
+                else:
+                    coords.append((r, c))
+
+        index = {cell: i for i, cell in enumerate(coords)}
+        neighbours = tuple(
+            tuple(index[nbr] for nbr in puzzle.neighbours(cell))
+            for cell in coords
+        )
+        return cls(
+            puzzle.max_num,
+            (puzzle.row_count, puzzle.column_count),
+            tuple(len(row) for row in puzzle.cells),
+            holes,
+            coords,
+            neighbours,
+            list(puzzle.dots),
+        )
+
+
+class CompactGrid:
+    """
+    Array-backed alternative to PuzzleGrid.
+
+    The whole mutable state lives in one flat int array:
+        buffer[0:cell_count]                    cell id -> value (0 = empty)
+        buffer[cell_count:cell_count+max_num+1] value -> cell id (-1 = unplaced, slot 0 unused)
+    Geometry and the fixed givens are shared between clones, so clone() is a
+    single buffer copy.
+    """
+    def __init__(self, geometry: GridGeometry, buffer: array, fixed: bytes):
+        self.geometry = geometry
+        self.buffer = buffer
+        self.fixed = fixed                                  # cell id -> 1 if value was given, shared
+        self.max_num = geometry.max_num
+        self._offset = geometry.cell_count
+
+    @classmethod
+    def from_puzzle(cls, puzzle: PuzzleGrid, geometry: GridGeometry = None) -> "CompactGrid":
+        if geometry is None:
+            geometry = GridGeometry.from_puzzle(puzzle)
+
+        n = geometry.cell_count
+        buffer = array("i", [0] * n + [-1] * (puzzle.max_num + 1))
+        fixed = bytearray(n)
+        for i, (r, c) in enumerate(geometry.coords):
+            val = puzzle.cells[r][c]
+            if val > 0:
+                buffer[i] = val
+                buffer[n + val] = i
+                if val in puzzle.fixed_nums:
+                    fixed[i] = 1
+        return cls(geometry, buffer, bytes(fixed))
+
+    @classmethod
+    def parse(cls, puzzle_str: str) -> "CompactGrid":
+        return cls.from_puzzle(PuzzleGrid.parse(puzzle_str))
+
+    def clone(self) -> "CompactGrid":
+        stats = current_stats()
+        if stats.enabled:
+            stats.count("clone.calls")
+            stats.count("clone.bytes", self.buffer.itemsize * len(self.buffer))
+        return CompactGrid(self.geometry, self.buffer[:], self.fixed)
+
+    __copy__ = clone
+
+    def __str__(self):
+        geo = self.geometry
+        lines = [f"{geo.row_count} {geo.column_count} {self.max_num}"]
+        for r, length in enumerate(geo.row_lengths):
+            row = []
+            for c in range(length):
+                cell = (r, c)
+                if cell in geo.holes:
+                    row.append(geo.holes[cell])
+                else:
+                    row.append(self.buffer[geo.index[cell]])
+            lines.append(" ".join(map(str, row)))
+        lines.append(str(len(geo.dots)))
+        for (x1, y1), (x2, y2) in geo.dots:
+            lines.append(f"{x1} {y1} {x2} {y2}")
+        return "\n".join(lines)
+
+    def to_puzzle(self) -> PuzzleGrid:
+        """The equivalent PuzzleGrid, as PuzzleGrid.parse(str(self)) would build it."""
+        geo = self.geometry
+        index = geo.index
+        cells: List[List[int]] = []
+        empty_cells: List[Cell] = []
+        fixed_nums: Dict[int, Cell] = {}
+        for r, length in enumerate(geo.row_lengths):
+            row = []
+            for c in range(length):
+                cell = (r, c)
+                val = geo.holes.get(cell)
+                if val is None:
+                    val = self.buffer[index[cell]]
+                    if val == 0:
+                        empty_cells.append(cell)
+                    else:
+                        fixed_nums[val] = cell
+                row.append(val)
+            cells.append(row)
+        return PuzzleGrid(self.max_num, (geo.row_count, geo.column_count), cells, list(geo.dots), empty_cells, fixed_nums)
+
+    def value_at(self, cell_id: int) -> int:
+        return self.buffer[cell_id]
+
+    def cell_of(self, value: int) -> int:
+        return self.buffer[self._offset + value]
+
+    def is_fixed(self, cell_id: int) -> bool:
+        return self.fixed[cell_id] == 1
+
+    def value_cells(self) -> array:
+        """Copy of the value -> cell id array for values 1..max_num."""
+        return self.buffer[self._offset + 1:]
+
+    def assign(self, value: int, cell_id: int) -> None:
+        if self.buffer[cell_id] != 0:
+            raise ValueError(f"Cell {self.geometry.coords[cell_id]} is already occupied")
+        if self.buffer[self._offset + value] != -1:
+            raise ValueError(f"Value {value} is already placed")
+        self.buffer[cell_id] = value
+        self.buffer[self._offset + value] = cell_id
+
+    def clear(self, cell_id: int) -> None:
+        if self.fixed[cell_id]:
+            raise ValueError(f"Cell {self.geometry.coords[cell_id]} holds a given")
+        val = self.buffer[cell_id]
+        if val > 0:
+            self.buffer[cell_id] = 0
+            self.buffer[self._offset + val] = -1
+
+    def empty_cells(self) -> Iterator[int]:
+        return (i for i in range(self.geometry.cell_count) if self.buffer[i] == 0)
+
+    def missing_values(self) -> List[int]:
+        return [v for v in range(1, self.max_num + 1) if self.buffer[self._offset + v] == -1]
@@ -0,0 +1,273 @@
+from typing import Dict, List, Optional, Tuple
+import time
+
+from .puzzle_grid import PuzzleGrid
+from .graph_utils import GraphUtils
+from .instrumentation import current_stats
+
+Cell = Tuple[int, int]
+
+class SolverStats:
+    def __init__(self):
+        self.status = "unknown"                             # solved / unsat / node_limit / time_limit
+        self.nodes = 0
+        self.backtracks = 0
+        self.pruned_distance = 0
+        self.pruned_dots = 0
+        self.pruned_dead_end = 0
+        self.pruned_connectivity = 0
+        self.elapsed = 0.0
+
+    def as_dict(self) -> Dict[str, object]:
+        return dict(self.__dict__)
+
+    def __repr__(self):
+        fields = ", ".join(f"{k}={v!r}" for k, v in self.__dict__.items())
+        return f"SolverStats({fields})"
+
+
+class _BudgetExceeded(Exception):
+    pass
+
+
+class ExactSolver:
+    """
+    Depth-first Hamiltonian path search over the values 1..max_num.
+
+    The path is extended one value at a time from the head cell; visited cells
+    are an int bitmask over cell ids. Values already on the puzzle (typically
+    after PuzzleLogicEngine.preprocess) are anchors the path must hit exactly.
+    Pruning:
+        - distance: the next anchor k must be within k - v steps,
+        - dots: a dot partner of the head must be the previous or next value,
+        - dead ends: every cell off the path needs two usable neighbours
+          (one if it can be the final value, and only one such cell may exist),
+        - connectivity: cells off the path must stay reachable from the head.
+    """
+    def __init__(
+        self,
+        puzzle: PuzzleGrid,
+        graph: GraphUtils,
+        time_limit: Optional[float] = None,
+        node_limit: Optional[int] = None,
+    ):
+        self.puzzle = puzzle
+        self.graph = graph
+        self.geometry = graph.geometry
+        self.max_num = puzzle.max_num
+        self.time_limit = time_limit
+        self.node_limit = node_limit
+        self.stats = SolverStats()
+
+        geo = self.geometry
+        n = geo.cell_count
+        self.neighbours = geo.neighbours
+        self.nbr_mask = geo.neighbour_masks
+        self.all_mask = (1 << n) - 1
+        self.full_cover = n == self.max_num                 # dead-end rules assume every cell is on the path
+        self.partners = geo.dot_partners
+
+        # Grow the path from an anchored end: if only max_num is placed, search
+        # the reversed numbering (v -> max_num + 1 - v) and flip it back afterwards
+        placed = puzzle.coordinate_num
+        self.reversed = 1 not in placed and self.max_num in placed
+        self.anchor = [-1] * (self.max_num + 2)             # value -> cell id of a placed value
+        self.fixed_mask = 0
+        for val, cell in placed.items():
+            if self.reversed:
+                val = self.max_num + 1 - val
+            self.anchor[val] = geo.index[cell]
+            self.fixed_mask |= 1 << geo.index[cell]
+
+        self.next_anchor = [0] * (self.max_num + 2)         # value -> smallest anchored value >= it
+        upcoming = 0
+        for v in range(self.max_num, 0, -1):
+            if self.anchor[v] >= 0:
+                upcoming = v
+            self.next_anchor[v] = upcoming
+
+    def _can_end(self, cell_id: int) -> bool:
+        last = self.anchor[self.max_num]
+        if last >= 0:
+            return last == cell_id
+        return not self.fixed_mask >> cell_id & 1
+
+    def _start_cells(self) -> List[int]:
+        if self.anchor[1] >= 0:
+            return [self.anchor[1]]
+        free = [c for c in range(self.geometry.cell_count) if not self.fixed_mask >> c & 1]
+        k = self.next_anchor[1]
+        if k:
+            row = self.graph.distance_row(self.anchor[k])
+            free = [c for c in free if 0 <= row[c] <= k - 1]
+        return free
+
+    def _candidates(self, path: List[int], order: Dict[int, int], visited: int) -> List[int]:
+        head = path[-1]
+        value = len(path)
+        nxt = value + 1
+
+        required = -1
+        for p in self.partners[head]:
+            if visited >> p & 1:
+                if order[p] != value - 1:
+                    self.stats.pruned_dots += 1
+                    return []
+            elif required >= 0 and required != p:
+                self.stats.pruned_dots += 1
+                return []
+            else:
+                required = p
+
+        target = self.anchor[nxt]
+        if target >= 0:
+            if not self.nbr_mask[head] >> target & 1 or required not in (-1, target):
+                return []
+            return [target]
+
+        k = self.next_anchor[nxt]
+        row = self.graph.distance_row(self.anchor[k]) if k else None
+        unvisited = self.all_mask & ~visited
+        cands = []
+        for nbr in self.neighbours[head]:
+            if visited >> nbr & 1 or self.fixed_mask >> nbr & 1:
+                continue
+            if required >= 0 and nbr != required:
+                continue
+            if row is not None and row[nbr] > k - nxt:
+                self.stats.pruned_distance += 1
+                continue
+            if any(visited >> p & 1 and p != head for p in self.partners[nbr]):
+                self.stats.pruned_dots += 1
+                continue
+            cands.append(nbr)
+
+        # Warnsdorff ordering: most constrained first (candidates are popped from the end)
+        cands.sort(key=lambda c: (self.nbr_mask[c] & unvisited).bit_count(), reverse=True)
+        return cands
+
+    def _feasible(self, head: int, nxt_cell: int, value: int, visited: int, end_forced: int) -> int:
+        """
+        Check the board after moving the head from `head` to `nxt_cell` (holding `value`).
+        Returns the (possibly newly) forced end cell, -2 if the move is dead.
+        """
+        if nxt_cell == end_forced and value != self.max_num:
+            self.stats.pruned_dead_end += 1
+            return -2
+        if value == self.max_num or not self.full_cover:
+            return end_forced
+
+        unvisited = self.all_mask & ~visited
+        usable = unvisited | 1 << nxt_cell
+        if not self.nbr_mask[nxt_cell] & unvisited:
+            self.stats.pruned_dead_end += 1
+            return -2
+
+        split_risk = False
+        for u in self.neighbours[head]:
+            if not unvisited >> u & 1:
+                continue
+            split_risk = True
+            free = (self.nbr_mask[u] & usable).bit_count()
+            if free == 0:
+                self.stats.pruned_dead_end += 1
+                return -2
+            if free == 1:
+                if not self._can_end(u) or end_forced not in (-1, u):
+                    self.stats.pruned_dead_end += 1
+                    return -2
+                end_forced = u
+
+        if split_risk:
+            reach = frontier = 1 << nxt_cell
+            while frontier:
+                grow = 0
+                mask = frontier
+                while mask:
+                    low = mask & -mask
+                    grow |= self.nbr_mask[low.bit_length() - 1]
+                    mask ^= low
+                frontier = grow & unvisited & ~reach
+                reach |= frontier
+            if unvisited & ~reach:
+                self.stats.pruned_connectivity += 1
+                return -2
+        return end_forced
+
+    def _tick(self, started: float) -> None:
+        self.stats.nodes += 1
+        if self.node_limit is not None and self.stats.nodes > self.node_limit:
+            self.stats.status = "node_limit"
+            raise _BudgetExceeded
+        if self.time_limit is not None and self.stats.nodes & 1023 == 0:
+            if time.perf_counter() - started > self.time_limit:
+                self.stats.status = "time_limit"
+                raise _BudgetExceeded
+
+    def _search(self, start: int, started: float) -> Optional[List[int]]:
+        path = [start]
+        order = {start: 1}                                  # cell id -> value on the path
+        visited = 1 << start
+        ends = [-1]
+        if self.max_num == 1:
+            return path
+        frames = [self._candidates(path, order, visited)]
+
+        while frames:
+            cands = frames[-1]
+            if not cands:
+                frames.pop()
+                cell = path.pop()
+                del order[cell]
+                visited &= ~(1 << cell)
+                ends.pop()
+                self.stats.backtracks += 1
+                continue
+
+            nxt_cell = cands.pop()
+            self._tick(started)
+            value = len(path) + 1
+            end_forced = self._feasible(path[-1], nxt_cell, value, visited | 1 << nxt_cell, ends[-1])
+            if end_forced == -2:
+                continue
+
+            order[nxt_cell] = value
+            path.append(nxt_cell)
+            visited |= 1 << nxt_cell
+            ends.append(end_forced)
+            if len(path) == self.max_num:
+                return path
+            frames.append(self._candidates(path, order, visited))
+        return None
+
+    def solve(self) -> Optional[PuzzleGrid]:
+        """Return the solved board, or None if unsatisfiable or out of budget (see stats.status)."""
+        self.stats = SolverStats()
+        started = time.perf_counter()
+        path = None
+        recorder = current_stats()
+        with recorder.phase("exact.solve"):
+            try:
+                if self.geometry.cell_count >= self.max_num:
+                    for start in self._start_cells():
+                        path = self._search(start, started)
+                        if path is not None:
+                            break
+                self.stats.status = "solved" if path is not None else "unsat"
+            except _BudgetExceeded:
+                path = None
+        self.stats.elapsed = time.perf_counter() - started
+        if recorder.enabled:
+            for name in ("nodes", "backtracks", "pruned_distance", "pruned_dots", "pruned_dead_end", "pruned_connectivity"):
+                recorder.count(f"exact.{name}", getattr(self.stats, name))
+
+        if path is None:
+            return None
+        solution = self.puzzle.clone()
+        coords = self.geometry.coords
+        for idx, cell_id in enumerate(path):
+            val = self.max_num - idx if self.reversed else idx + 1
+            if val in solution.coordinate_num:
+                continue
+            solution.assign(val, coords[cell_id])
+        return solution
@@ -0,0 +1,376 @@
+from bisect import bisect_left, insort
+from collections import deque
+from typing import Dict, List, Optional, Set, Tuple
+
+from .puzzle_grid import PuzzleGrid
+from .graph_utils import GraphUtils
+from .instrumentation import current_stats
+
+Cell = Tuple[int, int]
+
+PLACE = 0
+SPLIT = 1
+FAIL = 2
+
+class FeasibilityOracle:
+    """
+    Answers "can this partial board still be completed?" as values are
+    placed, using necessary conditions only: False means dead for certain,
+    True means nothing was found wrong.
+
+    Kept up to date per placement, touching only the placed cell, the cells of
+    its consecutive values and their neighbours:
+        - chain: v and v+1, both placed, must be neighbours,
+        - open ends: a placed v needs a distinct empty neighbour for each of
+          v-1 and v+1 still missing,
+        - dead ends (when every cell must be filled): an empty cell needs two
+          usable neighbours (empty, or placed with a missing consecutive
+          value); cells with only one must hold 1 or max_num, so there can be
+          at most as many of them as those endpoints are missing.
+    Empty cells are labelled by connected region. Placing a cell can only
+    split its region if its empty neighbours fall apart into several groups;
+    only then are the groups explored, in lockstep so the cost is that of the
+    smaller side. Regions produced by a split, and regions of at most
+    `scan_limit` cells touched by a placement, are checked against the runs
+    of missing values that can enter them: every run must find a region next
+    to both its anchors with room for it, and (with full cover) a region must
+    not be larger than the runs that can reach it.
+
+    checkpoint()/rollback() undo placements in LIFO order, as on PuzzleGrid.
+    """
+    def __init__(self, puzzle: PuzzleGrid, graph: GraphUtils, scan_limit: int = 16):
+        self.graph = graph
+        self.geometry = geo = graph.geometry
+        self.max_num = puzzle.max_num
+        self.scan_limit = scan_limit
+        self.full_cover = geo.cell_count == self.max_num
+        self.neighbours = geo.neighbours
+        self.nbr_mask = geo.neighbour_masks
+
+        n = geo.cell_count
+        self.cell_value: List[int] = [0] * n
+        self.value_cell: Dict[int, int] = {}
+        for val, cell in puzzle.coordinate_num.items():
+            self.cell_value[geo.index[cell]] = val
+            self.value_cell[val] = geo.index[cell]
+        self.placed: List[int] = sorted(self.value_cell)     # for run lookups
+        self.empty_nbrs = [sum(1 for nbr in nbrs if not self.cell_value[nbr]) for nbrs in geo.neighbours]
+
+        self.bad: Set[int] = set()                          # cells breaking a local rule
+        self.thin: Set[int] = set()                         # empty cells that can only be an endpoint
+        self.failures: List[str] = []                       # region / run failures, undone on rollback
+        self.trail: List[Tuple] = []
+
+        self.label: List[int] = [-1] * n
+        self.region_size: Dict[int, int] = {}
+        self.next_label = 0
+        for c in range(n):
+            if not self.cell_value[c] and self.label[c] < 0:
+                self._bfs_label(c, self._new_label())
+
+        for c in range(n):
+            self._update_local(c)
+        for label, seed in self._region_seeds().items():
+            self._check_region(seed, label)
+        for lo, hi in self._runs():
+            self._check_run(lo, hi)
+
+    # -- queries -----------------------------------------------------------------
+
+    def missing_endpoints(self) -> int:
+        if self.max_num == 1:
+            return int(1 not in self.value_cell)
+        return int(1 not in self.value_cell) + int(self.max_num not in self.value_cell)
+
+    def feasible(self) -> bool:
+        return not self.failures and not self.bad and len(self.thin) <= self.missing_endpoints()
+
+    def reason(self) -> Optional[str]:
+        """Why the board is dead, or None."""
+        if self.failures:
+            return self.failures[-1]
+        if self.bad:
+            c = min(self.bad)
+            return f"cell {self.geometry.coords[c]} cannot be linked to its consecutive values"
+        if len(self.thin) > self.missing_endpoints():
+            return f"{len(self.thin)} dead-end cells but only {self.missing_endpoints()} free endpoints"
+        return None
+
+    def _anchor_below(self, value: int) -> int:
+        i = bisect_left(self.placed, value)
+        return self.placed[i - 1] if i > 0 else 0
+
+    def _anchor_above(self, value: int) -> int:
+        i = bisect_left(self.placed, value + 1)
+        return self.placed[i] if i < len(self.placed) else self.max_num + 1
+
+    def _runs(self) -> List[Tuple[int, int]]:
+        """(lo, hi) anchor pairs around every run of missing values (0 / max_num+1 = open end)."""
+        bounds = [0] + self.placed + [self.max_num + 1]
+        return [(lo, hi) for lo, hi in zip(bounds, bounds[1:]) if hi - lo > 1]
+
+    # -- local rules -------------------------------------------------------------
+
+    def _open(self, value: int) -> bool:
+        """Placed `value` still has a missing consecutive value."""
+        return (value > 1 and value - 1 not in self.value_cell) or (
+            value < self.max_num and value + 1 not in self.value_cell
+        )
+
+    def _update_local(self, c: int) -> None:
+        value = self.cell_value[c]
+        self.bad.discard(c)
+        self.thin.discard(c)
+        if value:
+            need = 0
+            for side in (value - 1, value + 1):
+                if not 1 <= side <= self.max_num:
+                    continue
+                other = self.value_cell.get(side)
+                if other is None:
+                    need += 1
+                elif not self.nbr_mask[c] >> other & 1:
+                    self.bad.add(c)
+                    return
+            if self.empty_nbrs[c] < need:
+                self.bad.add(c)
+            return
+        if not self.full_cover or self.max_num == 1:
+            return
+        usable = self.empty_nbrs[c]
+        if usable < 2:
+            for nbr in self.neighbours[c]:
+                w = self.cell_value[nbr]
+                if w and self._open(w):
+                    usable += 1
+        if usable == 0:
+            self.bad.add(c)
+        elif usable == 1:
+            self.thin.add(c)
+
+    def _touched(self, value: int, cell_id: int) -> Set[int]:
+        cells = {cell_id, *self.neighbours[cell_id]}
+        for side in (value - 1, value + 1):
+            other = self.value_cell.get(side)
+            if other is not None:
+                cells.add(other)
+                cells.update(self.neighbours[other])
+        return cells
+
+    # -- regions -----------------------------------------------------------------
+
+    def _new_label(self) -> int:
+        self.next_label += 1
+        return self.next_label - 1
+
+    def _bfs_label(self, seed: int, label: int) -> None:
+        old = self.label[seed]
+        self.label[seed] = label
+        queue = deque([seed])
+        size = 1
+        while queue:
+            c = queue.popleft()
+            for nbr in self.neighbours[c]:
+                if not self.cell_value[nbr] and self.label[nbr] == old and nbr != seed:
+                    self.label[nbr] = label
+                    queue.append(nbr)
+                    size += 1
+        self.region_size[label] = size
+
+    def _region_seeds(self) -> Dict[int, int]:
+        seeds: Dict[int, int] = {}
+        for c, label in enumerate(self.label):
+            if label >= 0 and label not in seeds:
+                seeds[label] = c
+        return seeds
+
+    def _neighbour_groups(self, cell_id: int) -> List[int]:
+        """One empty neighbour of `cell_id` per group of mutually connected empty neighbours."""
+        empty = [nbr for nbr in self.neighbours[cell_id] if not self.cell_value[nbr]]
+        seeds = []
+        done = 0
+        mask = sum(1 << nbr for nbr in empty)
+        for nbr in empty:
+            if done >> nbr & 1:
+                continue
+            seeds.append(nbr)
+            group = frontier = 1 << nbr
+            while frontier:
+                low = frontier & -frontier
+                frontier ^= low
+                grow = self.nbr_mask[low.bit_length() - 1] & mask & ~group
+                group |= grow
+                frontier |= grow
+            done |= group
+        return seeds
+
+    def _split(self, cell_id: int, label: int) -> List[int]:
+        """
+        After `cell_id` left region `label`, relabel whatever got cut off.
+        Searches from each neighbour group advance one layer at a time and
+        merge when they meet; once at most one is still growing, every
+        finished one is a separate region. Returns the labels to check.
+        """
+        seeds = self._neighbour_groups(cell_id)
+        if len(seeds) < 2:
+            return [label] if self.region_size.get(label, 0) <= self.scan_limit else []
+
+        k = len(seeds)
+        parent = list(range(k))
+
+        def find(i: int) -> int:
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        owner = {s: i for i, s in enumerate(seeds)}
+        members = [[s] for s in seeds]
+        frontiers = [[s] for s in seeds]
+        while True:
+            roots = {find(i) for i in range(k)}
+            if len(roots) == 1:
+                return [label] if self.region_size[label] <= self.scan_limit else []
+            growing = {find(i) for i in range(k) if frontiers[i]}
+            if len(growing) <= 1:
+                break
+            for i in range(k):
+                new = []
+                for c in frontiers[i]:
+                    for nbr in self.neighbours[c]:
+                        if self.label[nbr] != label or self.cell_value[nbr]:
+                            continue
+                        o = owner.get(nbr)
+                        if o is None:
+                            owner[nbr] = i
+                            members[i].append(nbr)
+                            new.append(nbr)
+                        elif find(o) != find(i):
+                            parent[find(o)] = find(i)
+                frontiers[i] = new
+
+        groups: Dict[int, List[int]] = {}
+        for i in range(k):
+            groups.setdefault(find(i), []).extend(members[i])
+        if growing:
+            keep = next(iter(growing))
+        else:
+            keep = max(groups, key=lambda r: len(groups[r]))
+        labels = []
+        for root, cells in groups.items():
+            if root == keep:
+                continue
+            new_label = self._new_label()
+            for c in cells:
+                self.label[c] = new_label
+            self.region_size[new_label] = len(cells)
+            self.region_size[label] -= len(cells)
+            self.trail.append((SPLIT, new_label, cells, label))
+            labels.append(new_label)
+        current_stats().count("feasibility.splits")
+        if self.region_size[label] <= self.scan_limit:
+            labels.append(label)
+        return labels
+
+    def _fail(self, reason: str) -> None:
+        self.failures.append(reason)
+        self.trail.append((FAIL,))
+
+    def _check_run(self, lo: int, hi: int) -> None:
+        """The missing values strictly between anchors lo and hi need one region next to both."""
+        length = hi - lo - 1
+        ends = [self.value_cell[a] for a in (lo, hi) if 1 <= a <= self.max_num]
+        if not ends:
+            return
+        if length == 0:
+            return                                          # chain rule covers placed neighbours
+        if len(ends) == 2 and self.graph.distance_row(ends[0])[ends[1]] > length + 1:
+            self._fail(f"values {lo} and {hi} are too far apart")
+            return
+        regions = [{self.label[nbr] for nbr in self.neighbours[e] if not self.cell_value[nbr]} for e in ends]
+        common = regions[0] & regions[1] if len(regions) == 2 else regions[0]
+        if not any(self.region_size[r] >= length for r in common):
+            self._fail(f"no empty region can hold the {length} values between {lo} and {hi}")
+
+    def _check_region(self, seed: int, label: int) -> None:
+        """Runs that can enter the region (through an adjacent anchor) must cover it."""
+        runs: Set[Tuple[int, int]] = set()
+        seen = {seed}
+        queue = deque([seed])
+        while queue:
+            c = queue.popleft()
+            for nbr in self.neighbours[c]:
+                w = self.cell_value[nbr]
+                if w:
+                    if w > 1 and w - 1 not in self.value_cell:
+                        runs.add((self._anchor_below(w), w))
+                    if w < self.max_num and w + 1 not in self.value_cell:
+                        runs.add((w, self._anchor_above(w)))
+                elif nbr not in seen:
+                    seen.add(nbr)
+                    queue.append(nbr)
+        for lo, hi in runs:
+            self._check_run(lo, hi)
+        if self.full_cover and self.placed:
+            capacity = sum(hi - lo - 1 for lo, hi in runs)
+            if capacity < len(seen):
+                self._fail(f"empty region of {len(seen)} cells can be reached by only {capacity} values")
+
+    # -- updates -----------------------------------------------------------------
+
+    def place(self, value: int, cell_id: int) -> bool:
+        """Record `value` on empty cell `cell_id`; returns feasible()."""
+        label = self.label[cell_id]
+        self.cell_value[cell_id] = value
+        self.value_cell[value] = cell_id
+        insort(self.placed, value)
+        self.label[cell_id] = -1
+        self.region_size[label] -= 1
+        for nbr in self.neighbours[cell_id]:
+            self.empty_nbrs[nbr] -= 1
+        self.trail.append((PLACE, value, cell_id, label))
+
+        for c in self._touched(value, cell_id):
+            self._update_local(c)
+        to_check = self._split(cell_id, label)              # always, so labels stay exact
+        if self.feasible():
+            self._check_run(self._anchor_below(value), value)
+            self._check_run(value, self._anchor_above(value))
+            for region in to_check:
+                # Every region to check still borders the placed cell (or it is empty now)
+                seed = next((nbr for nbr in self.neighbours[cell_id] if self.label[nbr] == region), None)
+                if seed is not None:
+                    self._check_region(seed, region)
+        feasible = self.feasible()
+        if not feasible:
+            current_stats().count("feasibility.dead")
+        return feasible
+
+    def place_cell(self, value: int, cell: Cell) -> bool:
+        return self.place(value, self.geometry.index[cell])
+
+    def checkpoint(self) -> int:
+        return len(self.trail)
+
+    def rollback(self, mark: int) -> None:
+        while len(self.trail) > mark:
+            entry = self.trail.pop()
+            if entry[0] == FAIL:
+                self.failures.pop()
+            elif entry[0] == SPLIT:
+                _, new_label, cells, label = entry
+                for c in cells:
+                    self.label[c] = label
+                self.region_size[label] += len(cells)
+                del self.region_size[new_label]
+            else:
+                _, value, cell_id, label = entry
+                self.cell_value[cell_id] = 0
+                del self.value_cell[value]
+                del self.placed[bisect_left(self.placed, value)]
+                self.label[cell_id] = label
+                self.region_size[label] += 1
+                for nbr in self.neighbours[cell_id]:
+                    self.empty_nbrs[nbr] += 1
+                for c in self._touched(value, cell_id):
+                    self._update_local(c)
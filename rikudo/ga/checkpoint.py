@@ -0,0 +1,162 @@
+from typing import TYPE_CHECKING, Dict, Tuple
+import hashlib
+import json
+import mmap
+import os
+import struct
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from .engine import GeneticAlgorithm
+
+MAGIC = b"RKGACKPT"
+VERSION = 1
+PAGE = mmap.ALLOCATIONGRANULARITY
+
+# magic, version, population size, genome length, visited capacity, visited ways, slot size, active slot, puzzle digest
+FILE_HEADER = struct.Struct("<8sIIIIIQi16s")
+# sequence, generation, evaluations, score hits, visited size, visited evictions, meta length
+SLOT_HEADER = struct.Struct("<QQQQQQI")
+META_SIZE = 4096 - SLOT_HEADER.size
+
+
+def _round_up(size: int, to: int = PAGE) -> int:
+    return -(-size // to) * to
+
+
+def puzzle_digest(ga: "GeneticAlgorithm") -> bytes:
+    return hashlib.sha256(str(ga.puzzle).encode()).digest()[:16]
+
+
+class GACheckpoint:
+    """
+    Memory-mapped snapshot of a GeneticAlgorithm's complete search state:
+    population matrix, scores, Zobrist hashes, the visited table, the NumPy
+    generator's state, the Zobrist salt and the generation/evaluation counters.
+
+    The file holds two slots and a header naming the active one. save()
+    copies the arrays into the inactive slot, flushes it, then flips the
+    header, so a crash mid-save leaves the previous snapshot intact and a
+    checkpoint costs a few memcpys plus an msync rather than a text dump.
+    Opening an existing file checks that it was written for the same puzzle
+    and population shape.
+    """
+    def __init__(self, path: str, ga: "GeneticAlgorithm"):
+        self.path = path
+        pop_size, genome = ga.population_size, ga.puzzle.max_num
+        capacity, ways = ga.visited.capacity, ga.visited.ways
+        self.shape = (pop_size, genome)
+        self.digest = puzzle_digest(ga)
+
+        # Offsets of each array inside a slot, after the slot's own header page
+        layout = [
+            ("population", np.int32, pop_size * genome),
+            ("scores", np.int64, pop_size),
+            ("hashes", np.uint64, pop_size),
+            ("visited_hashes", np.uint64, capacity),
+            ("visited_payload", np.int64, capacity),
+            ("visited_cursor", np.uint8, capacity // ways),
+        ]
+        self.layout: Dict[str, Tuple[int, np.dtype, int]] = {}
+        offset = 4096
+        for name, dtype, count in layout:
+            offset = _round_up(offset, 8)
+            self.layout[name] = (offset, np.dtype(dtype), count)
+            offset += np.dtype(dtype).itemsize * count
+        self.slot_size = _round_up(offset)
+        header = FILE_HEADER.pack(MAGIC, VERSION, pop_size, genome, capacity, ways, self.slot_size, -1, self.digest)
+        size = PAGE + 2 * self.slot_size
+
+        fresh = not os.path.exists(path) or os.path.getsize(path) == 0
+        self.file = open(path, "w+b" if fresh else "r+b")
+        if fresh:
+            self.file.truncate(size)
+            self.file.write(header)
+            self.file.flush()
+        self.mm = mmap.mmap(self.file.fileno(), 0)
+
+        magic, version, *shape, slot_size, self.active, digest = FILE_HEADER.unpack_from(self.mm, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} GA checkpoint")
+        if digest != self.digest:
+            raise ValueError(f"{path} was written for a different puzzle")
+        if tuple(shape) != (pop_size, genome, capacity, ways) or slot_size != self.slot_size:
+            raise ValueError(f"{path} holds a population of shape {tuple(shape[:2])}, expected {self.shape}")
+
+    def close(self) -> None:
+        self.mm.close()
+        self.file.close()
+
+    def __enter__(self) -> "GACheckpoint":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def _array(self, slot: int, name: str) -> np.ndarray:
+        offset, dtype, count = self.layout[name]
+        return np.frombuffer(self.mm, dtype=dtype, count=count, offset=PAGE + slot * self.slot_size + offset)
+
+    @property
+    def empty(self) -> bool:
+        return self.active < 0
+
+    @property
+    def sequence(self) -> int:
+        """Number of snapshots written to this file so far."""
+        if self.empty:
+            return 0
+        return SLOT_HEADER.unpack_from(self.mm, PAGE + self.active * self.slot_size)[0]
+
+    def save(self, ga: "GeneticAlgorithm") -> None:
+        slot = 1 - self.active if self.active >= 0 else 0
+        base = PAGE + slot * self.slot_size
+        visited = ga.visited
+
+        self._array(slot, "population")[:] = ga.population.ravel()
+        self._array(slot, "scores")[:] = ga.scores
+        self._array(slot, "hashes")[:] = ga.hashes
+        self._array(slot, "visited_hashes")[:] = np.frombuffer(visited.hashes, dtype=np.uint64)
+        self._array(slot, "visited_payload")[:] = np.frombuffer(visited.payload, dtype=np.int64)
+        self._array(slot, "visited_cursor")[:] = np.frombuffer(visited.cursor, dtype=np.uint8)
+        meta = json.dumps({"rng": ga.rng.bit_generator.state, "zobrist_salt": ga.hasher.salt}).encode()
+        if len(meta) > META_SIZE:
+            raise ValueError(f"RNG state of {len(meta)} bytes does not fit the {META_SIZE}-byte checkpoint header")
+        SLOT_HEADER.pack_into(
+            self.mm, base,
+            self.sequence + 1, ga.generation, ga.evaluations, ga.score_hits, visited.size, visited.evictions, len(meta),
+        )
+        self.mm[base + SLOT_HEADER.size:base + SLOT_HEADER.size + len(meta)] = meta
+        self.mm.flush(base, self.slot_size)
+
+        # Only now point the header at the new slot
+        self.active = slot
+        FILE_HEADER.pack_into(self.mm, 0, MAGIC, VERSION, *self.shape, visited.capacity, visited.ways,
+                              self.slot_size, slot, self.digest)
+        self.mm.flush(0, PAGE)
+
+    def restore(self, ga: "GeneticAlgorithm") -> bool:
+        """Load the last snapshot into `ga`; False (and `ga` untouched) if none was saved yet."""
+        if self.empty:
+            return False
+        slot = self.active
+        base = PAGE + slot * self.slot_size
+        _, generation, evaluations, score_hits, size, evictions, meta_len = SLOT_HEADER.unpack_from(self.mm, base)
+        meta = json.loads(bytes(self.mm[base + SLOT_HEADER.size:base + SLOT_HEADER.size + meta_len]))
+
+        ga.population = self._array(slot, "population").reshape(self.shape).copy()
+        ga.scores = self._array(slot, "scores").copy()
+        ga.hashes = self._array(slot, "hashes").copy()
+        visited = ga.visited
+        np.frombuffer(visited.hashes, dtype=np.uint64)[:] = self._array(slot, "visited_hashes")
+        np.frombuffer(visited.payload, dtype=np.int64)[:] = self._array(slot, "visited_payload")
+        np.frombuffer(visited.cursor, dtype=np.uint8)[:] = self._array(slot, "visited_cursor")
+        visited.size = size
+        visited.evictions = evictions
+        ga.rng.bit_generator.state = meta["rng"]
+        ga.hasher.salt = meta["zobrist_salt"]                # the stored hashes are only valid under the same keys
+        ga.generation = generation
+        ga.evaluations = evaluations
+        ga.score_hits = score_hits
+        return True
@@ -0,0 +1,153 @@
+from typing import Optional
+
+import numpy as np
+
+from ..compact_grid import GridGeometry
+
+OPERATORS = ("order", "cycle", "edge")
+
+class PermutationCrossover:
+    """
+    Batched crossover over population matrices (column v-1 = cell id of v).
+
+    Only the `free` columns are recombined; fixed columns are copied from the
+    first parent. Each operator takes two (P x max_num) parent matrices and
+    returns P children in one pass of array operations. Every child gives its
+    free values distinct cells drawn from its parents' cells, so it stays a
+    permutation of the empty cells. When the parents use different subsets of
+    the empty cells, a child may mix the two subsets.
+        - order:  order crossover (OX). A random slice of parent A is kept in
+                  place and the remaining positions get B's other cells in
+                  B's order, starting after the slice.
+        - cycle:  uniform cycle crossover. Each position cycle between the
+                  parents is taken whole from A or from B. Rows whose parents
+                  cover different cell sets fall back to order crossover.
+        - edge:   run-preserving crossover. Runs of consecutive values on
+                  adjacent cells in A (the chains Depth2Engine and the walk
+                  seeder lay down) are kept or dropped as units. B then keeps
+                  every cell it can in place, so its own runs survive too, and
+                  the leftovers are filled in B's order.
+    """
+    def __init__(self, geometry: GridGeometry, free: np.ndarray, rng: Optional[np.random.Generator] = None):
+        self.geometry = geometry
+        self.free = np.asarray(free, dtype=np.intp)
+        self.rng = rng if rng is not None else np.random.default_rng()
+        self.cell_count = geometry.cell_count
+
+        # Neighbour table padded with -2 so it never matches an unplaced (-1) cell
+        width = max((len(nbrs) for nbrs in geometry.neighbours), default=0)
+        self.neighbour_table = np.full((self.cell_count, max(width, 1)), -2, dtype=np.int32)
+        for cell_id, nbrs in enumerate(geometry.neighbours):
+            self.neighbour_table[cell_id, :len(nbrs)] = nbrs
+
+    def apply(self, operator: str, a: np.ndarray, b: np.ndarray) -> np.ndarray:
+        if operator not in OPERATORS:
+            raise ValueError(f"Unknown crossover {operator!r}, expected one of {OPERATORS}")
+        if len(a) == 0 or len(self.free) < 2:
+            return a.copy()
+        return getattr(self, operator)(a, b)
+
+    def _membership(self, genes: np.ndarray, where: Optional[np.ndarray] = None) -> np.ndarray:
+        """(P x cell_count) mask of the cells in each row of `genes` (optionally only where `where`)."""
+        member = np.zeros((len(genes), self.cell_count), dtype=bool)
+        rows = np.broadcast_to(np.arange(len(genes))[:, None], genes.shape)
+        if where is None:
+            where = genes >= 0
+        else:
+            where = where & (genes >= 0)
+        member[rows[where], genes[where]] = True
+        return member
+
+    @staticmethod
+    def _fill(child: np.ndarray, open_: np.ndarray, items: np.ndarray, usable: np.ndarray) -> None:
+        """Per row, write the usable `items` in order into the open positions of `child` in order."""
+        n = child.shape[1]
+        positions = np.argsort(~open_, axis=1, kind="stable")
+        picks = np.argsort(~usable, axis=1, kind="stable")[:, :n]
+        take = np.arange(n)[None, :] < open_.sum(axis=1)[:, None]
+        rows = np.nonzero(take)[0]
+        child[rows, positions[take]] = np.take_along_axis(items, picks, axis=1)[take]
+
+    def _spare(self, genes_a: np.ndarray, genes_b: np.ndarray, used: np.ndarray) -> np.ndarray:
+        """Candidate cells B then A, and which are still free to place (each cell at most once)."""
+        in_b = self._membership(genes_b)
+        rows = np.arange(len(genes_a))[:, None]
+        usable_b = (genes_b >= 0) & ~used[rows, genes_b]
+        usable_a = (genes_a >= 0) & ~used[rows, genes_a] & ~in_b[rows, genes_a]
+        return np.concatenate([usable_b, usable_a], axis=1)
+
+    def _order(self, genes_a: np.ndarray, genes_b: np.ndarray) -> np.ndarray:
+        count, n = genes_a.shape
+        rows = np.arange(count)[:, None]
+        cuts = np.sort(self.rng.integers(0, n + 1, size=(count, 2)), axis=1)
+        start, stop = cuts[:, :1], cuts[:, 1:]
+
+        # Rotate every row so the slice ends at the back and filling starts right after it
+        rotation = (stop + np.arange(n)[None, :]) % n
+        a_rot = genes_a[rows, rotation]
+        b_rot = genes_b[rows, rotation]
+        kept = np.arange(n)[None, :] >= n - (stop - start)
+        child = np.where(kept, a_rot, -1)
+        used = self._membership(a_rot, kept)
+        items = np.concatenate([b_rot, a_rot], axis=1)
+        self._fill(child, ~kept, items, self._spare(a_rot, b_rot, used))
+
+        out = np.empty_like(child)
+        out[rows, rotation] = child
+        return out
+
+    def _cycle(self, genes_a: np.ndarray, genes_b: np.ndarray) -> np.ndarray:
+        count, n = genes_a.shape
+        rows = np.arange(count)[:, None]
+        where_a = np.full((count, self.cell_count + 1), -1, dtype=np.intp)   # last column catches -1 cells
+        where_a[rows, genes_a] = np.arange(n)[None, :]
+        succ = where_a[rows, genes_b]
+        same_cells = (succ >= 0).all(axis=1)
+        succ = np.where(succ >= 0, succ, np.arange(n)[None, :])
+
+        # Label each position with the smallest position on its cycle by pointer doubling
+        label = np.broadcast_to(np.arange(n), (count, n)).copy()
+        for _ in range(max(1, int(n - 1).bit_length())):
+            label = np.minimum(label, np.take_along_axis(label, succ, axis=1))
+            succ = np.take_along_axis(succ, succ, axis=1)
+        from_a = self.rng.random((count, n)) < 0.5
+        child = np.where(np.take_along_axis(from_a, label, axis=1), genes_a, genes_b)
+
+        if not same_cells.all():
+            mixed = ~same_cells
+            child[mixed] = self._order(genes_a[mixed], genes_b[mixed])
+        return child
+
+    def _edge(self, a: np.ndarray, b: np.ndarray) -> np.ndarray:
+        count = len(a)
+        rows = np.arange(count)[:, None]
+
+        # Runs of A: consecutive values on neighbouring cells share a label
+        linked = (self.neighbour_table[a[:, :-1]] == a[:, 1:, None]).any(axis=2) & (a[:, :-1] >= 0)
+        labels = np.concatenate([np.zeros((count, 1), dtype=np.intp), np.cumsum(~linked, axis=1)], axis=1)
+        keep_run = self.rng.random(labels.shape) < 0.5
+        genes_a, genes_b = a[:, self.free], b[:, self.free]
+        kept = np.take_along_axis(keep_run, labels[:, self.free], axis=1)
+
+        child = np.where(kept, genes_a, -1)
+        used = self._membership(genes_a, kept)
+        in_place = ~kept & (genes_b >= 0) & ~used[rows, genes_b]
+        child[in_place] = genes_b[in_place]
+        used |= self._membership(genes_b, in_place)
+        items = np.concatenate([genes_b, genes_a], axis=1)
+        self._fill(child, ~(kept | in_place), items, self._spare(genes_a, genes_b, used))
+        return child
+
+    def _recombine(self, a: np.ndarray, genes: np.ndarray) -> np.ndarray:
+        children = a.copy()
+        children[:, self.free] = genes
+        return children
+
+    def order(self, a: np.ndarray, b: np.ndarray) -> np.ndarray:
+        return self._recombine(a, self._order(a[:, self.free], b[:, self.free]))
+
+    def cycle(self, a: np.ndarray, b: np.ndarray) -> np.ndarray:
+        return self._recombine(a, self._cycle(a[:, self.free], b[:, self.free]))
+
+    def edge(self, a: np.ndarray, b: np.ndarray) -> np.ndarray:
+        return self._recombine(a, self._edge(a, b))
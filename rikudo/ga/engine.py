@@ -0,0 +1,256 @@
+from typing import Optional, Tuple
+import time
+
+import numpy as np
+
+from ..puzzle_grid import PuzzleGrid
+from ..graph_utils import GraphUtils
+from ..variant_generators.depth2_engine import Depth2Engine
+from ..variant_generators.random_seeder import RandomSeeder
+from ..variant_generators.walk_seeder import DistanceGuidedSeeder
+from ..instrumentation import current_stats
+from .fitness import BatchFitnessEvaluator
+from .local_search import LocalSearch
+from .checkpoint import GACheckpoint
+from .crossover import OPERATORS, PermutationCrossover
+from .zobrist import TabuTable, ZobristHasher, first_occurrences
+
+SEEDERS = ("depth2", "random", "walk")
+
+class GeneticAlgorithm:
+    """
+    Single-population GA over value -> cell assignment matrices.
+
+    Columns of values already fixed on the puzzle never change; mutation swaps
+    the cells of two free values, so every individual stays a permutation of
+    the empty cells. With `crossover` ("order", "cycle" or "edge", see
+    PermutationCrossover) a `crossover_rate` share of children is first
+    recombined with a second tournament winner, all in one batch.
+
+    Every individual carries a Zobrist hash, updated per swap. Seeds and
+    children that duplicate another individual are reshuffled or mutated
+    again, and scores of boards seen recently are reused from a fixed-size
+    visited table instead of being evaluated twice.
+
+    With a `checkpoint` path the whole search state is snapshotted to that
+    memory-mapped file every `checkpoint_interval` seconds of run() and when
+    it returns. If the file already holds a snapshot for this puzzle, seeding
+    is skipped and the run continues from it exactly. The file stays open
+    across run() calls until close() (or the end of a with block).
+    """
+    def __init__(
+        self,
+        puzzle: PuzzleGrid,
+        graph: GraphUtils,
+        population_size: int = 200,
+        mutation_rate: float = 0.3,
+        tournament_size: int = 3,
+        elite: int = 2,
+        seeder: str = "depth2",
+        seed: Optional[int] = None,
+        polish_steps: int = 0,
+        visited_capacity: int = 1 << 16,
+        checkpoint: Optional[str] = None,
+        checkpoint_interval: float = 60.0,
+        crossover: Optional[str] = None,
+        crossover_rate: float = 0.5,
+    ):
+        if seeder not in SEEDERS:
+            raise ValueError(f"Unknown seeder {seeder!r}, expected one of {SEEDERS}")
+        if crossover is not None and crossover not in OPERATORS:
+            raise ValueError(f"Unknown crossover {crossover!r}, expected one of {OPERATORS}")
+
+        self.puzzle = puzzle
+        self.graph = graph
+        self.evaluator = BatchFitnessEvaluator(puzzle, graph)
+        self.population_size = population_size
+        self.mutation_rate = mutation_rate
+        self.tournament_size = tournament_size
+        self.elite = min(elite, population_size)
+        self.rng = np.random.default_rng(seed)
+
+        self.free = np.array(
+            [v - 1 for v in range(1, puzzle.max_num + 1) if v not in puzzle.fixed_nums],
+            dtype=np.intp,
+        )
+        self.crossover = crossover
+        self.crossover_rate = crossover_rate
+        self.recombiner = PermutationCrossover(self.evaluator.geometry, self.free, self.rng) if crossover else None
+        self.generation = 0
+        self.evaluations = 0
+        self.score_hits = 0                                 # children scored from the visited table
+        self.hasher = ZobristHasher(self.evaluator.geometry.cell_count, seed or 0)
+        self.visited = TabuTable(visited_capacity)
+        self.checkpoint_interval = checkpoint_interval
+        self.checkpoint = GACheckpoint(checkpoint, self) if checkpoint else None
+        try:
+            self.resumed = self.checkpoint is not None and self.checkpoint.restore(self)
+            if not self.resumed:
+                self.initialise(seeder, seed, polish_steps)
+        except BaseException:
+            self.close()
+            raise
+
+    def close(self) -> None:
+        """Release the checkpoint file and its mapping; later saves are skipped."""
+        if self.checkpoint is not None:
+            self.checkpoint.close()
+            self.checkpoint = None
+
+    def __enter__(self) -> "GeneticAlgorithm":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def initialise(self, seeder: str, seed: Optional[int], polish_steps: int) -> None:
+        """Seed, dedupe, optionally polish and score the first population."""
+        puzzle, graph = self.puzzle, self.graph
+        self.population = self.seed_population(seeder, seed)
+        self.dedupe_seeds()
+        if polish_steps > 0:
+            # Anneal every seed with O(1) delta moves before the GA takes over
+            with current_stats().phase("ga.polish_seeds"):
+                search = LocalSearch(puzzle, graph, seed=seed)
+                self.population, self.scores = search.polish(self.population, polish_steps)
+            self.evaluations += search.moves
+        else:
+            self.scores = self.evaluator.evaluate(self.population)
+            self.evaluations += len(self.population)
+        self.hashes = self.hasher.hash_population(self.population)
+        self.visited.add_many(self.hashes, self.scores)
+
+    def seed_population(self, seeder: str, seed: Optional[int]) -> np.ndarray:
+        with current_stats().phase("ga.seed_population", seeder=seeder):
+            return self._seed_population(seeder, seed)
+
+    def _seed_population(self, seeder: str, seed: Optional[int]) -> np.ndarray:
+        variants = []
+        if seeder == "depth2":
+            variants = Depth2Engine(self.puzzle, self.graph).sample_variants(self.population_size, seed)
+        elif seeder == "walk":
+            generator = DistanceGuidedSeeder(self.puzzle, self.graph, seed=seed)
+            variants = generator.generate_variants(self.population_size)
+        shortfall = self.population_size - len(variants)
+        if shortfall > 0:
+            variants += RandomSeeder(self.puzzle, seed=seed, geometry=self.graph.geometry).generate_variants(limit=shortfall)
+        return self.evaluator.encode(variants)
+
+    def dedupe_seeds(self, attempts: int = 3) -> int:
+        """Reshuffle the free cells of seeds that duplicate an earlier seed; returns how many remain duplicated."""
+        dups = np.zeros(len(self.population), dtype=bool)
+        for _ in range(attempts):
+            dups = ~first_occurrences(self.hasher.hash_population(self.population))
+            if not dups.any() or len(self.free) < 2:
+                break
+            for row in np.nonzero(dups)[0]:
+                self.population[row, self.free] = self.rng.permutation(self.population[row, self.free])
+        current_stats().count("ga.duplicate_seeds", int(dups.sum()))
+        return int(dups.sum())
+
+    @property
+    def best_score(self) -> int:
+        return int(self.scores.min())
+
+    def best(self) -> Tuple[np.ndarray, int]:
+        idx = int(np.argmin(self.scores))
+        return self.population[idx].copy(), int(self.scores[idx])
+
+    def elites(self, count: int) -> np.ndarray:
+        order = np.argsort(self.scores, kind="stable")[:count]
+        return self.population[order].copy()
+
+    def select(self, count: int) -> np.ndarray:
+        """Tournament selection; returns row indices into the population."""
+        contenders = self.rng.integers(len(self.population), size=(count, self.tournament_size))
+        winners = np.argmin(self.scores[contenders], axis=1)
+        return contenders[np.arange(count), winners]
+
+    def mutate(self, children: np.ndarray, hashes: Optional[np.ndarray] = None, rows: Optional[np.ndarray] = None) -> None:
+        """
+        Swap two free values in each row picked by the mutation rate (or in
+        every row of `rows`), keeping `hashes` in step.
+        """
+        if len(self.free) < 2:
+            return
+        if rows is None:
+            rows = np.nonzero(self.rng.random(len(children)) < self.mutation_rate)[0]
+        i = self.free[self.rng.integers(len(self.free), size=len(rows))]
+        j = self.free[self.rng.integers(len(self.free), size=len(rows))]
+        cells_i = children[rows, i].copy()
+        cells_j = children[rows, j].copy()
+        children[rows, i] = cells_j
+        children[rows, j] = cells_i
+        if hashes is not None:
+            hashes[rows] ^= self.hasher.swap_delta(i + 1, j + 1, cells_i, cells_j)
+
+    def step(self) -> None:
+        parents = self.select(len(self.population) - self.elite)
+        children = self.population[parents]
+        child_hashes = self.hashes[parents]
+        if self.recombiner is not None:
+            rows = np.nonzero(self.rng.random(len(children)) < self.crossover_rate)[0]
+            if len(rows):
+                mates = self.select(len(rows))
+                children[rows] = self.recombiner.apply(self.crossover, children[rows], self.population[mates])
+                child_hashes[rows] = self.hasher.hash_population(children[rows])
+                current_stats().count("ga.crossovers", len(rows))
+        self.mutate(children, child_hashes)
+
+        # Children identical to an elite or an earlier child get one more swap
+        keep = np.argsort(self.scores, kind="stable")[:self.elite]
+        dups = ~first_occurrences(np.concatenate([self.hashes[keep], child_hashes]))[self.elite:]
+        if dups.any():
+            self.mutate(children, child_hashes, rows=np.nonzero(dups)[0])
+
+        found, cached = self.visited.lookup_many(child_hashes)
+        child_scores = cached.astype(self.scores.dtype)
+        fresh = np.nonzero(~found)[0]
+        if len(fresh):
+            child_scores[fresh] = self.evaluator.evaluate(children[fresh])
+            self.visited.add_many(child_hashes[fresh], child_scores[fresh])
+
+        self.population = np.vstack([self.population[keep], children])
+        self.scores = np.concatenate([self.scores[keep], child_scores])
+        self.hashes = np.concatenate([self.hashes[keep], child_hashes])
+        self.generation += 1
+        self.evaluations += len(fresh)
+        self.score_hits += len(children) - len(fresh)
+        stats = current_stats()
+        if stats.enabled:
+            stats.count("ga.generations")
+            stats.count("ga.evaluations", len(fresh))
+            stats.count("ga.score_hits", len(children) - len(fresh))
+            stats.count("ga.duplicate_children", int(dups.sum()))
+
+    def receive_migrants(self, migrants: np.ndarray) -> None:
+        """Replace the worst individuals with incoming migrants."""
+        if len(migrants) == 0:
+            return
+        migrants = migrants[:len(self.population)]
+        scores = self.evaluator.evaluate(migrants)
+        worst = np.argsort(self.scores, kind="stable")[-len(migrants):]
+        self.population[worst] = migrants
+        self.scores[worst] = scores
+        self.hashes[worst] = self.hasher.hash_population(migrants)
+        self.evaluations += len(migrants)
+        current_stats().count("ga.migrants", len(migrants))
+
+    def save_checkpoint(self) -> None:
+        if self.checkpoint is not None:
+            with current_stats().phase("ga.checkpoint"):
+                self.checkpoint.save(self)
+
+    def run(self, max_generations: int, time_limit: Optional[float] = None) -> Tuple[np.ndarray, int]:
+        start = last_saved = time.perf_counter()
+        with current_stats().phase("ga.run"):
+            while self.generation < max_generations and self.best_score > 0:
+                now = time.perf_counter()
+                if time_limit is not None and now - start >= time_limit:
+                    break
+                if self.checkpoint is not None and now - last_saved >= self.checkpoint_interval:
+                    self.save_checkpoint()
+                    last_saved = now
+                self.step()
+        self.save_checkpoint()
+        return self.best()
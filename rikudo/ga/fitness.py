@@ -0,0 +1,104 @@
+from typing import Iterable, NamedTuple, Tuple, Union
+
+import numpy as np
+
+from ..puzzle_grid import PuzzleGrid
+from ..graph_utils import GraphUtils
+from ..compact_grid import CompactGrid
+
+class FitnessBreakdown(NamedTuple):
+    scores: np.ndarray                                      # (P,) total violations per individual
+    adjacency: np.ndarray                                   # (P, max_num - 1) True where v, v+1 are not adjacent
+    dots: np.ndarray                                        # (P, dot_count) True where the dot pair is not consecutive
+
+
+class BatchFitnessEvaluator:
+    """
+    Scores a whole GA population at once.
+
+    A population is a (P x max_num) int matrix: column v-1 holds the cell id of
+    value v in that individual, -1 if v is unplaced. The score of an individual
+    is the number of consecutive pairs on non-adjacent cells plus the number of
+    dots whose two cells do not hold consecutive values; 0 means solved.
+    """
+    def __init__(self, puzzle: PuzzleGrid, graph: GraphUtils, dot_weight: int = 1):
+        self.puzzle = puzzle
+        self.graph = graph
+        self.geometry = graph.geometry
+        self.max_num = puzzle.max_num
+        self.dot_weight = dot_weight
+
+        n = self.geometry.cell_count
+        # One extra row/column so that index -1 (unplaced) is never adjacent to anything
+        self.adjacency = np.zeros((n + 1, n + 1), dtype=bool)
+        index = self.geometry.index
+        for cell, neighbours in graph.adjacency_dict.items():
+            for nbr in neighbours:
+                self.adjacency[index[cell], index[nbr]] = True
+
+        dot_ids = np.array(self.geometry.dot_ids, dtype=np.int32).reshape(-1, 2)
+        self.dot_a = dot_ids[:, 0]
+        self.dot_b = dot_ids[:, 1]
+
+    def encode(self, variants: Iterable[Union[PuzzleGrid, CompactGrid]]) -> np.ndarray:
+        """Convert seeded boards (e.g. from a PuzzleVariantGenerator) into a population matrix."""
+        rows = []
+        index = self.geometry.index
+        for variant in variants:
+            if isinstance(variant, CompactGrid):
+                rows.append(np.frombuffer(variant.value_cells(), dtype=np.int32))
+                continue
+            row = np.full(self.max_num, -1, dtype=np.int32)
+            for val, cell in variant.coordinate_num.items():
+                row[val - 1] = index[cell]
+            rows.append(row)
+
+        if not rows:
+            return np.empty((0, self.max_num), dtype=np.int32)
+        return np.vstack(rows)
+
+    def decode(self, individual: np.ndarray) -> PuzzleGrid:
+        """Build a PuzzleGrid for one row of a population matrix."""
+        board = self.puzzle.clone()
+        coords = self.geometry.coords
+        for row in board.cells:
+            for c, val in enumerate(row):
+                if val > 0:
+                    row[c] = 0
+        board.fixed_nums = {}
+        for val, cell_id in enumerate(individual.tolist(), start=1):
+            if cell_id >= 0:
+                r, c = coords[cell_id]
+                board.cells[r][c] = val
+                board.fixed_nums[val] = (r, c)
+        board.empty_cells = [
+            cell for cell in coords if board.cells[cell[0]][cell[1]] == 0
+        ]
+        board.calculate_coordinates()
+        return board
+
+    def _violations(self, population: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        population = np.asarray(population)
+        adjacency = ~self.adjacency[population[:, :-1], population[:, 1:]]
+
+        if len(self.dot_a) == 0:
+            return adjacency, np.zeros((len(population), 0), dtype=bool)
+
+        # Invert value -> cell into cell -> value; unplaced values land in the spare column
+        values = np.zeros((len(population), self.geometry.cell_count + 1), dtype=np.int32)
+        rows = np.arange(len(population))[:, None]
+        values[rows, population] = np.arange(1, self.max_num + 1, dtype=np.int32)
+        values[:, -1] = 0
+        a = values[:, self.dot_a]
+        b = values[:, self.dot_b]
+        dots = (np.abs(a - b) != 1) | (a == 0) | (b == 0)
+        return adjacency, dots
+
+    def evaluate(self, population: np.ndarray) -> np.ndarray:
+        adjacency, dots = self._violations(population)
+        return adjacency.sum(axis=1) + self.dot_weight * dots.sum(axis=1)
+
+    def evaluate_detailed(self, population: np.ndarray) -> FitnessBreakdown:
+        adjacency, dots = self._violations(population)
+        scores = adjacency.sum(axis=1) + self.dot_weight * dots.sum(axis=1)
+        return FitnessBreakdown(scores, adjacency, dots)
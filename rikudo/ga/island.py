@@ -0,0 +1,268 @@
+from typing import Dict, List, NamedTuple, Optional, Tuple
+import multiprocessing as mp
+import os
+import queue
+import time
+
+import numpy as np
+
+from ..puzzle_grid import PuzzleGrid
+from ..graph_utils import GraphUtils
+from .engine import GeneticAlgorithm, SEEDERS
+from .fitness import BatchFitnessEvaluator
+
+TOPOLOGIES = ("ring", "all", "none")
+
+class IslandReport(NamedTuple):
+    island: int
+    seeder: str
+    generations: int
+    evaluations: int
+    elapsed: float
+    best_score: int
+    best: List[int]                                         # value -> cell id assignment of the island's best
+
+
+class IslandResult(NamedTuple):
+    best: PuzzleGrid
+    best_score: int
+    solved: bool
+    elapsed: float
+    generations: int
+    evaluations: int
+    reports: List[IslandReport]
+
+    @property
+    def generations_per_sec(self) -> float:
+        return self.generations / self.elapsed if self.elapsed > 0 else 0.0
+
+    @property
+    def evaluations_per_sec(self) -> float:
+        return self.evaluations / self.elapsed if self.elapsed > 0 else 0.0
+
+
+def migration_sources(island: int, islands: int, topology: str) -> List[int]:
+    """Islands whose migrants `island` receives."""
+    if topology == "ring":
+        return [(island - 1) % islands] if islands > 1 else []
+    if topology == "all":
+        return [src for src in range(islands) if src != island]
+    return []
+
+
+class _Mailboxes:
+    """
+    One shared-memory slot per island holding its latest emigrants, plus a
+    version counter so readers only copy slots that changed. Nothing is
+    pickled and a full slot never blocks the writer.
+    """
+    def __init__(self, ctx, islands: int, migrants: int, genome_length: int):
+        self.migrants = migrants
+        self.genome_length = genome_length
+        self.slot_size = migrants * genome_length
+        self.slots = ctx.RawArray("i", islands * self.slot_size)
+        self.versions = ctx.RawArray("q", islands)
+        self.locks = [ctx.Lock() for _ in range(islands)]
+
+    def _view(self, island: int) -> np.ndarray:
+        flat = np.frombuffer(self.slots, dtype=np.int32)
+        start = island * self.slot_size
+        return flat[start:start + self.slot_size].reshape(self.migrants, self.genome_length)
+
+    def post(self, island: int, emigrants: np.ndarray) -> None:
+        with self.locks[island]:
+            self._view(island)[:len(emigrants)] = emigrants
+            self.versions[island] += 1
+
+    def collect(self, island: int, seen: int) -> Tuple[int, Optional[np.ndarray]]:
+        """Return (version, migrants); migrants is None if nothing new since `seen`."""
+        if self.versions[island] == seen:
+            return seen, None
+        with self.locks[island]:
+            return self.versions[island], self._view(island).copy()
+
+
+def _island_main(
+    island: int,
+    puzzle_text: str,
+    config: Dict,
+    mailboxes: _Mailboxes,
+    stop,
+    results,
+) -> None:
+    puzzle = PuzzleGrid.parse(puzzle_text)
+    graph = GraphUtils(puzzle)
+    ga = GeneticAlgorithm(
+        puzzle,
+        graph,
+        population_size=config["population_size"],
+        mutation_rate=config["mutation_rate"],
+        tournament_size=config["tournament_size"],
+        elite=config["elite"],
+        seeder=config["seeder"],
+        seed=config["seed"],
+        checkpoint=config["checkpoint"],
+        checkpoint_interval=config["checkpoint_interval"],
+        crossover=config["crossover"],
+        crossover_rate=config["crossover_rate"],
+    )
+
+    try:
+        sources = migration_sources(island, config["islands"], config["topology"])
+        seen = {src: 0 for src in sources}
+        interval = config["migration_interval"]
+        deadline = config["deadline"]
+        start = last_saved = time.perf_counter()
+
+        while ga.generation < config["max_generations"] and not stop.is_set():
+            if deadline is not None and time.time() >= deadline:
+                break
+            if ga.checkpoint is not None and time.perf_counter() - last_saved >= ga.checkpoint_interval:
+                ga.save_checkpoint()
+                last_saved = time.perf_counter()
+            ga.step()
+            if ga.best_score == 0:
+                stop.set()                                  # early termination for every island
+                break
+            if sources and ga.generation % interval == 0:
+                mailboxes.post(island, ga.elites(mailboxes.migrants))
+                for src in sources:
+                    seen[src], migrants = mailboxes.collect(src, seen[src])
+                    if migrants is not None:
+                        ga.receive_migrants(migrants)
+
+        ga.save_checkpoint()
+        best, best_score = ga.best()
+    finally:
+        ga.close()                                          # the checkpoint file and its mapping
+    results.put(IslandReport(
+        island,
+        config["seeder"],
+        ga.generation,
+        ga.evaluations,
+        time.perf_counter() - start,
+        best_score,
+        best.tolist(),
+    ))
+
+
+class IslandModel:
+    """
+    Island-model GA: each island evolves its own population in a separate
+    process and periodically publishes its best individuals to its neighbours
+    in the migration topology ("ring", "all" or "none").
+
+    The puzzle is handed to workers as text, so pass the board after
+    PuzzleLogicEngine.preprocess to have the placed values treated as fixed.
+
+    With `checkpoint` every island snapshots itself to `{checkpoint}.{island}`
+    (see GACheckpoint); running the same model again resumes each island from
+    its file. Migrant mailboxes are not saved and start empty on resume.
+    """
+    def __init__(
+        self,
+        puzzle: PuzzleGrid,
+        islands: Optional[int] = None,
+        population_size: int = 200,
+        migration_interval: int = 20,
+        migrants: int = 4,
+        topology: str = "ring",
+        seeder: str = "mixed",
+        mutation_rate: float = 0.3,
+        tournament_size: int = 3,
+        elite: int = 2,
+        seed: Optional[int] = None,
+        checkpoint: Optional[str] = None,
+        checkpoint_interval: float = 60.0,
+        crossover: Optional[str] = None,
+        crossover_rate: float = 0.5,
+    ):
+        if topology not in TOPOLOGIES:
+            raise ValueError(f"Unknown topology {topology!r}, expected one of {TOPOLOGIES}")
+        if seeder != "mixed" and seeder not in SEEDERS:
+            raise ValueError(f"Unknown seeder {seeder!r}, expected 'mixed' or one of {SEEDERS}")
+
+        self.puzzle = puzzle
+        self.islands = islands or os.cpu_count() or 1
+        self.population_size = population_size
+        self.migration_interval = max(1, migration_interval)
+        self.migrants = max(1, min(migrants, population_size))
+        self.topology = topology
+        self.seeder = seeder
+        self.mutation_rate = mutation_rate
+        self.tournament_size = tournament_size
+        self.elite = elite
+        self.seed = seed
+        self.checkpoint = checkpoint
+        self.checkpoint_interval = checkpoint_interval
+        self.crossover = crossover
+        self.crossover_rate = crossover_rate
+
+    def island_seeder(self, island: int) -> str:
+        if self.seeder == "mixed":
+            return SEEDERS[island % len(SEEDERS)]
+        return self.seeder
+
+    def run(self, max_generations: int = 1000, time_limit: Optional[float] = None) -> IslandResult:
+        ctx = mp.get_context()
+        mailboxes = _Mailboxes(ctx, self.islands, self.migrants, self.puzzle.max_num)
+        stop = ctx.Event()
+        results = ctx.Queue()
+        puzzle_text = str(self.puzzle)
+        deadline = time.time() + time_limit if time_limit is not None else None
+
+        workers = []
+        start = time.perf_counter()
+        for island in range(self.islands):
+            config = {
+                "islands": self.islands,
+                "population_size": self.population_size,
+                "mutation_rate": self.mutation_rate,
+                "tournament_size": self.tournament_size,
+                "elite": self.elite,
+                "seeder": self.island_seeder(island),
+                "seed": None if self.seed is None else self.seed + island,
+                "topology": self.topology,
+                "migration_interval": self.migration_interval,
+                "max_generations": max_generations,
+                "deadline": deadline,
+                "checkpoint": None if self.checkpoint is None else f"{self.checkpoint}.{island}",
+                "checkpoint_interval": self.checkpoint_interval,
+                "crossover": self.crossover,
+                "crossover_rate": self.crossover_rate,
+            }
+            proc = ctx.Process(
+                target=_island_main,
+                args=(island, puzzle_text, config, mailboxes, stop, results),
+                daemon=True,
+            )
+            proc.start()
+            workers.append(proc)
+
+        reports: List[IslandReport] = []
+        while len(reports) < len(workers):
+            try:
+                reports.append(results.get(timeout=0.5))
+            except queue.Empty:
+                if not any(proc.is_alive() for proc in workers) and results.empty():
+                    break                                   # a worker died without reporting
+        elapsed = time.perf_counter() - start
+        for proc in workers:
+            proc.join()
+
+        if not reports:
+            raise RuntimeError("No island finished successfully")
+
+        reports.sort(key=lambda rep: rep.island)
+        winner = min(reports, key=lambda rep: rep.best_score)
+        evaluator = BatchFitnessEvaluator(self.puzzle, GraphUtils(self.puzzle))
+        best = evaluator.decode(np.array(winner.best, dtype=np.int32))
+        return IslandResult(
+            best,
+            winner.best_score,
+            winner.best_score == 0,
+            elapsed,
+            sum(rep.generations for rep in reports),
+            sum(rep.evaluations for rep in reports),
+            reports,
+        )
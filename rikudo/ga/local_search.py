@@ -0,0 +1,272 @@
+from typing import Iterable, List, Optional, Tuple, Union
+import math
+import random
+import time
+
+import numpy as np
+
+from ..puzzle_grid import PuzzleGrid
+from ..graph_utils import GraphUtils
+from ..compact_grid import CompactGrid
+from .fitness import BatchFitnessEvaluator
+from .zobrist import TabuTable, ZobristHasher
+
+SWAP = 0
+INSERT = 1
+REVERSE = 2
+
+class LocalSearch:
+    """
+    Incremental violation count for one individual under small moves.
+
+    The individual is held as value -> cell and cell -> value lists; the score
+    is the same as BatchFitnessEvaluator's (non-adjacent consecutive pairs plus
+    weighted broken dots). A move only rescores what it can change:
+        - swap(u, w): the pairs (u-1, u), (u, u+1), (w-1, w), (w, w+1) and the
+          dots touching the two cells, O(1),
+        - reverse(i, j): the cells of values i..j in reverse order (2-opt); the
+          interior pairs keep their adjacency, so only (i-1, i), (j, j+1) and
+          the dots on the segment are rescored,
+        - insert(i, j): the cell of value i moves to the end of the segment
+          i..j and the cells of i+1..j shift down one value, rescoring the
+          pairs and dots of the segment.
+    Segments are at most `max_segment` values long and never contain a given
+    value. Adjacency is the geometry's per-cell neighbour bitmask.
+
+    With a `tabu` table the board's Zobrist hash is kept up to date per move
+    and the drivers refuse to revisit a board in the table unless it beats
+    the best score so far.
+    """
+    def __init__(
+        self,
+        puzzle: PuzzleGrid,
+        graph: GraphUtils,
+        dot_weight: int = 1,
+        max_segment: int = 6,
+        seed: Optional[int] = None,
+        tabu: Optional[TabuTable] = None,
+    ):
+        self.puzzle = puzzle
+        self.graph = graph
+        self.geometry = graph.geometry
+        self.max_num = puzzle.max_num
+        self.dot_weight = dot_weight
+        self.max_segment = max_segment
+        self.random = random.Random(seed)
+        self.tabu = tabu
+        self.hasher = ZobristHasher(graph.geometry.cell_count, seed or 0) if tabu is not None else None
+        self.hash = 0
+
+        geo = self.geometry
+        self.nbr_mask: List[int] = geo.neighbour_masks
+        self.dots: List[Tuple[int, int]] = list(geo.dot_ids)
+        self.dots_of: List[List[int]] = [[] for _ in range(geo.cell_count)]
+        for d, (a, b) in enumerate(self.dots):
+            self.dots_of[a].append(d)
+            self.dots_of[b].append(d)
+
+        self.fixed = set(puzzle.fixed_nums)
+        self.free: List[int] = [v for v in range(1, self.max_num + 1) if v not in self.fixed]
+        # run_end[v]: last value of the run of free values starting at v
+        self.run_end = [0] * (self.max_num + 2)
+        for v in range(self.max_num, 0, -1):
+            if v in self.fixed:
+                self.run_end[v] = v - 1
+            else:
+                self.run_end[v] = self.run_end[v + 1] if self.run_end[v + 1] > v else v
+
+        self.cell_of: List[int] = [-1] * (self.max_num + 2)
+        self.value_at: List[int] = [0] * geo.cell_count
+        self.score = 0
+        self.moves = 0
+        self._last: Optional[Tuple[int, int, int, int]] = None
+
+    # -- state -------------------------------------------------------------------
+
+    def load(self, individual: Union[np.ndarray, PuzzleGrid, CompactGrid]) -> int:
+        """Take a population row (value v-1 -> cell id) or a board; returns its score."""
+        if not isinstance(individual, np.ndarray):
+            individual = BatchFitnessEvaluator(self.puzzle, self.graph).encode([individual])[0]
+        self.cell_of = [-1] + [int(c) for c in individual] + [-1]
+        self.value_at = [0] * self.geometry.cell_count
+        for v in range(1, self.max_num + 1):
+            if self.cell_of[v] >= 0:
+                self.value_at[self.cell_of[v]] = v
+        self.score = self.full_score()
+        if self.hasher is not None:
+            self.hash = self.hasher.hash_individual(individual)
+        self._last = None
+        return self.score
+
+    def to_array(self) -> np.ndarray:
+        return np.array(self.cell_of[1:self.max_num + 1], dtype=np.int32)
+
+    def _pair_cost(self, v: int) -> int:
+        a, b = self.cell_of[v], self.cell_of[v + 1]
+        if a < 0 or b < 0:
+            return 1
+        return 0 if self.nbr_mask[a] >> b & 1 else 1
+
+    def _dot_cost(self, d: int) -> int:
+        a, b = self.dots[d]
+        x, y = self.value_at[a], self.value_at[b]
+        return 0 if x and y and abs(x - y) == 1 else self.dot_weight
+
+    def full_score(self) -> int:
+        pairs = sum(self._pair_cost(v) for v in range(1, self.max_num))
+        return pairs + sum(self._dot_cost(d) for d in range(len(self.dots)))
+
+    def _cost(self, pairs: Iterable[int], cells: Iterable[int]) -> int:
+        total = 0
+        for v in set(pairs):
+            if 1 <= v < self.max_num:
+                total += self._pair_cost(v)
+        dots = set()
+        for c in cells:
+            if c >= 0:
+                dots.update(self.dots_of[c])
+        for d in dots:
+            total += self._dot_cost(d)
+        return total
+
+    # -- moves -------------------------------------------------------------------
+
+    def _place(self, v: int, cell: int) -> None:
+        if self.hasher is not None:
+            self.hash = self.hasher.move(self.hash, v, self.cell_of[v], cell)
+        self.cell_of[v] = cell
+        if cell >= 0:
+            self.value_at[cell] = v
+
+    def _swap(self, u: int, w: int) -> None:
+        cu, cw = self.cell_of[u], self.cell_of[w]
+        self._place(u, cw)
+        self._place(w, cu)
+
+    def _reverse(self, i: int, j: int) -> None:
+        cells = self.cell_of[i:j + 1]
+        for offset, cell in enumerate(reversed(cells)):
+            self._place(i + offset, cell)
+
+    def _rotate(self, i: int, j: int, forward: bool) -> None:
+        cells = self.cell_of[i:j + 1]
+        cells = cells[1:] + cells[:1] if forward else cells[-1:] + cells[:-1]
+        for offset, cell in enumerate(cells):
+            self._place(i + offset, cell)
+
+    def move(self, kind: int, a: int, b: int) -> int:
+        """Apply a move, update the score and return its delta; undo() reverts it."""
+        if kind == SWAP:
+            pairs = (a - 1, a, b - 1, b)
+            cells = (self.cell_of[a], self.cell_of[b])
+            before = self._cost(pairs, cells)
+            self._swap(a, b)
+        else:
+            pairs = (a - 1, b) if kind == REVERSE else range(a - 1, b + 1)
+            cells = self.cell_of[a:b + 1]
+            before = self._cost(pairs, cells)
+            if kind == REVERSE:
+                self._reverse(a, b)
+            else:
+                self._rotate(a, b, forward=True)
+        delta = self._cost(pairs, cells) - before
+        self.score += delta
+        self.moves += 1
+        self._last = (kind, a, b, delta)
+        return delta
+
+    def undo(self) -> None:
+        kind, a, b, delta = self._last
+        if kind == SWAP:
+            self._swap(a, b)
+        elif kind == REVERSE:
+            self._reverse(a, b)
+        else:
+            self._rotate(a, b, forward=False)
+        self.score -= delta
+        self._last = None
+
+    def propose(self) -> Optional[Tuple[int, int, int]]:
+        """
+        Random move over free values. Swaps pick their partner from the cells
+        next to a neighbouring value half of the time, which is where a
+        misplaced value usually belongs.
+        """
+        if not self.free:
+            return None
+        rng = self.random
+        u = rng.choice(self.free)
+        roll = rng.random()
+        if roll < 0.5 or self.run_end[u] <= u:
+            w = 0
+            if roll < 0.25:
+                side = self.cell_of[u + rng.choice((-1, 1))] if 1 < u < self.max_num else -1
+                if side >= 0:
+                    nbrs = [self.value_at[c] for c in self.geometry.neighbours[side]]
+                    nbrs = [v for v in nbrs if v and v != u and v not in self.fixed]
+                    if nbrs:
+                        w = rng.choice(nbrs)
+            if not w:
+                w = rng.choice(self.free)
+            return (SWAP, u, w) if w != u else None
+        j = min(self.run_end[u], u + rng.randint(1, self.max_segment - 1))
+        return (REVERSE if roll < 0.75 else INSERT), u, j
+
+    # -- drivers -----------------------------------------------------------------
+
+    def anneal(
+        self,
+        steps: int,
+        start_temp: float = 1.0,
+        end_temp: float = 0.02,
+        time_limit: Optional[float] = None,
+    ) -> Tuple[np.ndarray, int]:
+        """
+        Simulated annealing with geometric cooling from start_temp to end_temp;
+        start_temp=0 gives a first-improvement hill climb (sideways moves allowed).
+        Returns the best individual seen and its score.
+        """
+        best, best_score = self.to_array(), self.score
+        started = time.perf_counter()
+        rng = self.random
+        cooling = (end_temp / start_temp) ** (1 / max(1, steps)) if start_temp > 0 else 1.0
+        temp = start_temp
+        for step in range(steps):
+            if self.score == 0:
+                break
+            if time_limit is not None and step & 255 == 0 and time.perf_counter() - started > time_limit:
+                break
+            proposal = self.propose()
+            temp *= cooling
+            if proposal is None:
+                continue
+            delta = self.move(*proposal)
+            if delta > 0 and (temp <= 0 or rng.random() >= math.exp(-delta / temp)):
+                self.undo()
+                continue
+            if self.tabu is not None:
+                if self.score >= best_score and self.hash in self.tabu:
+                    self.undo()
+                    continue
+                self.tabu.add(self.hash, self.score)
+            if self.score < best_score:
+                best, best_score = self.to_array(), self.score
+        return best, best_score
+
+    def hill_climb(self, steps: int, time_limit: Optional[float] = None) -> Tuple[np.ndarray, int]:
+        return self.anneal(steps, start_temp=0.0, time_limit=time_limit)
+
+    def polish(
+        self,
+        population: np.ndarray,
+        steps: int,
+        start_temp: float = 1.0,
+        end_temp: float = 0.02,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Anneal every row of a population matrix; returns (polished population, scores)."""
+        polished = population.copy()
+        scores = np.empty(len(population), dtype=np.int64)
+        for row in range(len(population)):
+            self.load(population[row])
+            polished[row], scores[row] = self.anneal(steps, start_temp, end_temp)
+        return polished, scores
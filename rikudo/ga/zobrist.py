@@ -0,0 +1,156 @@
+from array import array
+from typing import Optional
+
+import numpy as np
+
+MASK64 = (1 << 64) - 1
+
+def splitmix64(x: int) -> int:
+    z = (x + 0x9E3779B97F4A7C15) & MASK64
+    z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & MASK64
+    z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & MASK64
+    return z ^ (z >> 31)
+
+
+def splitmix64_array(x: np.ndarray) -> np.ndarray:
+    z = x.astype(np.uint64) + np.uint64(0x9E3779B97F4A7C15)
+    z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return z ^ (z >> np.uint64(31))
+
+
+class ZobristHasher:
+    """
+    64-bit Zobrist hashing of value -> cell assignments.
+
+    The hash of a board is the XOR of key(v, cell(v)) over its placed values,
+    so placing, removing or swapping values updates it in O(1). Keys are
+    splitmix64 of (seed, value, cell) rather than a stored random table, which
+    would need max_num x cell_count words on large boards.
+    """
+    def __init__(self, cell_count: int, seed: int = 0):
+        self.cell_count = cell_count
+        self.salt = splitmix64(seed)
+
+    def key(self, value: int, cell_id: int) -> int:
+        if cell_id < 0:
+            return 0
+        return splitmix64((value * self.cell_count + cell_id) ^ self.salt)
+
+    def place(self, h: int, value: int, cell_id: int) -> int:
+        """Hash after adding (or, XOR being its own inverse, removing) value at cell_id."""
+        return h ^ self.key(value, cell_id)
+
+    def move(self, h: int, value: int, old_cell: int, new_cell: int) -> int:
+        return h ^ self.key(value, old_cell) ^ self.key(value, new_cell)
+
+    def swap(self, h: int, u: int, w: int, cell_u: int, cell_w: int) -> int:
+        """Hash after values u (on cell_u) and w (on cell_w) trade cells."""
+        return self.move(self.move(h, u, cell_u, cell_w), w, cell_w, cell_u)
+
+    def keys(self, values: np.ndarray, cells: np.ndarray) -> np.ndarray:
+        """Vectorized key(); -1 cells (unplaced) give 0."""
+        raw = values.astype(np.uint64) * np.uint64(self.cell_count) + cells.astype(np.uint64)
+        out = splitmix64_array(raw ^ np.uint64(self.salt))
+        return np.where(cells >= 0, out, np.uint64(0))
+
+    def hash_population(self, population: np.ndarray) -> np.ndarray:
+        """(P,) uint64 hashes of a (P x max_num) population matrix (column v-1 = cell of v)."""
+        values = np.arange(1, population.shape[1] + 1)
+        return np.bitwise_xor.reduce(self.keys(values[None, :], population), axis=1)
+
+    def hash_individual(self, individual: np.ndarray) -> int:
+        return int(self.hash_population(np.asarray(individual)[None, :])[0])
+
+    def swap_delta(self, values_u: np.ndarray, values_w: np.ndarray, cells_u: np.ndarray, cells_w: np.ndarray) -> np.ndarray:
+        """Per-row XOR that turns the hash before a batch of swaps into the hash after."""
+        return (
+            self.keys(values_u, cells_u) ^ self.keys(values_u, cells_w)
+            ^ self.keys(values_w, cells_w) ^ self.keys(values_w, cells_u)
+        )
+
+
+def first_occurrences(hashes: np.ndarray) -> np.ndarray:
+    """Boolean mask keeping the first row of every distinct hash."""
+    _, first = np.unique(hashes, return_index=True)
+    keep = np.zeros(len(hashes), dtype=bool)
+    keep[first] = True
+    return keep
+
+
+class TabuTable:
+    """
+    Fixed-size visited/tabu set of 64-bit hashes with optional int payloads
+    (e.g. the score of that board).
+
+    Set-associative: a hash maps to one set of `ways` slots; inserting into a
+    full set evicts its slots round-robin, so the oldest entries of that set
+    go first and memory never grows. Lookups and inserts are O(ways).
+    The zero hash is stored as 1 because 0 marks an empty slot.
+    """
+    def __init__(self, capacity: int = 1 << 16, ways: int = 4):
+        sets = 1
+        while sets * ways < capacity:
+            sets *= 2
+        self.ways = ways
+        self.set_mask = sets - 1
+        self.capacity = sets * ways
+        self.hashes = array("Q", bytes(8 * self.capacity))
+        self.payload = array("q", bytes(8 * self.capacity))
+        self.cursor = bytearray(sets)                       # next slot to evict per set
+        self.size = 0
+        self.evictions = 0
+
+    def _slot(self, h: int) -> int:
+        h = h or 1
+        base = (h & self.set_mask) * self.ways
+        for slot in range(base, base + self.ways):
+            if self.hashes[slot] == h:
+                return slot
+        return -1
+
+    def __contains__(self, h: int) -> bool:
+        return self._slot(int(h)) >= 0
+
+    def __len__(self) -> int:
+        return self.size
+
+    def get(self, h: int, default: Optional[int] = None) -> Optional[int]:
+        slot = self._slot(int(h))
+        return self.payload[slot] if slot >= 0 else default
+
+    def add(self, h: int, payload: int = 0) -> bool:
+        """Insert or refresh `h`; returns True if it was not present."""
+        h = int(h) or 1
+        slot = self._slot(h)
+        if slot >= 0:
+            self.payload[slot] = payload
+            return False
+        s = h & self.set_mask
+        base = s * self.ways
+        for slot in range(base, base + self.ways):
+            if self.hashes[slot] == 0:
+                self.size += 1
+                break
+        else:
+            slot = base + self.cursor[s]
+            self.cursor[s] = (self.cursor[s] + 1) % self.ways
+            self.evictions += 1
+        self.hashes[slot] = h
+        self.payload[slot] = payload
+        return True
+
+    def lookup_many(self, hashes: np.ndarray):
+        """Vectorized get(): (found mask, payloads) for a uint64 hash array."""
+        hashes = np.where(hashes == 0, np.uint64(1), hashes.astype(np.uint64))
+        table = np.frombuffer(self.hashes, dtype=np.uint64).reshape(-1, self.ways)
+        values = np.frombuffer(self.payload, dtype=np.int64).reshape(-1, self.ways)
+        sets = (hashes & np.uint64(self.set_mask)).astype(np.intp)
+        match = table[sets] == hashes[:, None]
+        found = match.any(axis=1)
+        payloads = values[sets, match.argmax(axis=1)]
+        return found, np.where(found, payloads, 0)
+
+    def add_many(self, hashes: np.ndarray, payloads: Optional[np.ndarray] = None) -> None:
+        for i, h in enumerate(hashes.tolist()):
+            self.add(h, 0 if payloads is None else int(payloads[i]))
@@ -0,0 +1,123 @@
+from typing import List, Optional, Tuple
+import argparse
+import random
+
+from .puzzle_grid import PuzzleGrid
+
+Cell = Tuple[int, int]
+
+def empty_board(rows: int, columns: int) -> PuzzleGrid:
+    """Hole-free board in the row layout PuzzleGrid.neighbours expects: short rows first, alternating."""
+    cells = [[0] * (columns - 1 if r % 2 == 0 else columns) for r in range(rows)]
+    empty = [(r, c) for r in range(rows) for c in range(len(cells[r]))]
+    return PuzzleGrid(1, (rows, columns), cells, [], empty, {})
+
+
+def hamiltonian_path(board: PuzzleGrid, rng: random.Random, mixing: float = 1.0) -> List[Cell]:
+    """
+    Random Hamiltonian path over every cell of a hole-free board: start from a
+    boustrophedon snake (row ends of neighbouring rows are adjacent in this
+    layout) and randomise it with mixing * cells backbite moves.
+    """
+    path: List[Cell] = []
+    for r, row in enumerate(board.cells):
+        cells = [(r, c) for c in range(len(row))]
+        path.extend(cells if r % 2 == 0 else reversed(cells))
+
+    position = {cell: i for i, cell in enumerate(path)}
+    last = len(path) - 1
+    for _ in range(int(mixing * len(path))):
+        # Backbite: link one end to a neighbour on the path and reverse the part in between
+        if rng.random() < 0.5:
+            i = position[rng.choice(board.neighbours(path[-1]))]
+            if i == last - 1:
+                continue
+            path[i + 1:] = path[:i:-1]
+            changed = range(i + 1, last + 1)
+        else:
+            i = position[rng.choice(board.neighbours(path[0]))]
+            if i == 1:
+                continue
+            path[:i] = path[i - 1::-1]
+            changed = range(i)
+        for j in changed:
+            position[path[j]] = j
+    return path
+
+
+def generate_puzzle(
+    rows: int,
+    columns: int,
+    givens: float = 0.3,
+    holes: float = 0.0,
+    dots: float = 0.1,
+    seed: Optional[int] = None,
+    mixing: float = 1.0,
+) -> Tuple[PuzzleGrid, PuzzleGrid]:
+    """
+    Build a valid Rikudo instance and its solution.
+
+    A random Hamiltonian path is laid over the full board; the last `holes`
+    fraction of it is cut off and turned into -1 holes, the rest numbered
+    1..max_num. Values 1 and max_num are always given, every other value with
+    probability `givens`, and each consecutive pair with at least one hidden
+    cell gets a dot with probability `dots`. The solution is guaranteed, not
+    its uniqueness.
+
+    Returns:
+        (puzzle, solution)
+    """
+    rng = random.Random(seed)
+    board = empty_board(rows, columns)
+    path = hamiltonian_path(board, rng, mixing)
+    keep = max(2, len(path) - int(holes * len(path)))
+    path, cut = path[:keep], path[keep:]
+    max_num = len(path)
+
+    solution_cells = [row[:] for row in board.cells]
+    for r, c in cut:
+        solution_cells[r][c] = -1
+    for val, (r, c) in enumerate(path, start=1):
+        solution_cells[r][c] = val
+
+    puzzle_cells = [row[:] for row in solution_cells]
+    for val, (r, c) in enumerate(path, start=1):
+        if val not in (1, max_num) and rng.random() >= givens:
+            puzzle_cells[r][c] = 0
+
+    dot_list = []
+    for a, b in zip(path, path[1:]):
+        if (puzzle_cells[a[0]][a[1]] == 0 or puzzle_cells[b[0]][b[1]] == 0) and rng.random() < dots:
+            dot_list.append((a, b))
+
+    def build(cells: List[List[int]]) -> PuzzleGrid:
+        lines = [f"{rows} {columns} {max_num}"]
+        lines += [" ".join(map(str, row)) for row in cells]
+        lines.append(str(len(dot_list)))
+        lines += [f"{a[0]} {a[1]} {b[0]} {b[1]}" for a, b in dot_list]
+        return PuzzleGrid.parse("\n".join(lines))
+
+    return build(puzzle_cells), build(solution_cells)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Print random Rikudo puzzles in PuzzleGrid text format.")
+    parser.add_argument("rows", type=int)
+    parser.add_argument("columns", type=int)
+    parser.add_argument("-n", "--count", type=int, default=1)
+    parser.add_argument("--givens", type=float, default=0.3)
+    parser.add_argument("--holes", type=float, default=0.0)
+    parser.add_argument("--dots", type=float, default=0.1)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    for _ in range(args.count):
+        puzzle, _ = generate_puzzle(
+            args.rows, args.columns, args.givens, args.holes, args.dots, seed=rng.getrandbits(32)
+        )
+        print(puzzle)
+
+
+if __name__ == "__main__":
+    main()
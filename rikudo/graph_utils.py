@@ -1,16 +1,44 @@
 from collections import deque
-from typing import Dict, List, Tuple
+from collections.abc import Mapping
+from typing import Dict, Iterator, List, Tuple
+
+import numpy as np
 
 from .puzzle_grid import PuzzleGrid
+from .compact_grid import GridGeometry
 
 Cell = Tuple[int, int]
 
+class PairwiseDistances(Mapping):
+    """
+    Read-only view so that existing `pairwise_distances[(a, b)]` lookups keep
+    working on top of the lazily filled distance matrix (-1 = unreachable).
+    """
+    def __init__(self, graph: "GraphUtils"):
+        self.graph = graph
+
+    def __getitem__(self, key: Tuple[Cell, Cell]) -> int:
+        src, dst = key
+        index = self.graph.geometry.index
+        if src not in index or dst not in index:
+            raise KeyError(key)
+        return int(self.graph.distance_row(index[src])[index[dst]])
+
+    def __iter__(self) -> Iterator[Tuple[Cell, Cell]]:
+        coords = self.graph.geometry.coords
+        return ((a, b) for a in coords for b in coords)
+
+    def __len__(self) -> int:
+        return self.graph.geometry.cell_count ** 2
+
+
 class GraphUtils:
     def __init__(self, puzzle: PuzzleGrid):
         self.puzzle = puzzle
+        self.geometry = GridGeometry.from_puzzle(puzzle)
         self.adjacency_dict: Dict[Cell, List[Cell]] = {}
-        self.pairwise_distances: Dict[Tuple[Cell, Cell], int] = {}
         self.degrees: Dict[Cell, int] = {}
+        self.pairwise_distances = PairwiseDistances(self)
 
         self.build_adjacency_dict()
         self.build_degrees()
@@ -44,21 +72,89 @@ class GraphUtils:
 
     def calculate_pairwise_distances(self) -> None:
         """
-        Efficiently compute BFS distances between all relevant cells:
-        fixed + empty.
+        Reset the cell-id distance matrix. Rows are filled lazily on first query.
+        On boards laid out as alternating hex rows a row starts from the
+        closed-form hex distance, which is a lower bound on the path length.
+        Where holes (-1 padding or -2 blanks) can make paths longer, the row is
+        kept only if every cell has a neighbour one step closer to the source.
+        Rows that fail that check, and boards that are not hex-shaped, are
+        computed by BFS. Once the check fails on almost every row, the
+        remaining rows skip straight to BFS.
         """
-        self.pairwise_distances.clear()
-        relevant = list(self.puzzle.fixed_nums.values()) + self.puzzle.empty_cells
-
-        for src in relevant:
-            distances = self.bfs_from(src)
-            for dst in relevant:
-                if dst == src:
-                    self.pairwise_distances[(src, dst)] = 0
-                elif dst in distances:
-                    d = distances[dst]
-                    self.pairwise_distances[(src, dst)] = d
-                    self.pairwise_distances[(dst, src)] = d
-                else:
-                    self.pairwise_distances[(src, dst)] = -1
-                    self.pairwise_distances[(dst, src)] = -1
+        n = self.geometry.cell_count
+        self.distance_matrix = np.empty((n, n), dtype=np.int16)
+        self.row_ready = np.zeros(n, dtype=bool)
+        self.closed_rows = 0
+        self.bfs_rows = 0                                   # rows the closed form could not answer
+
+        row_lengths = self.geometry.row_lengths
+        cols = self.geometry.column_count
+        self.closed_form = all(
+            {row_lengths[r], row_lengths[r + 1]} == {cols, cols - 1}
+            for r in range(len(row_lengths) - 1)
+        )
+        if self.closed_form:
+            # Doubled-width coordinates: short rows sit half a cell to the right
+            coords = self.geometry.coords
+            self.hex_x = np.array(
+                [2 * c + (row_lengths[r] != cols) for r, c in coords], dtype=np.int32
+            )
+            self.hex_y = np.array([r for r, _ in coords], dtype=np.int32)
+            if self.geometry.holes:
+                # Neighbour ids, padded with n, which indexes a sentinel larger than any distance
+                width = max((len(nbrs) for nbrs in self.geometry.neighbours), default=1)
+                self.neighbour_table = np.full((n, max(width, 1)), n, dtype=np.intp)
+                for cell_id, nbrs in enumerate(self.geometry.neighbours):
+                    self.neighbour_table[cell_id, :len(nbrs)] = nbrs
+
+    def _closed_form_row(self, src: int, row: np.ndarray) -> bool:
+        """Fill `row` with hex distances from `src`; False if holes make them wrong for some cell."""
+        dx = np.abs(self.hex_x - self.hex_x[src])
+        dy = np.abs(self.hex_y - self.hex_y[src])
+        dist = dy + np.maximum(0, (dx - dy) // 2)
+        if self.geometry.holes:
+            # A lower bound is exact iff every other cell has a real neighbour at distance d - 1
+            padded = np.append(dist, np.iinfo(np.int32).max)
+            closest = padded[self.neighbour_table].min(axis=1)
+            closest[src] = -1
+            if np.any(closest != dist - 1):
+                return False
+        row[:] = dist
+        return True
+
+    def distance_row(self, src: int) -> np.ndarray:
+        """Distances from cell id `src` to every cell id (-1 = unreachable)."""
+        if not self.row_ready[src]:
+            row = self.distance_matrix[src]
+            # Stop paying for the check once holes have made it fail on nearly every row
+            attempt = self.closed_form and (self.bfs_rows < 32 or 8 * self.closed_rows >= self.bfs_rows)
+            if attempt and self._closed_form_row(src, row):
+                self.closed_rows += 1
+            else:
+                self._bfs_row(src, row)
+                self.bfs_rows += 1
+            self.row_ready[src] = True
+        return self.distance_matrix[src]
+
+    def load_distances(self, matrix: np.ndarray, ready: np.ndarray) -> None:
+        """Adopt precomputed rows (e.g. from ResultCache); only rows flagged in `ready` are trusted."""
+        self.distance_matrix[ready] = matrix[ready]
+        self.row_ready |= ready
+
+    def _bfs_row(self, src: int, row: np.ndarray) -> None:
+        neighbours = self.geometry.neighbours
+        dist = [-1] * self.geometry.cell_count
+        dist[src] = 0
+        queue = deque([src])
+        while queue:
+            current = queue.popleft()
+            d = dist[current] + 1
+            for nbr in neighbours[current]:
+                if dist[nbr] < 0:
+                    dist[nbr] = d
+                    queue.append(nbr)
+        row[:] = dist
+
+    def distance(self, a: Cell, b: Cell) -> int:
+        index = self.geometry.index
+        return int(self.distance_row(index[a])[index[b]])
@@ -0,0 +1,161 @@
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+import json
+import os
+import threading
+import time
+
+class PhaseTimer:
+    __slots__ = ("stats", "name", "args", "start")
+
+    def __init__(self, stats: "PipelineStats", name: str, args: Dict):
+        self.stats = stats
+        self.name = name
+        self.args = args
+
+    def __enter__(self) -> "PhaseTimer":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.stats.add_phase(self.name, self.start, time.perf_counter() - self.start, self.args)
+
+
+class _NullPhase:
+    __slots__ = ()
+
+    def __enter__(self) -> "_NullPhase":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        pass
+
+
+_NULL_PHASE = _NullPhase()
+
+
+class PipelineStats:
+    """
+    Timers, counters and value series recorded by the solve pipeline.
+
+    Phases are timed with `with stats.phase("name"):` and aggregated by name
+    (calls, total and max seconds); each one is also kept as a trace event
+    unless `trace=False`. Counters are plain sums, series keep every sample
+    (e.g. placements per propagation round).
+    """
+    enabled = True
+
+    def __init__(self, trace: bool = True):
+        self.trace = trace
+        self.origin = time.perf_counter()
+        self.counters: Dict[str, int] = {}
+        self.series: Dict[str, List[float]] = {}
+        self.phases: Dict[str, List[float]] = {}            # name -> [calls, total, max]
+        self.events: List[Tuple[str, float, float, Dict, int]] = []
+        self.samples: List[Tuple[str, float, float]] = []
+
+    def phase(self, name: str, **args) -> PhaseTimer:
+        return PhaseTimer(self, name, args)
+
+    def add_phase(self, name: str, start: float, elapsed: float, args: Optional[Dict] = None) -> None:
+        agg = self.phases.get(name)
+        if agg is None:
+            self.phases[name] = [1, elapsed, elapsed]
+        else:
+            agg[0] += 1
+            agg[1] += elapsed
+            agg[2] = max(agg[2], elapsed)
+        if self.trace:
+            self.events.append((name, start, elapsed, args or {}, threading.get_ident()))
+
+    def count(self, name: str, n: int = 1) -> None:
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def sample(self, name: str, value: float) -> None:
+        self.series.setdefault(name, []).append(value)
+        if self.trace:
+            self.samples.append((name, time.perf_counter(), value))
+
+    def as_dict(self) -> Dict:
+        return {
+            "counters": dict(self.counters),
+            "series": {name: list(values) for name, values in self.series.items()},
+            "phases": {
+                name: {"calls": calls, "total": total, "max": longest}
+                for name, (calls, total, longest) in self.phases.items()
+            },
+        }
+
+    def to_json(self, path: str) -> None:
+        with open(path, "w") as f:
+            json.dump(self.as_dict(), f, indent=2)
+
+    def chrome_trace(self) -> Dict:
+        """Trace Event Format (chrome://tracing, Perfetto): one complete event per phase, counter events per sample."""
+        pid = os.getpid()
+
+        def to_us(t: float) -> float:
+            return (t - self.origin) * 1e6
+
+        events = [
+            {"name": name, "ph": "X", "ts": to_us(start), "dur": elapsed * 1e6, "pid": pid, "tid": tid, "args": args}
+            for name, start, elapsed, args, tid in self.events
+        ]
+        events += [
+            {"name": name, "ph": "C", "ts": to_us(t), "pid": pid, "args": {"value": value}}
+            for name, t, value in self.samples
+        ]
+        end = to_us(time.perf_counter())
+        events += [
+            {"name": name, "ph": "C", "ts": end, "pid": pid, "args": {"value": value}}
+            for name, value in self.counters.items()
+        ]
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def to_chrome_trace(self, path: str) -> None:
+        with open(path, "w") as f:
+            json.dump(self.chrome_trace(), f)
+
+
+class NullStats:
+    """Disabled recorder: every hook is a no-op, hot loops check `enabled` first."""
+    enabled = False
+
+    def phase(self, name: str, **args) -> _NullPhase:
+        return _NULL_PHASE
+
+    def add_phase(self, name: str, start: float, elapsed: float, args: Optional[Dict] = None) -> None:
+        pass
+
+    def count(self, name: str, n: int = 1) -> None:
+        pass
+
+    def sample(self, name: str, value: float) -> None:
+        pass
+
+
+NULL_STATS = NullStats()
+_active = NULL_STATS
+
+
+def current_stats():
+    """The recorder the pipeline reports to; NULL_STATS unless inside collect_stats()."""
+    return _active
+
+
+@contextmanager
+def collect_stats(stats: Optional[PipelineStats] = None) -> Iterator[PipelineStats]:
+    """
+    Record everything the pipeline does inside the block:
+
+        with collect_stats() as stats:
+            PuzzleLogicEngine(puzzle, graph).preprocess()
+        stats.to_chrome_trace("trace.json")
+    """
+    global _active
+    stats = stats if stats is not None else PipelineStats()
+    previous, _active = _active, stats
+    try:
+        yield stats
+    finally:
+        _active = previous
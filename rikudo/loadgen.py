@@ -0,0 +1,152 @@
+from typing import Dict, Iterator, List, Optional, Tuple
+import argparse
+import asyncio
+import itertools
+import json
+import shlex
+import sys
+import time
+
+from .batch import iter_puzzles, percentile
+from .generator import generate_puzzle
+
+def generated_puzzles(rows: int, columns: int, count: int, seed: int = 0) -> List[Tuple[str, str]]:
+    return [(f"g{i}", str(generate_puzzle(rows, columns, seed=seed + i)[0])) for i in range(count)]
+
+
+class LoadGenerator:
+    """
+    Drives a running solver service with JSON-lines requests and measures it
+    from the client side.
+
+    Closed loop by default: `concurrency` requests are kept outstanding and a
+    new one is sent as each answer arrives. With `rate` it runs open loop
+    instead, sending `rate` requests per second regardless of answers (still
+    capped at `concurrency` outstanding), which is what exposes queueing and
+    backpressure. Latency is from write to matching response. Answers the
+    service took from its memo are counted separately, since they measure a
+    lookup rather than a solve.
+    """
+    def __init__(self, reader: asyncio.StreamReader, writer, concurrency: int = 16,
+                 rate: Optional[float] = None, timeout: Optional[float] = None):
+        self.reader = reader
+        self.writer = writer
+        self.concurrency = concurrency
+        self.rate = rate
+        self.timeout = timeout
+        self.sent: Dict[str, float] = {}
+        self.latencies: List[float] = []
+        self.server_latencies: List[float] = []
+        self.statuses: Dict[str, int] = {}
+        self.memo_hits = 0
+
+    async def _send(self, request_id: str, text: str) -> None:
+        message = {"id": request_id, "puzzle": text}
+        if self.timeout is not None:
+            message["timeout"] = self.timeout
+        self.sent[request_id] = time.perf_counter()
+        self.writer.write((json.dumps(message) + "\n").encode())
+        await self.writer.drain()
+
+    async def _receive(self, total: int, slots: asyncio.Semaphore) -> None:
+        received = 0
+        while received < total:
+            line = await self.reader.readline()
+            if not line:
+                raise ConnectionError("service closed the stream")
+            result = json.loads(line)
+            sent = self.sent.pop(str(result.get("id")), None)
+            if sent is None:
+                continue
+            self.latencies.append(time.perf_counter() - sent)
+            self.server_latencies.append(result.get("latency", 0.0))
+            status = result.get("status", "?")
+            self.statuses[status] = self.statuses.get(status, 0) + 1
+            self.memo_hits += bool(result.get("memo"))
+            received += 1
+            slots.release()
+
+    async def run(self, puzzles: Iterator[Tuple[str, str]], total: int) -> Dict:
+        slots = asyncio.Semaphore(self.concurrency)
+        started = time.perf_counter()
+        receiver = asyncio.create_task(self._receive(total, slots))
+        for n, (puzzle_id, text) in enumerate(itertools.islice(puzzles, total)):
+            if self.rate:
+                delay = started + n / self.rate - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            await slots.acquire()
+            await self._send(f"{n}:{puzzle_id}", text)
+        await receiver
+        elapsed = time.perf_counter() - started
+        return {
+            "requests": len(self.latencies),
+            "statuses": self.statuses,
+            "memo_hits": self.memo_hits,
+            "elapsed": elapsed,
+            "requests_per_sec": len(self.latencies) / elapsed if elapsed > 0 else 0.0,
+            "latency_p50": percentile(self.latencies, 50),
+            "latency_p95": percentile(self.latencies, 95),
+            "latency_p99": percentile(self.latencies, 99),
+            "latency_max": max(self.latencies, default=0.0),
+            "server_latency_p50": percentile(self.server_latencies, 50),
+            "server_latency_p99": percentile(self.server_latencies, 99),
+        }
+
+
+async def _connect(args: argparse.Namespace):
+    """(reader, writer, process) for a socket service, or a service spawned on stdin/stdout."""
+    if args.socket:
+        reader, writer = await asyncio.open_unix_connection(args.socket, limit=1 << 24)
+        return reader, writer, None
+    if args.port:
+        reader, writer = await asyncio.open_connection("127.0.0.1", args.port, limit=1 << 24)
+        return reader, writer, None
+    process = await asyncio.create_subprocess_exec(
+        sys.executable, "-m", "rikudo.service", *([] if args.memo else ["--memo-size", "0"]), *args.service_args,
+        stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.PIPE, limit=1 << 24,
+    )
+    return process.stdout, process.stdin, process
+
+
+async def _main(args: argparse.Namespace, puzzles: List[Tuple[str, str]]) -> Dict:
+    reader, writer, process = await _connect(args)
+    load = LoadGenerator(reader, writer, args.concurrency, args.rate, args.timeout)
+    try:
+        return await load.run(itertools.cycle(puzzles), args.requests)
+    finally:
+        writer.close()
+        if process is not None:
+            await process.wait()
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(
+        description="Load generator for rikudo.service: sustained requests/sec and tail latency.",
+        epilog="Without --socket/--port a service is spawned on stdin/stdout with --service-args.",
+    )
+    parser.add_argument("source", nargs="?", help="puzzle directory or file (default: generated boards)")
+    parser.add_argument("--generate", nargs=2, type=int, default=(9, 9), metavar=("ROWS", "COLUMNS"))
+    parser.add_argument("--distinct", type=int, default=None,
+                        help="number of generated boards to cycle through (default: one per request)")
+    parser.add_argument("-n", "--requests", type=int, default=500)
+    parser.add_argument("-c", "--concurrency", type=int, default=16, help="maximum outstanding requests")
+    parser.add_argument("--rate", type=float, default=None, help="open-loop send rate in requests/sec")
+    parser.add_argument("--timeout", type=float, default=None, help="per-request deadline sent to the service")
+    parser.add_argument("--socket", help="connect to a service on this Unix socket")
+    parser.add_argument("--port", type=int, help="connect to a service on 127.0.0.1:PORT")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--service-args", type=shlex.split, default=[], help='e.g. "-w 4 --batch-size 16"')
+    parser.add_argument("--memo", action="store_true",
+                        help="leave the spawned service's result memo on (repeated boards become lookups)")
+    args = parser.parse_args(argv)
+
+    if args.source:
+        puzzles = list(iter_puzzles(args.source))
+    else:
+        puzzles = generated_puzzles(*args.generate, args.distinct or args.requests, args.seed)
+    print(json.dumps(asyncio.run(_main(args, puzzles)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
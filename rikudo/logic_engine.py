@@ -1,8 +1,10 @@
 from collections import deque
-from typing import List, Tuple
+from typing import List, Optional, Tuple
 
 from .puzzle_grid import PuzzleGrid
 from .graph_utils import GraphUtils
+from .propagation import DomainPropagator
+from .instrumentation import current_stats
 
 Cell = Tuple[int, int]
 
@@ -22,6 +24,7 @@ class PuzzleLogicEngine:
 
         while queue:
             val, cell = queue.popleft()
+            current_stats().count("constraint_propagation.pops")
 
             for offset in [-1, 1]:
                 next_val = val + offset
@@ -36,13 +39,8 @@ class PuzzleLogicEngine:
                 ]
 
                 if len(candidates) == 1:
-                    r, c = candidates[0]
-                    self.puzzle.cells[r][c] = next_val
-                    self.puzzle.fixed_nums[next_val] = (r, c)
-                    self.puzzle.coordinate_num[next_val] = (r, c)
-                    if (r, c) in self.puzzle.empty_cells:
-                        self.puzzle.empty_cells.remove((r, c))
-                    queue.append((next_val, (r, c)))
+                    self.puzzle.assign(next_val, candidates[0])
+                    queue.append((next_val, candidates[0]))
                     newly_filled += 1
 
         return newly_filled
@@ -53,6 +51,7 @@ class PuzzleLogicEngine:
         The cell must be the middle number.
         """
         newly_filled = 0
+        current_stats().count("gap_bridging.scans", len(self.puzzle.empty_cells))
 
         for cell in self.puzzle.empty_cells[:]:                         # copy to avoid mutation during iteration
             neighbor_vals = [
@@ -61,44 +60,50 @@ class PuzzleLogicEngine:
                 if self.puzzle.cells[n[0]][n[1]] > 0
             ]
 
-            for a in neighbor_vals:
-                for b in neighbor_vals:
-                    if a + 2 == b or b + 2 == a:
-                        mid = (a + b) // 2
-                        if mid not in self.puzzle.fixed_nums:
-                            r, c = cell
-                            self.puzzle.cells[r][c] = mid
-                            self.puzzle.fixed_nums[mid] = cell
-                            self.puzzle.coordinate_num[mid] = cell
-                            self.puzzle.empty_cells.remove(cell)
-                            newly_filled += 1
-                            break                                       # done with this cell
+            bridges = [
+                (a + b) // 2
+                for a in neighbor_vals
+                for b in neighbor_vals
+                if a + 2 == b and (a + b) // 2 not in self.puzzle.coordinate_num
+            ]
+            if bridges:
+                self.puzzle.assign(bridges[0], cell)                # done with this cell
+                newly_filled += 1
 
         return newly_filled
 
-    def preprocess(self, rounds: int = 2) -> Tuple[int, List[Tuple[int, Cell]]]:
+    def preprocess(
+        self, rounds: int = 2, lookahead: bool = True, deadline: Optional[float] = None,
+    ) -> Tuple[int, List[Tuple[int, Cell]]]:
         """
         Perform Phase 0 preprocessing:
-        - Initialize adjacency, degrees
-        - Apply dot constraints as forced edges
-        - Perform constraint propagation and gap bridging to place values
-        - Depth-2 lookahead inference (tentative)
-        
+        - Build candidate-cell domains for every missing value
+        - Prune them with distance bounds, adjacency, dot and all-different constraints
+        - Place forced values, waking only the affected values, until fixpoint
+        - Depth-2 lookahead inference (tentative): each value with two candidate
+          cells is tried on both, propagated and rolled back along the puzzle's
+          undo trail; a candidate that fails leaves its domain
+
+        Args:
+            rounds (int): unused, kept for backwards compatibility; propagation
+                now always runs to fixpoint
+            lookahead (bool): run the depth-2 lookahead after propagation
+            deadline (float): time.perf_counter() value after which propagation
+                and lookahead stop early (see propagator.timed_out)
+
         Returns:
-            total_filled: number of values placed by propagation and bridging
-            tentative: list of (val, cell) pairs placed tentatively via depth-2 lookahead
+            total_filled: number of values placed by propagation
+            tentative: list of (val, cell) pairs placed on the board as a result of the
+                depth-2 lookahead (not counted in total_filled)
         """
-        total_filled = 0
         tentative: List[Tuple[int, Cell]] = []
+        stats = current_stats()
 
-        """
-            Repeatedly apply constraint propagation and gap bridging.
-        """
-        for _ in range(rounds):
-            filled = self.constraint_propagation()
-            filled += self.gap_bridging()
-            if filled == 0:
-                break
-            total_filled += filled
-
-        return total_filled, tentative
\ No newline at end of file
+        with stats.phase("preprocess.propagate"):
+            self.propagator = DomainPropagator(self.puzzle, self.graph, deadline)
+            total_filled = self.propagator.propagate()
+        if lookahead and not self.propagator.contradiction and not self.propagator.timed_out:
+            with stats.phase("preprocess.lookahead"):
+                tentative = self.propagator.lookahead()
+
+        return total_filled, tentative
@@ -0,0 +1,255 @@
+from typing import Dict, List, NamedTuple, Optional, Tuple
+import argparse
+import json
+import multiprocessing as mp
+import queue
+import sys
+import time
+
+from .puzzle_grid import PuzzleGrid
+from .graph_utils import GraphUtils
+from .logic_engine import PuzzleLogicEngine
+from .exact_solver import ExactSolver
+from .instrumentation import current_stats
+from .ga.engine import GeneticAlgorithm
+
+KINDS = ("exact", "ga")
+
+class Strategy(NamedTuple):
+    name: str
+    kind: str                                               # "exact" or "ga"
+    options: Dict                                           # keyword arguments for the solver
+
+    @classmethod
+    def parse(cls, spec: str) -> "Strategy":
+        """
+        "kind[:key=value,...]", e.g. "exact:node_limit=20000" or
+        "ga:seeder=walk,seed=3,max_generations=500". The spec is the name.
+        """
+        kind, _, rest = spec.partition(":")
+        if kind not in KINDS:
+            raise ValueError(f"Unknown strategy kind {kind!r}, expected one of {KINDS}")
+        options: Dict = {}
+        for item in filter(None, rest.split(",")):
+            key, sep, value = item.partition("=")
+            if not sep:
+                raise ValueError(f"Bad strategy option {item!r} in {spec!r}, expected key=value")
+            for convert in (int, float):
+                try:
+                    options[key] = convert(value)
+                    break
+                except ValueError:
+                    pass
+            else:
+                options[key] = value
+        return cls(spec, kind, options)
+
+
+DEFAULT_PORTFOLIO = [
+    Strategy("search", "exact", {"node_limit": 20_000}),   # short depth-first search, gives up quickly
+    Strategy("exact", "exact", {}),
+    Strategy("ga-walk", "ga", {"seeder": "walk", "seed": 0, "polish_steps": 200}),
+    Strategy("ga-depth2", "ga", {"seeder": "depth2", "seed": 1, "crossover": "edge"}),
+]
+
+
+class StrategyReport(NamedTuple):
+    name: str
+    status: str                                             # solved / unsat / exhausted / cancelled / error / invalid / partial
+    elapsed: float
+    detail: Optional[str] = None
+
+
+class PortfolioResult(NamedTuple):
+    solution: Optional[PuzzleGrid]
+    status: str                                             # solved / unsat / timeout / exhausted
+    winner: Optional[str]
+    elapsed: float
+    reports: List[StrategyReport]
+
+    def as_dict(self) -> Dict:
+        return {
+            "status": self.status,
+            "winner": self.winner,
+            "elapsed": self.elapsed,
+            "solution": str(self.solution) if self.solution is not None else None,
+            "strategies": [report._asdict() for report in self.reports],
+        }
+
+
+def verify(puzzle: PuzzleGrid, solution: PuzzleGrid) -> bool:
+    """True if `solution` is a solved board of the same shape that keeps every value placed on `puzzle`."""
+    if (solution.row_count, solution.column_count, solution.max_num) != (puzzle.row_count, puzzle.column_count, puzzle.max_num):
+        return False
+    if solution.dots != puzzle.dots or not solution.is_solved():
+        return False
+    return all(solution.cells[r][c] == val for val, (r, c) in puzzle.coordinate_num.items())
+
+
+def _solve(strategy: Strategy, puzzle: PuzzleGrid, graph: GraphUtils, time_limit: Optional[float]) -> Tuple[str, Optional[PuzzleGrid]]:
+    options = dict(strategy.options)
+    if strategy.kind == "exact":
+        solver = ExactSolver(puzzle, graph, time_limit=time_limit, **options)
+        solution = solver.solve()
+        status = solver.stats.status
+        return ("exhausted" if status in ("node_limit", "time_limit") else status), solution
+
+    max_generations = options.pop("max_generations", 1_000_000)
+    with GeneticAlgorithm(puzzle, graph, **options) as ga:
+        best, score = ga.run(max_generations, time_limit=time_limit)
+        if score != 0:
+            return "exhausted", None
+        return "solved", ga.evaluator.decode(best)
+
+
+def _strategy_main(index: int, strategy: Strategy, puzzle_text: str, deadline: Optional[float], results) -> None:
+    start = time.perf_counter()
+    try:
+        puzzle = PuzzleGrid.parse(puzzle_text)
+        graph = GraphUtils(puzzle)
+        time_limit = None if deadline is None else max(0.0, deadline - time.time())
+        status, solution = _solve(strategy, puzzle, graph, time_limit)
+        results.put((index, status, str(solution) if solution is not None else None, time.perf_counter() - start, None))
+    except Exception as exc:
+        results.put((index, "error", None, time.perf_counter() - start, f"{type(exc).__name__}: {exc}"))
+
+
+class Portfolio:
+    """
+    Races several strategies on one puzzle, each in its own process. The
+    board is preprocessed once up front (which settles easy puzzles and
+    contradictions by itself) and handed to every strategy as text.
+
+    The first strategy to return a board that passes verify() wins and every
+    other process is terminated at once. A proof of unsatisfiability from an
+    exact strategy ends the race the same way. Strategies that give up
+    (node limit, GA out of generations) just drop out. Every strategy gets a
+    report with its final status and how long it ran.
+    """
+    def __init__(self, strategies: Optional[List[Strategy]] = None, preprocess: bool = True):
+        self.strategies = list(strategies or DEFAULT_PORTFOLIO)
+        if not self.strategies:
+            raise ValueError("A portfolio needs at least one strategy")
+        for strategy in self.strategies:
+            if strategy.kind not in KINDS:
+                raise ValueError(f"Unknown strategy kind {strategy.kind!r}, expected one of {KINDS}")
+        names = [strategy.name for strategy in self.strategies]
+        if len(set(names)) != len(names):
+            raise ValueError(f"Strategy names must be unique, got {names}")
+        self.preprocess = preprocess
+
+    def run(self, puzzle: PuzzleGrid, time_limit: Optional[float] = None) -> PortfolioResult:
+        stats = current_stats()
+        start = time.perf_counter()
+        original = puzzle
+        if self.preprocess:
+            with stats.phase("portfolio.preprocess"):
+                puzzle = puzzle.clone()
+                logic = PuzzleLogicEngine(puzzle, GraphUtils(puzzle))
+                logic.preprocess()
+            elapsed = time.perf_counter() - start
+            if logic.propagator.contradiction:
+                return PortfolioResult(None, "unsat", "preprocess", elapsed, [StrategyReport("preprocess", "unsat", elapsed)])
+            if puzzle.is_solved() and verify(original, puzzle):
+                return PortfolioResult(puzzle, "solved", "preprocess", elapsed, [StrategyReport("preprocess", "solved", elapsed)])
+            preprocessed = [StrategyReport("preprocess", "partial", elapsed)]
+        else:
+            preprocessed = []
+
+        remaining = None if time_limit is None else max(0.0, time_limit - (time.perf_counter() - start))
+        with stats.phase("portfolio.race", strategies=len(self.strategies)):
+            result = self._race(original, puzzle, start, remaining)
+        result = result._replace(reports=preprocessed + result.reports)
+        if stats.enabled and result.winner is not None:
+            stats.count(f"portfolio.won.{result.winner}")
+        return result
+
+    def _race(self, original: PuzzleGrid, puzzle: PuzzleGrid, start: float, time_limit: Optional[float]) -> PortfolioResult:
+        ctx = mp.get_context()
+        results = ctx.Queue()
+        puzzle_text = str(puzzle)
+        deadline = time.time() + time_limit if time_limit is not None else None
+
+        workers = []
+        launched = []
+        for index, strategy in enumerate(self.strategies):
+            proc = ctx.Process(
+                target=_strategy_main,
+                args=(index, strategy, puzzle_text, deadline, results),
+                daemon=True,
+            )
+            proc.start()
+            workers.append(proc)
+            launched.append(time.perf_counter())
+
+        reports: Dict[int, StrategyReport] = {}
+        solution = winner = None
+        status = "exhausted"
+        while len(reports) < len(workers):
+            wait = 0.5 if deadline is None else min(0.5, max(0.0, deadline - time.time()))
+            try:
+                index, outcome, text, elapsed, detail = results.get(timeout=wait)
+            except queue.Empty:
+                if deadline is not None and time.time() >= deadline:
+                    status = "timeout"
+                    break
+                for index, proc in enumerate(workers):
+                    if index not in reports and not proc.is_alive() and proc.exitcode != 0:
+                        reports[index] = StrategyReport(                # died without reporting
+                            self.strategies[index].name, "error", time.perf_counter() - launched[index],
+                            f"exit code {proc.exitcode}",
+                        )
+                continue
+
+            name = self.strategies[index].name
+            if outcome == "solved":
+                board = PuzzleGrid.parse(text)
+                if not verify(original, board):
+                    reports[index] = StrategyReport(name, "invalid", elapsed, "returned a board that failed verification")
+                    continue
+                solution, winner, status = board, name, "solved"
+            elif outcome == "unsat":
+                winner, status = name, "unsat"
+            reports[index] = StrategyReport(name, outcome, elapsed, detail)
+            if winner is not None:
+                break
+
+        # Cancel the losers right away
+        for index, proc in enumerate(workers):
+            if proc.is_alive():
+                proc.terminate()
+            if index not in reports:
+                reports[index] = StrategyReport(
+                    self.strategies[index].name, "cancelled", time.perf_counter() - launched[index],
+                )
+        for proc in workers:
+            proc.join()
+        results.close()
+
+        return PortfolioResult(
+            solution,
+            status,
+            winner,
+            time.perf_counter() - start,
+            [reports[index] for index in range(len(workers))],
+        )
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Race several solver strategies on one Rikudo puzzle.")
+    parser.add_argument("puzzle", help="PuzzleGrid text file, or - for stdin")
+    parser.add_argument("-s", "--strategy", action="append", default=None,
+                        help="kind[:key=value,...], e.g. exact:node_limit=20000 or ga:seeder=walk,seed=3 (repeatable)")
+    parser.add_argument("--timeout", type=float, default=None, help="overall budget in seconds")
+    parser.add_argument("--no-preprocess", action="store_true", help="hand the board to the strategies as given")
+    args = parser.parse_args(argv)
+
+    text = sys.stdin.read() if args.puzzle == "-" else open(args.puzzle).read()
+    strategies = [Strategy.parse(spec) for spec in args.strategy] if args.strategy else None
+    portfolio = Portfolio(strategies, preprocess=not args.no_preprocess)
+    result = portfolio.run(PuzzleGrid.parse(text.strip()), time_limit=args.timeout)
+    print(json.dumps(result.as_dict()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,333 @@
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+import time
+
+import numpy as np
+
+from .puzzle_grid import PuzzleGrid
+from .graph_utils import GraphUtils
+from .instrumentation import current_stats
+from .feasibility import FeasibilityOracle
+
+Cell = Tuple[int, int]
+
+def iter_bits(mask: int):
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+class DomainPropagator:
+    """
+    Event-driven propagation over candidate-cell domains.
+
+    Every missing value v keeps a bitset of cell ids it may still occupy.
+    Domains are pruned by
+        - distance bounds: dist(c, cell(k)) <= |v - k| for the nearest placed
+          k on either side of v (farther anchors are implied by the triangle
+          inequality),
+        - adjacency support: some cell of v-1 and of v+1 must neighbour c,
+        - dots: the dot partner of c must be able to hold v-1 or v+1,
+        - all-different: placed cells leave every domain.
+    A value whose domain becomes a single cell is placed, and so is a cell
+    that only one value can still reach. Only values touched by a change are
+    put back on the worklist, until fixpoint. Every placement is also fed to
+    a FeasibilityOracle, so boards cut into dead ends or unfillable regions
+    are reported as contradictions without waiting for a domain to empty.
+
+    With a `deadline` (a time.perf_counter() value) propagation and lookahead
+    stop early once it passes and set `timed_out`; everything placed up to
+    then is still forced.
+    """
+    def __init__(self, puzzle: PuzzleGrid, graph: GraphUtils, deadline: Optional[float] = None):
+        self.puzzle = puzzle
+        self.graph = graph
+        self.geometry = graph.geometry
+        self.max_num = puzzle.max_num
+        self.contradiction = False
+        self.deadline = deadline
+        self.timed_out = False
+        self.probing = False                                # inside a lookahead probe (instrumentation only)
+
+        geo = self.geometry
+        self.nbr_mask: List[int] = geo.neighbour_masks
+        self.partners: List[List[int]] = geo.dot_partners
+        self.dot_mask = sum(1 << c for c in range(geo.cell_count) if self.partners[c])
+        self._balls: Dict[int, List[int]] = {}
+
+        self.value_cell: Dict[int, int] = {}
+        self.cell_value: List[int] = [0] * geo.cell_count
+        for val, cell in puzzle.coordinate_num.items():
+            self.value_cell[val] = geo.index[cell]
+            self.cell_value[geo.index[cell]] = val
+        self.empty_mask = sum(
+            1 << i for i in range(geo.cell_count) if self.cell_value[i] == 0
+        )
+
+        self.domains: Dict[int, int] = {}
+        for v in range(1, self.max_num + 1):
+            if v not in self.value_cell:
+                self.domains[v] = self._distance_bound(v, self.empty_mask)
+        self.worklist = deque(self.domains)
+        self.queued = set(self.domains)
+        self.placed: List[Tuple[int, Cell]] = []
+        self.oracle = FeasibilityOracle(puzzle, graph)
+        self.contradiction = not self.oracle.feasible()
+
+    def ball(self, cell_id: int, radius: int) -> int:
+        """Bitset of cells within `radius` steps of `cell_id`."""
+        balls = self._balls.get(cell_id)
+        if balls is None:
+            row = self.graph.distance_row(cell_id)
+            reachable = row >= 0
+            balls = []
+            for r in range(int(row.max()) + 1):
+                bits = np.packbits(reachable & (row <= r), bitorder="little")
+                balls.append(int.from_bytes(bits.tobytes(), "little"))
+            self._balls[cell_id] = balls
+        return balls[min(radius, len(balls) - 1)]
+
+    def _anchors(self, value: int) -> Tuple[int, int]:
+        """Nearest placed values below and above `value` (0 / max_num+1 if none)."""
+        lo = value - 1
+        while lo >= 1 and lo not in self.value_cell:
+            lo -= 1
+        hi = value + 1
+        while hi <= self.max_num and hi not in self.value_cell:
+            hi += 1
+        return lo, hi
+
+    def _distance_bound(self, value: int, mask: int) -> int:
+        lo, hi = self._anchors(value)
+        if lo >= 1:
+            mask &= self.ball(self.value_cell[lo], value - lo)
+        if hi <= self.max_num:
+            mask &= self.ball(self.value_cell[hi], hi - value)
+        return mask
+
+    def _wake(self, value: int) -> None:
+        if value in self.domains and value not in self.queued:
+            self.queued.add(value)
+            self.worklist.append(value)
+
+    def _restrict(self, value: int, mask: int) -> None:
+        old = self.domains[value]
+        new = old & mask
+        if new != old:
+            self.domains[value] = new
+            self._wake(value)
+            self._wake(value - 1)
+            self._wake(value + 1)
+
+    def _support(self, value: int) -> int:
+        """Cells adjacent to some possible position of `value`."""
+        if value in self.value_cell:
+            return self.nbr_mask[self.value_cell[value]]
+        mask = 0
+        for c in iter_bits(self.domains[value]):
+            mask |= self.nbr_mask[c]
+        return mask
+
+    def _dot_ok(self, value: int, cell_id: int) -> bool:
+        for p in self.partners[cell_id]:
+            w = self.cell_value[p]
+            if w:
+                if abs(w - value) != 1:
+                    return False
+            elif not any(
+                u in self.domains and self.domains[u] >> p & 1
+                for u in (value - 1, value + 1)
+            ):
+                return False
+        return True
+
+    def revise(self, value: int) -> None:
+        mask = self.domains[value]
+        for side in (value - 1, value + 1):
+            if 1 <= side <= self.max_num:
+                mask &= self._support(side)
+        for c in iter_bits(mask & self.dot_mask):
+            if not self._dot_ok(value, c):
+                mask &= ~(1 << c)
+        self._restrict(value, mask)
+
+    def place(self, value: int, cell_id: int) -> None:
+        cell = self.geometry.coords[cell_id]
+        self.puzzle.assign(value, cell)
+        self.placed.append((value, cell))
+
+        del self.domains[value]
+        self.queued.discard(value)
+        self.value_cell[value] = cell_id
+        self.cell_value[cell_id] = value
+        bit = 1 << cell_id
+        self.empty_mask &= ~bit
+        if not self.oracle.place(value, cell_id):
+            self.contradiction = True
+
+        for u, dom in list(self.domains.items()):
+            if dom & bit:
+                self._restrict(u, ~bit)
+
+        # Tighten distance bounds for the missing run on each side of `value`
+        u = value - 1
+        while u >= 1 and u in self.domains:
+            self._restrict(u, self.ball(cell_id, value - u))
+            u -= 1
+        u = value + 1
+        while u <= self.max_num and u in self.domains:
+            self._restrict(u, self.ball(cell_id, u - value))
+            u += 1
+
+        for p in self.partners[cell_id]:
+            w = self.cell_value[p]
+            if w:
+                if abs(w - value) != 1:
+                    self.contradiction = True
+                continue
+            for u in self.domains:
+                if abs(u - value) != 1:
+                    self._restrict(u, ~(1 << p))
+
+        self._wake(value - 1)
+        self._wake(value + 1)
+
+    def hidden_singles(self) -> List[Tuple[int, int]]:
+        """Cells that exactly one missing value can still occupy."""
+        if len(self.domains) != bin(self.empty_mask).count("1"):
+            return []                                       # not every empty cell must be filled
+        once = twice = 0
+        for dom in self.domains.values():
+            twice |= once & dom
+            once |= dom
+        if self.empty_mask & ~once:
+            self.contradiction = True                       # some empty cell can hold no value
+            return []
+        singles = []
+        for c in iter_bits(once & ~twice):
+            for u, dom in self.domains.items():
+                if dom >> c & 1:
+                    singles.append((u, c))
+                    break
+        return singles
+
+    def out_of_time(self) -> bool:
+        if self.deadline is not None and not self.timed_out and time.perf_counter() > self.deadline:
+            self.timed_out = True
+        return self.timed_out
+
+    def propagate(self) -> int:
+        """Run to fixpoint (or the deadline); returns the number of values placed."""
+        stats = current_stats()
+        start = len(self.placed)
+        revisions = 0
+        while not self.contradiction and not self.timed_out:
+            round_start = len(self.placed)
+            while self.worklist and not self.contradiction:
+                if revisions & 255 == 255 and self.out_of_time():
+                    break
+                value = self.worklist.popleft()
+                self.queued.discard(value)
+                if value not in self.domains:
+                    continue
+                revisions += 1
+                self.revise(value)
+                dom = self.domains[value]
+                if dom == 0:
+                    self.contradiction = True
+                elif dom & (dom - 1) == 0:
+                    self.place(value, dom.bit_length() - 1)
+
+            if self.contradiction or self.timed_out:
+                break
+            singles = self.hidden_singles()
+            if singles:
+                for value, cell_id in singles:
+                    if value in self.domains and self.cell_value[cell_id] == 0:
+                        self.place(value, cell_id)
+            if stats.enabled and not self.probing:
+                stats.sample("propagation.placed_per_round", len(self.placed) - round_start)
+            if not singles:
+                break
+        if stats.enabled:
+            kind = "lookahead" if self.probing else "propagation"
+            stats.count(f"{kind}.revisions", revisions)
+            stats.count(f"{kind}.placed", len(self.placed) - start)
+            stats.count(f"{kind}.contradictions", int(self.contradiction))
+        return len(self.placed) - start
+
+    def snapshot(self) -> Tuple:
+        """Capture the propagator state together with a puzzle trail checkpoint."""
+        return (
+            self.domains.copy(),
+            self.value_cell.copy(),
+            self.cell_value[:],
+            self.empty_mask,
+            len(self.placed),
+            self.contradiction,
+            self.puzzle.checkpoint(),
+            self.oracle.checkpoint(),
+        )
+
+    def restore(self, state: Tuple) -> None:
+        """Back out to a snapshot, rolling the puzzle back along its trail."""
+        domains, value_cell, cell_value, empty_mask, placed, contradiction, mark, oracle_mark = state
+        self.domains = domains
+        self.value_cell = value_cell
+        self.cell_value = cell_value
+        self.empty_mask = empty_mask
+        del self.placed[placed:]
+        self.contradiction = contradiction
+        self.worklist.clear()
+        self.queued.clear()
+        self.puzzle.rollback(mark)
+        self.oracle.rollback(oracle_mark)
+
+    def lookahead(self, max_candidates: int = 2) -> List[Tuple[int, Cell]]:
+        """
+        Failed-literal probing: tentatively place each value that has at most
+        `max_candidates` cells left, propagate, and back out. Cells that lead
+        to a contradiction leave the domain; the resulting deductions are
+        propagated for real. Returns the placements made this way.
+        """
+        stats = current_stats()
+        found: List[Tuple[int, Cell]] = []
+        progress = True
+        while progress and not self.contradiction and not self.out_of_time():
+            progress = False
+            for value in sorted(self.domains, key=lambda v: bin(self.domains[v]).count("1")):
+                dom = self.domains.get(value, 0)
+                if not dom or bin(dom).count("1") > max_candidates:
+                    continue
+                if self.out_of_time():
+                    return found
+                failed = 0
+                for cell_id in iter_bits(dom):
+                    stats.count("lookahead.probes")
+                    state = self.snapshot()
+                    self.probing = True
+                    self.place(value, cell_id)
+                    self.propagate()
+                    self.probing = False
+                    if self.contradiction:
+                        failed |= 1 << cell_id
+                    self.restore(state)
+                if failed:
+                    start = len(self.placed)
+                    self._restrict(value, ~failed)
+                    if self.domains[value] == 0:
+                        self.contradiction = True
+                        break
+                    self.propagate()
+                    found.extend(self.placed[start:])
+                    progress = True
+                    if self.contradiction:
+                        break
+        return found
+
+    def candidates(self, value: int) -> List[Cell]:
+        coords = self.geometry.coords
+        if value in self.value_cell:
+            return [coords[self.value_cell[value]]]
+        return [coords[c] for c in iter_bits(self.domains.get(value, 0))]
@@ -1,9 +1,15 @@
 from typing import List, Tuple, Dict, Union
+import sys
+
+from .instrumentation import current_stats
 
 Cell = Tuple[int, int]
 Dot = Tuple[Cell, Cell]
 Dots = List[Dot]
 
+ASSIGN = 0
+UNASSIGN = 1
+
 class PuzzleGrid:
     def __init__(
         self,
@@ -25,6 +31,46 @@ class PuzzleGrid:
         self.coordinate_num: Dict[int, Cell] = {}
         self.calculate_coordinates()
 
+        # Undo trail of (op, value, cell, empty_pos, was_fixed) records, see assign/rollback
+        self.trail: List[Tuple[int, int, Cell, int, bool]] = []
+
+    @property
+    def empty_cells(self) -> List[Cell]:
+        return self._empty_cells
+
+    @empty_cells.setter
+    def empty_cells(self, cells: List[Cell]) -> None:
+        self._empty_cells = cells
+        self._empty_pos: Dict[Cell, int] = {cell: i for i, cell in enumerate(cells)}
+
+    def clone(self) -> "PuzzleGrid":
+        """
+        Copy only the mutable containers; dots and the cell tuples are immutable
+        and shared with the original. Much cheaper than copy.deepcopy.
+        """
+        copy = PuzzleGrid.__new__(PuzzleGrid)
+        copy.cells = [row[:] for row in self.cells]
+        copy.fixed_nums = self.fixed_nums.copy()
+        copy._empty_cells = self._empty_cells[:]
+        copy._empty_pos = self._empty_pos.copy()
+        copy.dots = self.dots
+        copy.max_num = self.max_num
+        copy.dot_count = self.dot_count
+        copy.row_count = self.row_count
+        copy.column_count = self.column_count
+        copy.coordinate_num = self.coordinate_num.copy()
+        copy.trail = []
+
+        stats = current_stats()
+        if stats.enabled:
+            stats.count("clone.calls")
+            stats.count("clone.bytes", sum(map(sys.getsizeof, copy.cells)) + sum(map(sys.getsizeof, (
+                copy.cells, copy.fixed_nums, copy._empty_cells, copy._empty_pos, copy.coordinate_num,
+            ))))
+        return copy
+
+    __copy__ = clone
+
     def __str__(self):
         lines = [f"{self.row_count} {self.column_count} {self.max_num}"]
         for row in self.cells:
@@ -105,6 +151,98 @@ class PuzzleGrid:
             if val > 0:
                 self.coordinate_num[val] = (i, j)
 
+    def is_empty(self, cell: Cell) -> bool:
+        return cell in self._empty_pos
+
+    def _remove_empty(self, cell: Cell) -> int:
+        """O(1) swap-remove from empty_cells; returns the position the cell held (-1 if absent)."""
+        pos = self._empty_pos.pop(cell, -1)
+        if pos < 0:
+            return -1
+        last = self._empty_cells.pop()
+        if last != cell:
+            self._empty_cells[pos] = last
+            self._empty_pos[last] = pos
+        return pos
+
+    def _restore_empty(self, cell: Cell, pos: int) -> None:
+        """Exact inverse of _remove_empty, so rollback restores the original order."""
+        if pos == len(self._empty_cells):
+            self._empty_cells.append(cell)
+        else:
+            moved = self._empty_cells[pos]
+            self._empty_pos[moved] = len(self._empty_cells)
+            self._empty_cells.append(moved)
+            self._empty_cells[pos] = cell
+        self._empty_pos[cell] = pos
+
+    def assign(self, value: int, cell: Cell) -> None:
+        """Place `value` on the empty cell `cell`, recording the change on the trail."""
+        r, c = cell
+        if self.cells[r][c] != 0:
+            raise ValueError(f"Cell {cell} is already occupied")
+        if value in self.coordinate_num:
+            raise ValueError(f"Value {value} is already placed")
+        self.cells[r][c] = value
+        self.fixed_nums[value] = cell
+        self.coordinate_num[value] = cell
+        pos = self._remove_empty(cell)
+        self.trail.append((ASSIGN, value, cell, pos, False))
+
+    def unassign(self, value: int) -> None:
+        """Take `value` off the board, making its cell empty again; recorded on the trail."""
+        cell = self.coordinate_num.pop(value)
+        was_fixed = self.fixed_nums.pop(value, None) is not None
+        r, c = cell
+        self.cells[r][c] = 0
+        self._empty_pos[cell] = len(self._empty_cells)
+        self._empty_cells.append(cell)
+        self.trail.append((UNASSIGN, value, cell, -1, was_fixed))
+
+    def checkpoint(self) -> int:
+        return len(self.trail)
+
+    def rollback(self, mark: int) -> None:
+        """Undo every assign/unassign made since checkpoint `mark`, in O(changes)."""
+        while len(self.trail) > mark:
+            op, value, cell, pos, was_fixed = self.trail.pop()
+            r, c = cell
+            if op == ASSIGN:
+                self.cells[r][c] = 0
+                del self.fixed_nums[value]
+                del self.coordinate_num[value]
+                if pos >= 0:
+                    self._restore_empty(cell, pos)
+            else:
+                self._empty_pos.pop(self._empty_cells.pop())
+                self.cells[r][c] = value
+                self.coordinate_num[value] = cell
+                if was_fixed:
+                    self.fixed_nums[value] = cell
+
+    def is_solved(self) -> bool:
+        """
+        True if every value 1..max_num is placed exactly once, consecutive values
+        sit on neighbouring cells and every dot joins two consecutive values.
+        """
+        positions: Dict[int, Cell] = {}
+        for i, row in enumerate(self.cells):
+            for j, val in enumerate(row):
+                if val > 0:
+                    if val > self.max_num or val in positions:
+                        return False
+                    positions[val] = (i, j)
+        if len(positions) != self.max_num:
+            return False
+
+        for val in range(1, self.max_num):
+            if positions[val + 1] not in self.neighbours(positions[val]):
+                return False
+        for (x1, y1), (x2, y2) in self.dots:
+            if abs(self.cells[x1][y1] - self.cells[x2][y2]) != 1:
+                return False
+        return True
+
     def find_coordinates(self, value: int) -> Union[Cell, None]:
         return self.coordinate_num.get(value)
 
@@ -0,0 +1,420 @@
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+from .batch import open_cache, solve_puzzle
+from .generator import generate_puzzle
+
+Respond = Callable[[Dict], Awaitable[None]]
+
+def _warm_worker(cache_path: Optional[str]) -> None:
+    """Pool initializer: pay imports, first-call costs and the cache connection before real requests."""
+    puzzle, _ = generate_puzzle(5, 5, seed=0)
+    solve_puzzle("warmup", str(puzzle))
+    if cache_path:
+        open_cache(cache_path)
+
+
+def _ping() -> int:
+    return os.getpid()
+
+
+def solve_many(items: List[Tuple[str, str, Optional[float]]], cache_path: Optional[str] = None) -> List[Dict]:
+    """Solve a batch of small (id, text, timeout) requests one after another in one worker."""
+    return [solve_puzzle(puzzle_id, text, timeout, cache_path=cache_path) for puzzle_id, text, timeout in items]
+
+
+def board_size(text: str) -> int:
+    """rows * columns from the PuzzleGrid header line, without parsing the board."""
+    rows, columns = text.split(None, 2)[:2]
+    return int(rows) * int(columns)
+
+
+class _Request:
+    __slots__ = ("id", "text", "deadline", "future", "task", "started", "cancelled")
+
+    def __init__(self, request_id: str, text: str, deadline: Optional[float]):
+        self.id = request_id
+        self.text = text
+        self.deadline = deadline
+        self.future: Optional[asyncio.Future] = None
+        self.task: Optional[asyncio.Task] = None
+        self.started = False
+        self.cancelled = False
+
+    def remaining(self, now: float) -> Optional[float]:
+        return None if self.deadline is None else max(0.0, self.deadline - now)
+
+
+class SolverService:
+    """
+    Long-running solver behind a JSON-lines protocol.
+
+    Requests are {"id": ..., "puzzle": "<PuzzleGrid text>", "timeout": seconds}
+    (op "solve", the default), {"op": "cancel", "id": ...} or {"op": "stats"};
+    every solve gets exactly one response carrying its id and a status
+    (solved / unsat / timeout / cancelled / error, or the solver's own).
+
+    The process pool is started once and warmed. Boards of at most
+    `small_cells` rows x columns are queued and shipped to a worker in batches
+    of up to `batch_size`, collected for at most `batch_window` seconds;
+    larger boards go to the pool one by one, on at most workers - 1 workers
+    so a batch always finds one free. That needs `workers` >= 2: with a
+    single worker a large board still gets it, and batches queue until that
+    solve ends. Each request's deadline is both
+    handed to the solver as its budget and enforced here, counted from when
+    the request was read. At most `max_pending` solves are admitted at once;
+    up to as many more wait, in order, for a slot. submit() only blocks when
+    that waiting list is full too, so the reader stops consuming input and
+    the client feels backpressure, but cancel and stats lines still get
+    through while every slot is taken. Cancelling a waiting solve drops it
+    without running it.
+    Solved and unsat results are memoised by puzzle text (LRU, `memo_size`;
+    0 turns the memo off).
+    """
+    def __init__(
+        self,
+        workers: Optional[int] = None,
+        batch_size: int = 8,
+        batch_window: float = 0.005,
+        small_cells: int = 400,
+        max_pending: int = 256,
+        default_timeout: Optional[float] = None,
+        cache_path: Optional[str] = None,
+        memo_size: int = 1024,
+    ):
+        self.workers = workers or os.cpu_count() or 1
+        self.batch_size = batch_size
+        self.batch_window = batch_window
+        self.small_cells = small_cells
+        self.max_pending = max_pending
+        self.default_timeout = default_timeout
+        self.cache_path = cache_path
+        self.memo_size = memo_size
+
+        self.pool: Optional[ProcessPoolExecutor] = None
+        self.requests: Dict[str, _Request] = {}
+        self.queue: List[_Request] = []
+        self.waiting: Deque[Tuple[_Request, Respond]] = deque()
+        self.memo: "OrderedDict[str, Dict]" = OrderedDict()
+        self.counters: Dict[str, int] = {}
+        self.started = time.perf_counter()
+
+    def _count(self, name: str, n: int = 1) -> None:
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    async def start(self) -> None:
+        self.loop = asyncio.get_running_loop()
+        self.slots = asyncio.Semaphore(self.max_pending)
+        self.wakeup = asyncio.Event()
+        self.arrived = asyncio.Event()                      # a solve joined the waiting list
+        self.room = asyncio.Event()                         # the waiting list dropped below max_pending
+        # Large solves may occupy all workers but one, so batches never queue behind them
+        # (a lone worker has to take large boards too; see the class docstring)
+        self.large_slots = asyncio.Semaphore(max(1, self.workers - 1))
+        self.pool = ProcessPoolExecutor(
+            max_workers=self.workers, initializer=_warm_worker, initargs=(self.cache_path,),
+        )
+        # The pool spawns lazily; occupy it once so every worker is up and warm before traffic arrives
+        await asyncio.gather(*(self.loop.run_in_executor(self.pool, _ping) for _ in range(self.workers)))
+        self.batcher = asyncio.create_task(self._batch_loop())
+        self.admitter = asyncio.create_task(self._admit_loop())
+
+    async def close(self) -> None:
+        while self.requests:
+            pending = [req.task for req in self.requests.values() if req.task is not None]
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+            else:
+                await asyncio.sleep(self.batch_window)      # waiting solves are about to be admitted
+        self.batcher.cancel()
+        self.admitter.cancel()
+        # Every request has been answered; whatever still runs was cancelled or timed out
+        # and would block shutdown until its solver gives up
+        for child in multiprocessing.active_children():
+            child.terminate()
+        self.pool.shutdown(cancel_futures=True)
+
+    def stats(self) -> Dict:
+        return {
+            "uptime": time.perf_counter() - self.started,
+            "in_flight": len(self.requests) - len(self.waiting),
+            "waiting": len(self.waiting),
+            "queued": len(self.queue),
+            "memo": len(self.memo),
+            **self.counters,
+        }
+
+    async def submit(self, message: Dict, respond: Respond) -> None:
+        """Handle one decoded request line; a solve only waits here while the waiting list is full."""
+        if not isinstance(message, dict):
+            await respond({"status": "error", "error": "bad request: expected a JSON object"})
+            return
+        op = message.get("op", "solve")
+        if op == "stats":
+            await respond({"op": "stats", **self.stats()})
+            return
+        if op == "cancel":
+            await self.cancel(str(message.get("id")), respond)
+            return
+        if op != "solve":
+            await respond({"id": message.get("id"), "status": "error", "error": f"unknown op {op!r}"})
+            return
+        if not isinstance(message.get("puzzle"), str):
+            await respond({"id": message.get("id"), "status": "error", "error": "missing or non-string 'puzzle'"})
+            return
+        timeout = message.get("timeout", self.default_timeout)
+        try:
+            timeout = None if timeout is None else float(timeout)
+        except (TypeError, ValueError):
+            await respond({"id": message.get("id"), "status": "error", "error": f"bad timeout {timeout!r}"})
+            return
+
+        while len(self.waiting) >= self.max_pending:
+            self.room.clear()
+            await self.room.wait()
+        request_id = str(message.get("id", f"r{sum(self.counters.values())}"))
+        if request_id in self.requests:
+            await respond({"id": request_id, "status": "error", "error": "duplicate id in flight"})
+            return
+        deadline = None if timeout is None else self.loop.time() + timeout
+        request = _Request(request_id, message["puzzle"], deadline)
+        self.requests[request_id] = request
+        self._count("received")
+        self.waiting.append((request, respond))
+        self.arrived.set()
+
+    async def _admit_loop(self) -> None:
+        """Start waiting solves in arrival order as slots free up."""
+        while True:
+            await self.arrived.wait()
+            self.arrived.clear()
+            while self.waiting:
+                await self.slots.acquire()
+                if not self.waiting:                        # the rest were cancelled while we waited
+                    self.slots.release()
+                    break
+                request, respond = self.waiting.popleft()
+                self.room.set()
+                request.task = asyncio.create_task(self._run(request, respond))
+
+    async def cancel(self, request_id: str, respond: Respond) -> None:
+        request = self.requests.get(request_id)
+        if request is None:
+            await respond({"op": "cancel", "id": request_id, "status": "unknown"})
+            return
+        request.cancelled = True
+        if request.task is None:                            # still waiting for a slot: answer it here
+            for index, (waiting, owner) in enumerate(self.waiting):
+                if waiting is request:
+                    del self.waiting[index]
+                    break
+            self.room.set()
+            self.requests.pop(request_id)
+            self._count("cancelled")
+            await owner({"id": request_id, "status": "cancelled", "latency": 0.0})
+            await respond({"op": "cancel", "id": request_id, "status": "ok"})
+            return
+        if request.started:
+            request.task.cancel()                           # a task cancelled before its first step never runs _run's cleanup
+        await respond({"op": "cancel", "id": request_id, "status": "ok"})
+
+    async def _run(self, request: _Request, respond: Respond) -> None:
+        started = time.perf_counter()
+        request.started = True
+        try:
+            if request.cancelled:
+                raise asyncio.CancelledError
+            result = self.memo.get(request.text)
+            if result is not None:
+                self.memo.move_to_end(request.text)
+                self._count("memo_hits")
+                result = dict(result, id=request.id, memo=True)
+            else:
+                result = await self._dispatch(request)
+                if self.memo_size > 0 and result.get("status") in ("solved", "unsat"):
+                    self.memo[request.text] = result
+                    if len(self.memo) > self.memo_size:
+                        self.memo.popitem(last=False)
+        except asyncio.CancelledError:
+            result = {"id": request.id, "status": "cancelled"}
+        except asyncio.TimeoutError:
+            result = {"id": request.id, "status": "timeout"}
+        except Exception as exc:
+            result = {"id": request.id, "status": "error", "error": f"{type(exc).__name__}: {exc}"}
+        finally:
+            if request.future is not None and not request.future.done():
+                request.future.cancel()                     # drops it from an unsent batch / unstarted pool job
+            self.requests.pop(request.id, None)
+            self.slots.release()
+
+        result["latency"] = time.perf_counter() - started
+        self._count(result["status"])
+        await respond(result)
+
+    async def _dispatch(self, request: _Request) -> Dict:
+        remaining = request.remaining(self.loop.time())
+        if remaining is not None and remaining <= 0:
+            raise asyncio.TimeoutError
+        try:
+            small = board_size(request.text) <= self.small_cells
+        except ValueError:
+            small = False                                   # let the worker report the parse error
+
+        if small:
+            request.future = self.loop.create_future()
+            self.queue.append(request)
+            self.wakeup.set()
+            return await asyncio.wait_for(asyncio.shield(request.future), remaining)
+
+        await asyncio.wait_for(self.large_slots.acquire(), remaining)
+        remaining = request.remaining(self.loop.time())
+        job = self.pool.submit(solve_puzzle, request.id, request.text, remaining, False, self.cache_path)
+        # Release on the pool job itself: a timed-out or cancelled request keeps its worker busy until the solver stops
+        job.add_done_callback(lambda _: self.loop.call_soon_threadsafe(self.large_slots.release))
+        request.future = asyncio.wrap_future(job)
+        return await asyncio.wait_for(asyncio.shield(request.future), remaining)
+
+    async def _batch_loop(self) -> None:
+        while True:
+            await self.wakeup.wait()
+            self.wakeup.clear()
+            if len(self.queue) < self.batch_size:
+                await asyncio.sleep(self.batch_window)      # let concurrent small requests pile up
+            while self.queue:
+                batch = [req for req in self.queue[:self.batch_size] if not req.future.done()]
+                del self.queue[:self.batch_size]
+                if batch:
+                    self._send_batch(batch)
+
+    def _send_batch(self, batch: List[_Request]) -> None:
+        now = self.loop.time()
+        items = [(req.id, req.text, req.remaining(now)) for req in batch]
+        self._count("batches")
+        self._count("batched_requests", len(batch))
+        future = self.loop.run_in_executor(self.pool, solve_many, items, self.cache_path)
+
+        def deliver(done: asyncio.Future) -> None:
+            if done.cancelled():
+                results = [{"id": req.id, "status": "cancelled"} for req in batch]
+            elif done.exception() is not None:
+                error = f"{type(done.exception()).__name__}: {done.exception()}"
+                results = [{"id": req.id, "status": "error", "error": error} for req in batch]
+            else:
+                results = done.result()
+            for req, result in zip(batch, results):
+                if not req.future.done():
+                    req.future.set_result(result)
+
+        future.add_done_callback(deliver)
+
+
+async def serve_lines(service: SolverService, reader: asyncio.StreamReader, write: Callable[[bytes], Awaitable[None]]) -> None:
+    """Feed JSON lines from `reader` to the service until EOF, writing responses with `write`."""
+    lock = asyncio.Lock()
+
+    async def respond(message: Dict) -> None:
+        async with lock:
+            await write((json.dumps(message) + "\n").encode())
+
+    while True:
+        line = await reader.readline()
+        if not line:
+            break
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            message = json.loads(line)
+        except ValueError as exc:
+            await respond({"status": "error", "error": f"bad request: {exc}"})
+            continue
+        try:
+            await service.submit(message, respond)
+        except Exception as exc:                            # one bad request must not end the connection
+            await respond({"status": "error", "error": f"bad request: {type(exc).__name__}: {exc}"})
+
+
+async def run_stdio(service: SolverService) -> None:
+    loop = asyncio.get_running_loop()
+    reader = asyncio.StreamReader(limit=1 << 24)
+    await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), sys.stdin)
+
+    async def write(data: bytes) -> None:
+        sys.stdout.buffer.write(data)
+        sys.stdout.buffer.flush()
+
+    await serve_lines(service, reader, write)
+
+
+async def run_socket(service: SolverService, path: Optional[str], port: Optional[int]) -> None:
+    async def client(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        async def write(data: bytes) -> None:
+            writer.write(data)
+            await writer.drain()
+
+        try:
+            await serve_lines(service, reader, write)
+        finally:
+            writer.close()
+
+    if path is not None:
+        server = await asyncio.start_unix_server(client, path=path, limit=1 << 24)
+    else:
+        server = await asyncio.start_server(client, host="127.0.0.1", port=port, limit=1 << 24)
+    print(f"listening on {path or f'127.0.0.1:{port}'}", file=sys.stderr)
+    async with server:
+        await server.serve_forever()
+
+
+async def _main(args: argparse.Namespace) -> None:
+    service = SolverService(
+        workers=args.workers,
+        batch_size=args.batch_size,
+        batch_window=args.batch_window,
+        small_cells=args.small_cells,
+        max_pending=args.max_pending,
+        default_timeout=args.timeout,
+        cache_path=args.cache,
+        memo_size=args.memo_size,
+    )
+    await service.start()
+    try:
+        if args.socket or args.port:
+            await run_socket(service, args.socket, args.port)
+        else:
+            await run_stdio(service)
+    finally:
+        await service.close()
+        print(json.dumps(service.stats()), file=sys.stderr)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Warm JSON-lines Rikudo solver service (stdin/stdout by default).")
+    parser.add_argument("--socket", help="listen on this Unix socket path instead of stdin/stdout")
+    parser.add_argument("--port", type=int, help="listen on 127.0.0.1:PORT instead of stdin/stdout")
+    parser.add_argument("-w", "--workers", type=int, default=None,
+                        help="pool size; small batches only get a reserved worker with 2 or more")
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--batch-window", type=float, default=0.005, help="seconds to collect a batch")
+    parser.add_argument("--small-cells", type=int, default=400, help="rows*columns up to which requests are batched")
+    parser.add_argument("--max-pending", type=int, default=256, help="admitted requests before input is throttled")
+    parser.add_argument("--timeout", type=float, default=None, help="default per-request deadline in seconds")
+    parser.add_argument("--cache", help="SQLite result cache path shared by the workers")
+    parser.add_argument("--memo-size", type=int, default=1024, help="solved puzzles remembered in memory (0 = off)")
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(_main(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
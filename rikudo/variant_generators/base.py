@@ -1,19 +1,57 @@
 from abc import ABC, abstractmethod
-from typing import List
+from itertools import islice
+from typing import Iterator, List, Optional
+import random
 
-from ..puzzle_grid import PuzzleGrid
+from ..compact_grid import CompactGrid
+from ..instrumentation import current_stats
 
 class PuzzleVariantGenerator(ABC):
     @abstractmethod
-    def generate_variants(self, limit: int) -> List[PuzzleGrid]:
+    def iter_variants(self) -> Iterator[CompactGrid]:
+        """
+        Lazily yield full puzzle variants that obey all rules, one board at a time.
+        Intended to be used for seeding a Genetic Algorithm. Each board is a
+        CompactGrid clone of the puzzle (use to_puzzle() for a PuzzleGrid).
+
+        Returns:
+            Iterator[CompactGrid]: stream of full puzzle board variants
+        """
+        pass
+
+    def generate_variants(self, limit: int) -> List[CompactGrid]:
         """
         Generate full puzzle variants that obey all rules.
-        Intended to be used for seeding a Genetic Algorithm.
 
         Args:
             limit (int): maximum number of variants to return
 
         Returns:
-            List[PuzzleGrid]: list of full puzzle board variants
+            List[CompactGrid]: the first `limit` variants of iter_variants()
+        """
+        with current_stats().phase(f"{type(self).__name__}.generate_variants", limit=limit):
+            return list(islice(self.iter_variants(), limit))
+
+    def sample_variants(self, count: int, seed: Optional[int] = None) -> List[CompactGrid]:
+        """
+        Draw up to `count` variants uniformly from the whole variant stream
+        (reservoir sampling). Subclasses with an indexable variant space
+        override this to avoid walking the full stream.
+
+        Args:
+            count (int): number of variants to return
+            seed (int): seed for the sampling RNG
+
+        Returns:
+            List[CompactGrid]: sampled variants
         """
-        pass
\ No newline at end of file
+        rng = random.Random(seed)
+        reservoir: List[CompactGrid] = []
+        for i, variant in enumerate(self.iter_variants()):
+            if i < count:
+                reservoir.append(variant)
+            else:
+                j = rng.randint(0, i)
+                if j < count:
+                    reservoir[j] = variant
+        return reservoir
@@ -1,161 +1,243 @@
-from typing import List, Tuple, Dict
-from itertools import product
-import copy
+from typing import List, Tuple, Dict, Iterator, Optional, Set
+from math import prod
+import random
 
 from ..puzzle_grid import PuzzleGrid
+from ..compact_grid import CompactGrid
 from ..graph_utils import GraphUtils
 # from variant_generators.base import PuzzleVariantGenerator
 from .base import PuzzleVariantGenerator
+from .gap_enumerator import GapEnumerator
+from ..instrumentation import current_stats
+from ..feasibility import FeasibilityOracle
 
 Cell = Tuple[int, int]
+Quad = Tuple[int, Cell, int, Cell]
 
 class Depth2Engine(PuzzleVariantGenerator):
     def __init__(self, puzzle: PuzzleGrid, graph: GraphUtils):
         self.puzzle = puzzle
         self.graph = graph
         self.adjacency = graph.adjacency_dict
+        self.base = CompactGrid.from_puzzle(puzzle, graph.geometry)
         self.max_num = puzzle.max_num
+        self.enumerate_factor = 4                           # enumerate instead of rejection-sample below count * factor
+        self.rejection_attempts = 20                        # uniform index draws allowed per requested sample
+        self.prune = True                                   # skip gap choices the feasibility oracle rules out
+
+    def _oracle(self) -> Optional[FeasibilityOracle]:
+        """Oracle on the base board, or None if pruning is off or the board is already dead."""
+        if not self.prune:
+            return None
+        oracle = FeasibilityOracle(self.puzzle, self.graph)
+        return oracle if oracle.feasible() else None
+
+    def _place_quad(self, oracle: FeasibilityOracle, quad: Quad) -> bool:
+        """Place both cells of `quad` in the oracle; on failure it is left as it was."""
+        mark = oracle.checkpoint()
+        if oracle.place_cell(quad[0], quad[1]) and oracle.place_cell(quad[2], quad[3]):
+            return True
+        oracle.rollback(mark)
+        current_stats().count("depth2.infeasible_options")
+        return False
 
     def enumerate_candidates(self) -> Dict[int, List[Tuple[int, Cell, int, Cell]]]:
         """
-        For all (n, n+3) pairs where both n and n+3 are fixed, and n+1, n+2 not yet filled:
-        1. We look for exactly TWO empty cells in between.
-        2. Then we confirm that the second empty cell is adjacent to (n+3).
-        3. We return both permutations: (n+1, cellA, n+2, cellB) and (n+1, cellB, n+2, cellA).
+        For all (n, n+3) pairs where both n and n+3 are placed, and n+1, n+2 not yet filled,
+        return every placement (n+1, cellA, n+2, cellB) of two empty cells such that
+        cellA is adjacent to n, cellB to n+3 and cellA to cellB.
 
-        This avoids counting the end cell as if it were empty and fixes the issue
-        where BFS might produce partial paths that inadvertently include n+3 in the 'middle'.
+        Delegates to GapEnumerator with k = 3; use GapEnumerator directly for longer gaps.
         """
+        enumerator = GapEnumerator(self.puzzle, self.graph, max_gap=3)
         results: Dict[int, List[Tuple[int, Cell, int, Cell]]] = {}
 
-        for n in range(1, self.max_num - 2):
-            if n in self.puzzle.fixed_nums and (n + 3) in self.puzzle.fixed_nums:
-                # Must not have already placed n+1 or n+2
-                if (n + 1) in self.puzzle.fixed_nums or (n + 2) in self.puzzle.fixed_nums:
-                    continue
-
-                start = self.puzzle.fixed_nums[n]           # cell for n
-                end = self.puzzle.fixed_nums[n + 3]         # cell for n+3
-
-                # We do BFS tracking exactly how many empty cells we've used in 'path'
-                queue = [(start, [])]                       # (currentCell, list_of_empty_cells_visited)
-                valid_paths = []
-
-                while queue:
-                    current, epath = queue.pop(0)
-
-                    # If we've used exactly 2 empty cells so far,
-                    # check if we can directly reach 'end' from 'current'
-                    if len(epath) == 2:
-                        if end in self.adjacency[current]:
-                            # We found a path of 2 empty cells that leads to n+3
-                            valid_paths.append(epath)
-                        # No need to expand further
-                        continue
-                    
-                    # Otherwise, we can expand BFS to other empty neighbors (excluding end)
-                    for nbr in self.adjacency[current]:
-                        if nbr == start or nbr == end:
-                            # We skip going directly to 'end' or back to 'start' mid-path
-                            continue
-                        if nbr in epath:
-                            continue
-                        # We only move onto an empty cell
-                        if self.puzzle.cells[nbr[0]][nbr[1]] == 0:
-                            queue.append((nbr, epath + [nbr]))
-
-                seen = set()
-                candidates = []
-                for path in valid_paths:
-                    # Create a sorted key so that (c1, c2) always appears as (min, max)
-                    sorted_key = tuple(sorted(path))
-                    if sorted_key in seen:
-                        continue
-                    seen.add(sorted_key)
-                    # Generate both candidate mappings
-                    mapping1 = (n + 1, path[0], n + 2, path[1])
-                    mapping2 = (n + 1, path[1], n + 2, path[0])
-                    # Check validity for each mapping:
-                    # mapping1 is valid if the cell for n+1 is adjacent to start and the cell for n+2 is adjacent to end.
-                    if (mapping1[1] in self.adjacency[start] and
-                        mapping1[3] in self.adjacency[end]):
-                        candidates.append(mapping1)
-                    if (mapping2[1] in self.adjacency[start] and
-                        mapping2[3] in self.adjacency[end]):
-                        candidates.append(mapping2)
-
-                if candidates:
-                    results[n] = candidates
+        with current_stats().phase("depth2.enumerate_candidates"):
+            gap_paths = enumerator.enumerate_all()
+        for n, paths in gap_paths.items():
+            if paths.gap != 3:
+                continue
+            coords = enumerator.geometry.coords
+            results[n] = [
+                (n + 1, coords[a], n + 2, coords[b])
+                for a, b in (paths.path(i) for i in range(len(paths)))
+            ]
 
         return results
 
-    # This will take a list of (value, cell) pairs and apply them to a Puzzle instance
-    def apply_assignments(self, puzzle: PuzzleGrid, assignments: List[Tuple[int, Cell]]) -> None:
+    # This will take a list of (value, cell) pairs and apply them to a board clone
+    def apply_assignments(self, board: CompactGrid, assignments: List[Tuple[int, Cell]]) -> None:
+        index = board.geometry.index
         for val, cell in assignments:
+            cell_id = index[cell]
             # Duplicate Cell Assignment Guard
-            if val in puzzle.fixed_nums:
+            if board.cell_of(val) != -1:
                 continue                                    # This number has already been placed
-            if puzzle.cells[cell[0]][cell[1]] != 0:
+            if board.value_at(cell_id) != 0:
                 continue                                    # This cell is already occupied
-            r, c = cell
-            puzzle.cells[r][c] = val
-            puzzle.fixed_nums[val] = cell
-            puzzle.coordinate_num[val] = cell
-            if cell in puzzle.empty_cells:
-                puzzle.empty_cells.remove(cell)
+            board.assign(val, cell_id)
 
     # This will assign any remaining unplaced numbers to empty cells, prioritizing adjacency to n+1 and n-1
-    def greedy_fill_remaining(self, puzzle: PuzzleGrid) -> int:
+    def greedy_fill_remaining(self, board: CompactGrid) -> int:
         filled = 0
-        missing_vals = [v for v in range(1, puzzle.max_num + 1) if v not in puzzle.fixed_nums]
+        neighbours = board.geometry.neighbours
+        spare = board.empty_cells()                         # one lazy scan: cells only ever fill up
 
-        for val in missing_vals:
-            candidates = []
+        for val in board.missing_values():
+            candidate = -1
 
             for neighbor_val in (val - 1, val + 1):
-                if 1 <= neighbor_val <= puzzle.max_num and neighbor_val in puzzle.fixed_nums:
-                    neighbor_cell = puzzle.fixed_nums[neighbor_val]
-                    for nbr in self.adjacency.get(neighbor_cell, []):
-                        if puzzle.cells[nbr[0]][nbr[1]] == 0:
-                            candidates.append(nbr)
-
-            if not candidates:
+                if 1 <= neighbor_val <= board.max_num and board.cell_of(neighbor_val) != -1:
+                    for nbr in neighbours[board.cell_of(neighbor_val)]:
+                        if board.value_at(nbr) == 0:
+                            candidate = nbr
+                            break
+                if candidate != -1:
+                    break
+
+            if candidate == -1:
                 # Fallback: pick any remaining empty cell
-                candidates = list(puzzle.empty_cells)
+                candidate = next(spare, -1)
 
-            if not candidates:
+            if candidate == -1:
                 continue
 
-            chosen = candidates[0]
-            r, c = chosen
-            puzzle.cells[r][c] = val
-            puzzle.fixed_nums[val] = chosen
-            puzzle.coordinate_num[val] = chosen
-            puzzle.empty_cells.remove(chosen)
+            board.assign(val, candidate)
             filled += 1
 
         return filled
 
-    def generate_variants(self, limit: int = 1000) -> List[PuzzleGrid]:
+    def _choices(self) -> List[List[Quad]]:
         candidates = self.enumerate_candidates()
-        keys = sorted(candidates.keys())
-        choices = [candidates[k] for k in keys]
+        return [candidates[k] for k in sorted(candidates)]
+
+    def _build(self, combo: Tuple[Quad, ...]) -> CompactGrid:
+        # Flatten [(n+1, cellA, n+2, cellB), ...] → [(n+1, cellA), (n+2, cellB), ...]
+        flat_assignments = [item for quad in combo for item in [(quad[0], quad[1]), (quad[2], quad[3])]]
+        # Clone the board buffer and apply
+        current_stats().count("depth2.variants_built")
+        board = self.base.clone()
+        self.apply_assignments(board, flat_assignments)
+        self.greedy_fill_remaining(board)
+        return board
+
+    def iter_combinations(self, choices: List[List[Quad]]) -> Iterator[Tuple[Quad, ...]]:
+        """
+        Backtrack over the gaps, picking one candidate per gap and skipping any
+        candidate that claims a cell already used by an earlier gap or that
+        the feasibility oracle says leaves the board uncompletable (which
+        prunes every combination below it).
+        """
+        stats = current_stats()
+        oracle = self._oracle()
+        depth = 0
+        cursor = [0] * len(choices)                         # next option to try at each depth
+        picks: List[Quad] = []
+        marks: List[int] = []                               # oracle checkpoint before each pick
+        used: Set[Cell] = set()
+
+        def unpick() -> None:
+            quad = picks.pop()
+            used.difference_update((quad[1], quad[3]))
+            mark = marks.pop()
+            if oracle is not None:
+                oracle.rollback(mark)
+
+        while depth >= 0:
+            if depth == len(choices):
+                stats.count("depth2.combinations")
+                yield tuple(picks)
+                depth -= 1
+                if picks:
+                    unpick()
+                continue
+
+            options = choices[depth]
+            while cursor[depth] < len(options):
+                quad = options[cursor[depth]]
+                cursor[depth] += 1
+                if stats.enabled:
+                    stats.count("depth2.options_tried")
+                if quad[1] in used or quad[3] in used:
+                    continue
+                mark = oracle.checkpoint() if oracle is not None else 0
+                if oracle is None or self._place_quad(oracle, quad):
+                    break
+            else:
+                cursor[depth] = 0
+                depth -= 1
+                if picks:
+                    unpick()
+                continue
+
+            picks.append(quad)
+            marks.append(mark)
+            used.update((quad[1], quad[3]))
+            depth += 1
+
+    def iter_variants(self) -> Iterator[CompactGrid]:
+        for combo in self.iter_combinations(self._choices()):
+            yield self._build(combo)
 
-        all_variants = []
-        count = 0
+    def generate_variants(self, limit: int = 1000) -> List[CompactGrid]:
+        return super().generate_variants(limit)
 
-        for combo in product(*choices):
-            if count >= limit:
+    def sample_variants(self, count: int, seed: Optional[int] = None) -> List[CompactGrid]:
+        """
+        Draw up to `count` distinct conflict-free gap combinations from the full
+        product without enumerating it.
+
+        Small products are enumerated and sampled exactly. Large ones are
+        sampled uniformly by decoding random mixed-radix indices and rejecting
+        combinations whose gaps claim the same cell. If conflicts are so dense
+        that rejection stalls, the rest is pulled from one backtracking search
+        over randomly shuffled options, which is conflict-free by construction
+        but only approximately uniform; it stops early only if the search runs
+        out of combinations.
+        """
+        stats = current_stats()
+        rng = random.Random(seed)
+        choices = self._choices()
+        total = prod(len(options) for options in choices)
+
+        if total <= count * self.enumerate_factor:
+            combos = list(self.iter_combinations(choices))
+            picked = rng.sample(combos, min(count, len(combos)))
+            return [self._build(combo) for combo in picked]
+
+        picked: List[Tuple[Quad, ...]] = []
+        seen: Set[Tuple[Quad, ...]] = set()
+        oracle = self._oracle()
+        for _ in range(count * self.rejection_attempts):
+            if len(picked) == count:
                 break
-            
-            # Flatten [(n+1, cellA, n+2, cellB), ...] → [(n+1, cellA), (n+2, cellB), ...]
-            flat_assignments = [item for quad in combo for item in [(quad[0], quad[1]), (quad[2], quad[3])]]
-            # Deep copy puzzle and apply
-            puzzle_copy = copy.deepcopy(self.puzzle)
-            self.apply_assignments(puzzle_copy, flat_assignments)
-            self.greedy_fill_remaining(puzzle_copy)
-
-            all_variants.append(puzzle_copy)
-            count += 1
-
-        return all_variants
\ No newline at end of file
+            stats.count("depth2.rejection_draws")
+            index = rng.randrange(total)
+            combo = []
+            for options in reversed(choices):
+                index, digit = divmod(index, len(options))
+                combo.append(options[digit])
+            combo.reverse()
+            cells = [cell for quad in combo for cell in (quad[1], quad[3])]
+            if len(set(cells)) != len(cells) or tuple(combo) in seen:
+                continue
+            if oracle is not None:
+                mark = oracle.checkpoint()
+                ok = all(self._place_quad(oracle, quad) for quad in combo)
+                oracle.rollback(mark)
+                if not ok:
+                    continue
+            seen.add(tuple(combo))
+            picked.append(tuple(combo))
+
+        if len(picked) < count:
+            # One backtrack over shuffled options yields each combination once; pull until done or exhausted
+            shuffled = [rng.sample(options, len(options)) for options in choices]
+            for combo in self.iter_combinations(shuffled):
+                if combo not in seen:
+                    seen.add(combo)
+                    picked.append(combo)
+                    if len(picked) == count:
+                        break
+
+        return [self._build(combo) for combo in picked]
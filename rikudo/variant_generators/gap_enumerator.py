@@ -0,0 +1,193 @@
+from array import array
+from typing import Dict, List, Optional, Tuple
+
+from ..puzzle_grid import PuzzleGrid
+from ..graph_utils import GraphUtils
+from ..instrumentation import current_stats
+
+Cell = Tuple[int, int]
+
+class GapPaths:
+    """
+    All ways to fill the values strictly between two placed values n and n+k.
+    Paths are stored back to back in one flat int array of cell ids
+    (k-1 ids per path), path i holding values n+1..n+k-1 in order.
+    """
+    def __init__(self, start_value: int, gap: int, cells: array, coords: List[Cell]):
+        self.start_value = start_value
+        self.gap = gap
+        self.width = gap - 1
+        self.cells = cells
+        self.coords = coords
+
+    def __len__(self) -> int:
+        return len(self.cells) // self.width
+
+    def path(self, i: int) -> Tuple[int, ...]:
+        start = i * self.width
+        return tuple(self.cells[start:start + self.width])
+
+    def assignments(self, i: int) -> List[Tuple[int, Cell]]:
+        return [
+            (self.start_value + 1 + j, self.coords[cell_id])
+            for j, cell_id in enumerate(self.path(i))
+        ]
+
+
+class GapEnumerator:
+    """
+    Enumerates simple paths through empty cells for every gap (n, n+k) between
+    consecutive placed values, 2 <= k <= max_gap.
+
+    For each gap a layered reachability table is built once with bitmasks:
+    layer[j] holds the empty cells from which the end cell can be reached in
+    exactly j+1 more steps through empty cells. The depth-first search only
+    steps onto cells in the matching layer that are not yet on the path, so
+    every expansion lies on at least one walk to the end and dead branches are
+    cut immediately; dots are enforced on the fly.
+    """
+    def __init__(self, puzzle: PuzzleGrid, graph: GraphUtils, max_gap: int = 6, max_paths: Optional[int] = None):
+        self.puzzle = puzzle
+        self.graph = graph
+        self.geometry = graph.geometry
+        self.max_gap = max_gap
+        self.max_paths = max_paths
+
+        geo = self.geometry
+        self.nbr_mask = geo.neighbour_masks
+        self.partners = geo.dot_partners
+        self.expansions = 0
+
+    def _state(self) -> Tuple[int, Dict[int, int]]:
+        index = self.geometry.index
+        placed = {val: index[cell] for val, cell in self.puzzle.coordinate_num.items()}
+        empty = 0
+        for cell_id, (r, c) in enumerate(self.geometry.coords):
+            if self.puzzle.cells[r][c] == 0:
+                empty |= 1 << cell_id
+        return empty, placed
+
+    def gaps(self) -> List[Tuple[int, int]]:
+        """(n, k) for every pair of consecutive placed values n < n+k with 2 <= k <= max_gap."""
+        placed = sorted(self.puzzle.coordinate_num)
+        return [
+            (lo, hi - lo)
+            for lo, hi in zip(placed, placed[1:])
+            if 2 <= hi - lo <= self.max_gap
+        ]
+
+    def _layers(self, end: int, steps: int, empty: int) -> List[int]:
+        layers = [self.nbr_mask[end] & empty]
+        for _ in range(steps - 1):
+            grow = 0
+            mask = layers[-1]
+            while mask:
+                low = mask & -mask
+                grow |= self.nbr_mask[low.bit_length() - 1]
+                mask ^= low
+            layers.append(grow & empty)
+        return layers
+
+    def _dots_ok(self, cell_id: int, prev: int, free_next: int) -> bool:
+        """
+        Values n+i-1 and n+i+1 sit on the previous and next path cells, so a
+        dot partner of `cell_id` has to be its predecessor or a possible successor.
+        """
+        for p in self.partners[cell_id]:
+            if p != prev and not free_next >> p & 1:
+                return False
+        return True
+
+    def _end_constraints(self, n: int, k: int, empty: int, placed: Dict[int, int]) -> Tuple[int, int]:
+        """
+        Masks the first and last path cells must lie in: once an anchor's outer
+        neighbour value (n-1 or n+k+1) is placed, any other empty dot partner of
+        the anchor has to be the adjacent gap cell.
+        """
+        masks = []
+        for anchor, outer in ((placed[n], n - 1), (placed[n + k], n + k + 1)):
+            mask = -1
+            outer_cell = placed.get(outer)
+            if outer_cell is not None:
+                for p in self.partners[anchor]:
+                    if p != outer_cell and empty >> p & 1:
+                        mask &= 1 << p
+            masks.append(mask)
+        return masks[0], masks[1]
+
+    def enumerate(self, n: int, k: int, empty: int = None, placed: Dict[int, int] = None) -> GapPaths:
+        if empty is None or placed is None:
+            empty, placed = self._state()
+        start = placed[n]
+        end = placed[n + k]
+        steps = k - 1
+        out = array("i")
+        coords = self.geometry.coords
+        if self.graph.distance_row(start)[end] > k:
+            return GapPaths(n, k, out, coords)
+
+        layers = self._layers(end, steps, empty)
+        first_mask, last_mask = self._end_constraints(n, k, empty, placed)
+        found = 0
+        expansions = self.expansions
+
+        # Iterative DFS; frame j holds the remaining candidate mask for position j
+        path: List[int] = []
+        visited = 0
+        frames = [self.nbr_mask[start] & layers[steps - 1] & first_mask]
+        while frames:
+            mask = frames[-1]
+            if not mask:
+                frames.pop()
+                if path:
+                    visited &= ~(1 << path.pop())
+                continue
+            low = mask & -mask
+            frames[-1] = mask ^ low
+            cell_id = low.bit_length() - 1
+            self.expansions += 1
+
+            depth = len(path)
+            prev = path[-1] if path else start
+            remaining = steps - depth - 1
+            if remaining:
+                free_next = self.nbr_mask[cell_id] & layers[remaining - 1] & ~visited & ~low
+            else:
+                if not last_mask >> cell_id & 1:
+                    continue
+                free_next = 1 << end
+            if not self._dots_ok(cell_id, prev, free_next):
+                continue
+            if path:
+                # The predecessor's dot partners are its own predecessor or this cell
+                before = path[-2] if depth >= 2 else start
+                if any(p != before and p != cell_id for p in self.partners[prev]):
+                    continue
+
+            if remaining == 0:
+                out.extend(path)
+                out.append(cell_id)
+                found += 1
+                if self.max_paths is not None and found >= self.max_paths:
+                    break
+                continue
+            path.append(cell_id)
+            visited |= low
+            frames.append(free_next)
+
+        stats = current_stats()
+        if stats.enabled:
+            stats.count("gap_enumerator.gaps")
+            stats.count("gap_enumerator.expansions", self.expansions - expansions)
+            stats.count("gap_enumerator.paths", found)
+        return GapPaths(n, k, out, coords)
+
+    def enumerate_all(self) -> Dict[int, GapPaths]:
+        """GapPaths keyed by the lower placed value n, for every gap that has at least one path."""
+        empty, placed = self._state()
+        results: Dict[int, GapPaths] = {}
+        for n, k in self.gaps():
+            paths = self.enumerate(n, k, empty, placed)
+            if len(paths):
+                results[n] = paths
+        return results
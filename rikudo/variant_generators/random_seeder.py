@@ -1,35 +1,41 @@
-import copy
 import random
-from typing import List
+from typing import Iterator, List, Optional
 
 from ..puzzle_grid import PuzzleGrid
+from ..compact_grid import CompactGrid, GridGeometry
 from .base import PuzzleVariantGenerator
+from ..instrumentation import current_stats
 
 class RandomSeeder(PuzzleVariantGenerator):
-    def __init__(self, puzzle: PuzzleGrid, seed: int = None):
+    def __init__(self, puzzle: PuzzleGrid, seed: int = None, geometry: Optional[GridGeometry] = None):
         self.puzzle = puzzle
         self.random = random.Random(seed)
+        self.base = CompactGrid.from_puzzle(puzzle, geometry)
 
-    def generate_variants(self, limit: int) -> List[PuzzleGrid]:
-        variants = []
+    def iter_variants(self) -> Iterator[CompactGrid]:
+        """Endless stream of boards with the missing values shuffled into the empty cells."""
         missing_vals = [v for v in range(1, self.puzzle.max_num + 1) if v not in self.puzzle.fixed_nums]
-        empty_cells = self.puzzle.empty_cells
+        index = self.base.geometry.index
+        empty_ids = [index[cell] for cell in self.puzzle.empty_cells]
 
-        if len(missing_vals) > len(empty_cells):
+        if len(missing_vals) > len(empty_ids):
             raise ValueError("More missing values than available empty cells!")
+        return self._shuffled(missing_vals, empty_ids)
 
-        for _ in range(limit):
-            puzzle_copy = copy.deepcopy(self.puzzle)
+    def _shuffled(self, missing_vals: List[int], empty_ids: List[int]) -> Iterator[CompactGrid]:
+        while True:
+            board = self.base.clone()
             shuffled_values = missing_vals[:]
             self.random.shuffle(shuffled_values)
 
-            for idx, val in enumerate(shuffled_values):
-                r, c = puzzle_copy.empty_cells[idx]
-                puzzle_copy.cells[r][c] = val
-                puzzle_copy.fixed_nums[val] = (r, c)
-                puzzle_copy.coordinate_num[val] = (r, c)
+            for val, cell_id in zip(shuffled_values, empty_ids):
+                board.assign(val, cell_id)
+            current_stats().count("random_seeder.variants_built")
 
-            puzzle_copy.empty_cells = puzzle_copy.empty_cells[len(shuffled_values):]
-            variants.append(puzzle_copy)
+            yield board
 
-        return variants
\ No newline at end of file
+    def sample_variants(self, count: int, seed: Optional[int] = None) -> List[CompactGrid]:
+        # Every variant is already an independent uniform shuffle
+        if seed is not None:
+            self.random.seed(seed)
+        return self.generate_variants(count)
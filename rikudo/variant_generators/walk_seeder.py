@@ -0,0 +1,264 @@
+from typing import Dict, Iterator, List, Optional, Tuple
+import math
+import random
+
+from ..puzzle_grid import PuzzleGrid
+from ..compact_grid import CompactGrid
+from ..graph_utils import GraphUtils
+from ..instrumentation import current_stats
+from ..feasibility import FeasibilityOracle
+from .base import PuzzleVariantGenerator
+
+Cell = Tuple[int, int]
+
+class DistanceGuidedSeeder(PuzzleVariantGenerator):
+    """
+    Builds every missing run between two placed values as a randomized walk.
+
+    Walking from n towards n+k, value v may only step onto an unused empty
+    neighbour c with dist(c, cell(n+k)) <= n+k-v, so the walk can always still
+    reach its anchor. Dots are respected on the way: a candidate's placed dot
+    partners must hold v-1 or v+1, and an unused dot partner of the head is
+    where the walk has to go next. The anchor a walk starts from is the
+    exception while its value on the other side is still unplaced: its free
+    partner may belong to that side, so the dot check only keeps other values
+    off it instead of forcing it. Among the candidates, those with fewer
+    onward free neighbours are preferred (Warnsdorff) with weight
+    exp(-onward / temperature); a higher temperature gives more diverse boards.
+
+    Tight runs (least slack between anchor distance and value gap) are walked
+    first; the runs before the first and after the last anchor last. A run is
+    retried up to `retries` times, after which its remaining values go to the
+    nearest unused cells. With `distinct` the stream skips boards it has
+    already produced (checking the last `window` of them).
+
+    With `prune` every step is also checked against a FeasibilityOracle, and a
+    step that cuts off a region or strands a dead-end cell is not taken, so
+    walks stop wasting moves on boards that can no longer be completed.
+    """
+    def __init__(
+        self,
+        puzzle: PuzzleGrid,
+        graph: GraphUtils,
+        seed: Optional[int] = None,
+        retries: int = 20,
+        temperature: float = 1.0,
+        distinct: bool = True,
+        window: int = 4096,
+        prune: bool = True,
+    ):
+        self.puzzle = puzzle
+        self.graph = graph
+        self.geometry = graph.geometry
+        self.base = CompactGrid.from_puzzle(puzzle, graph.geometry)
+        self.partners = self.geometry.dot_partners
+        self.max_num = puzzle.max_num
+        self.random = random.Random(seed)
+        self.retries = retries
+        self.temperature = temperature
+        self.distinct = distinct
+        self.window = window
+        self.oracle = None
+        if prune:
+            oracle = FeasibilityOracle(puzzle, graph)
+            self.oracle = oracle if oracle.feasible() else None
+
+    def _anchors(self) -> List[Tuple[int, int]]:
+        index = self.geometry.index
+        return sorted((val, index[cell]) for val, cell in self.puzzle.coordinate_num.items())
+
+    def _dots_ok(self, cell_id: int, value: int, cell_value: List[int]) -> bool:
+        unused = 0
+        for p in self.partners[cell_id]:
+            w = cell_value[p]
+            if w:
+                if abs(w - value) != 1:
+                    return False
+            else:
+                unused += 1
+        return unused <= 1                                  # only the next walk cell can still complete a dot
+
+    def _choose(self, cands: List[int], cell_value: List[int]) -> int:
+        neighbours = self.geometry.neighbours
+        onward = [sum(1 for n in neighbours[c] if not cell_value[n]) for c in cands]
+        if self.temperature <= 0:
+            low = min(onward)
+            return self.random.choice([c for c, o in zip(cands, onward) if o == low])
+        low = min(onward)
+        weights = [math.exp(-(o - low) / self.temperature) for o in onward]
+        return self.random.choices(cands, weights)[0]
+
+    def _walk(
+        self,
+        start: int,
+        value: int,
+        step: int,
+        stop: int,
+        end: Optional[int],
+        cell_value: List[int],
+        settled: bool,
+    ) -> List[int]:
+        """
+        Cells for values value+step, value+2*step, ... up to (not including)
+        `stop`, walking from cell `start`; `end` is the anchor cell holding
+        `stop`, if any. `settled` says value-step is placed (or out of range),
+        so a free dot partner of `start` must take value+step. Walked cells are
+        marked in `cell_value` (0 = free). Returns as many cells as the walk
+        managed to place.
+        """
+        neighbours = self.geometry.neighbours
+        oracle = self.oracle
+        row = self.graph.distance_row(end) if end is not None else None
+        path: List[int] = []
+        head = start
+        v = value + step
+        while v != stop:
+            forced = [p for p in self.partners[head] if not cell_value[p]] if settled or path else []
+            cands = []
+            for c in (forced if forced else neighbours[head]):
+                if cell_value[c]:
+                    continue
+                if row is not None and not 0 <= row[c] <= abs(stop - v):
+                    continue
+                if not self._dots_ok(c, v, cell_value):
+                    continue
+                cands.append(c)
+            if len(forced) > 1:
+                break
+            while cands:
+                c = self._choose(cands, cell_value)
+                if oracle is None:
+                    break
+                mark = oracle.checkpoint()
+                if oracle.place(v, c):
+                    break
+                oracle.rollback(mark)
+                cands.remove(c)
+            else:
+                break
+            path.append(c)
+            cell_value[c] = v
+            head = c
+            v += step
+        return path
+
+    def _fill_run(self, start: int, value: int, step: int, stop: int, end: Optional[int], cell_value: List[int],
+                  settled: bool) -> List[int]:
+        """Best of up to `retries` walks; the cells of failed attempts are released."""
+        best: List[int] = []
+        length = abs(stop - value) - 1
+        stats = current_stats()
+        oracle = self.oracle
+        mark = oracle.checkpoint() if oracle is not None else 0
+        for _ in range(max(1, self.retries)):
+            path = self._walk(start, value, step, stop, end, cell_value, settled)
+            if len(path) == length:
+                return path
+            stats.count("walk_seeder.retries")
+            for c in path:
+                cell_value[c] = 0
+            if oracle is not None:
+                oracle.rollback(mark)
+            if len(path) > len(best):
+                best = path
+        for offset, c in enumerate(best, start=1):
+            cell_value[c] = value + offset * step
+            if oracle is not None:
+                oracle.place(value + offset * step, c)
+        return best
+
+    def _build(self) -> Dict[int, int]:
+        """One variant as value -> cell id (values the walks could not place are left out)."""
+        geo = self.geometry
+        anchors = self._anchors()
+        mark = self.oracle.checkpoint() if self.oracle is not None else 0
+        cell_value = [0] * geo.cell_count
+        value_cell: Dict[int, int] = {}
+        for val, cell_id in anchors:
+            cell_value[cell_id] = val
+            value_cell[val] = cell_id
+
+        if not anchors:
+            empty = [geo.index[cell] for cell in self.puzzle.empty_cells]
+            if not empty:
+                return value_cell
+            first = self.random.choice(empty)
+            cell_value[first] = 1
+            value_cell[1] = first
+            anchors = [(1, first)]
+            if self.oracle is not None:
+                self.oracle.place(1, first)
+
+        # (slack, tie-break, start value, start cell, stop value, stop cell)
+        gaps = []
+        for (lo, a), (hi, b) in zip(anchors, anchors[1:]):
+            if hi - lo > 1:
+                slack = (hi - lo) - int(self.graph.distance_row(a)[b])
+                gaps.append((slack, self.random.random(), lo, a, hi, b))
+        gaps.sort()
+        runs = [(lo, a, 1, hi, b) for _, _, lo, a, hi, b in gaps]
+        first_val, first_cell = anchors[0]
+        last_val, last_cell = anchors[-1]
+        if first_val > 1:
+            runs.append((first_val, first_cell, -1, 0, None))
+        if last_val < self.max_num:
+            runs.append((last_val, last_cell, 1, self.max_num + 1, None))
+
+        for value, start, step, stop, end in runs:
+            other = value - step
+            settled = other in value_cell or not 1 <= other <= self.max_num
+            path = self._fill_run(start, value, step, stop, end, cell_value, settled)
+            for offset, c in enumerate(path, start=1):
+                value_cell[value + offset * step] = c
+        if self.oracle is not None:
+            self.oracle.rollback(mark)                      # back to the bare puzzle for the next board
+
+        missing = [v for v in range(1, self.max_num + 1) if v not in value_cell]
+        if missing:
+            current_stats().count("walk_seeder.fallbacks", len(missing))
+            free = [geo.index[cell] for cell in self.puzzle.empty_cells if not cell_value[geo.index[cell]]]
+            for v in missing:
+                if not free:
+                    break
+                near = value_cell.get(v - 1, value_cell.get(v + 1))
+                if near is None:
+                    c = free[0]
+                else:
+                    row = self.graph.distance_row(near)
+                    c = min(free, key=lambda f: row[f] if row[f] >= 0 else 1 << 15)
+                free.remove(c)
+                cell_value[c] = v
+                value_cell[v] = c
+        return value_cell
+
+    def iter_variants(self) -> Iterator[CompactGrid]:
+        """Endless stream of walked boards (distinct within the last `window` if `distinct`)."""
+        fixed = self.puzzle.coordinate_num
+        seen: Dict[int, None] = {}                          # insertion-ordered, oldest evicted first
+        misses = 0
+        while True:
+            value_cell = self._build()
+            if self.distinct:
+                key = hash(tuple(sorted(value_cell.items())))
+                if key in seen:
+                    misses += 1
+                    if misses <= self.retries:
+                        continue                            # few distinct boards exist; let duplicates through
+                else:
+                    seen[key] = None
+                    if len(seen) > self.window:
+                        del seen[next(iter(seen))]
+                misses = 0
+
+            board = self.base.clone()
+            for val, cell_id in sorted(value_cell.items()):
+                if val not in fixed:
+                    board.assign(val, cell_id)
+            current_stats().count("walk_seeder.variants_built")
+            yield board
+
+    def sample_variants(self, count: int, seed: Optional[int] = None) -> List[CompactGrid]:
+        # The stream never ends and every walk is already an independent random draw
+        if seed is not None:
+            self.random.seed(seed)
+        return self.generate_variants(count)